@@ -17,6 +17,7 @@ SYNOPSIS:
                                  [sync_delete] [sync_delete_whatif]
                                  [max_upload_workers]
                                  [debug] [debug_metadata]
+                                 [hash_cache_path]
 
 PARAMETERS:
     Required Parameters:
@@ -259,7 +260,8 @@ PARAMETERS:
     [max_upload_workers]
         Maximum number of concurrent upload workers for parallel processing.
         Default: 4 (Graph API concurrent request limit)
-        Range: 1-10 (values >10 are capped to 10 for API safety)
+        Range: 1-10 (values >10 are capped to 10 for API safety), or 'auto'
+        to add one worker per 25ms of measured Graph API round-trip time (4-10)
 
         This controls how many files are uploaded simultaneously using
         Python's ThreadPoolExecutor. More workers = faster uploads but
@@ -371,6 +373,18 @@ PARAMETERS:
         `Type`: String ('True'/'False')
         `Position`: 19
 
+    [hash_cache_path]
+        Local sqlite database of file hashes reused across runs (opt-in).
+        Default: '' (no cache)
+
+        Relative paths are placed under $RUNNER_TEMP, absolute paths are used
+        as given. Files whose size, modification time, inode and change time
+        match the recorded values are not read and hashed again. Only helps
+        on self-hosted runners that keep the workspace between runs.
+
+        `Type`: String (path)
+        `Position`: 20
+
 DESCRIPTION:
     - Intelligently syncs files to SharePoint, skipping unchanged files
     - Compares file size and modification time to detect changes
@@ -549,94 +563,352 @@ VERSION:
 import sys
 import os
 import glob
+import stat
 import time
+import re
+import fnmatch
+import logging
+import itertools
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # SharePoint sync modules
-from sharepoint_sync.config import parse_config
+from sharepoint_sync.config import parse_config, tune_upload_workers, MAX_UPLOAD_WORKERS
+from sharepoint_sync.auth import acquire_token
 from sharepoint_sync.graph_api import (
     get_drive_item_by_path, check_and_create_filehash_column,
-    list_files_in_folder_recursive, delete_file_from_sharepoint
+    list_files_in_folder_recursive, delete_file_from_sharepoint, delete_files_batch,
+    configure_http_session, DELETE_BATCH_SIZE
+)
+from sharepoint_sync.file_handler import compile_exclude_patterns, sanitize_path_components
+from sharepoint_sync.monitoring import upload_stats, print_rate_limiting_summary, format_bytes
+from sharepoint_sync.hash_cache import open_hash_cache, prune_hash_cache, close_hash_cache
+from sharepoint_sync.utils import (
+    is_debug_enabled, refresh_debug_flags, logger, print_banner, BANNER_BAR, get_available_cpu_count
 )
-from sharepoint_sync.file_handler import should_exclude_path
-from sharepoint_sync.monitoring import upload_stats, print_rate_limiting_summary
-from sharepoint_sync.utils import is_debug_enabled
 from sharepoint_sync.parallel_uploader import ParallelUploader
+from sharepoint_sync.thread_utils import print_lines
 
 
 # ====================================================================
 # FILE DISCOVERY - Finding files to upload
 # ====================================================================
 
-def discover_files(file_path, recursive, exclude_patterns_list):
+def _split_glob_pattern(file_path):
+    """
+    Split a glob pattern into its static anchor directory and wildcard components.
+
+    Only the anchor is taken literally; the remaining components are matched
+    level by level while walking, so scanning starts at the deepest directory
+    that contains no wildcards instead of the current working directory.
+
+    Args:
+        file_path (str): File path or glob pattern
+
+    Returns:
+        tuple: (anchor directory, list of pattern components). The component
+               list is empty when the path contains no wildcards at all.
+
+    Examples:
+        >>> _split_glob_pattern('src/**/*.py')
+        ('src', ['**', '*.py'])
+
+        >>> _split_glob_pattern('*.pdf')
+        ('', ['*.pdf'])
+    """
+    anchor = file_path
+    pattern_parts = []
+    # Peel components off the end until the remainder has no wildcards
+    # (same split glob.glob() performs internally)
+    while glob.has_magic(anchor):
+        anchor, part = os.path.split(anchor)
+        pattern_parts.append(part)
+    pattern_parts.reverse()
+    return anchor, pattern_parts
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_glob_part(part):
+    """
+    Compile one wildcard path component once per run.
+
+    Args:
+        part (str): Pattern component such as '*.md'
+
+    Returns:
+        callable: Match function for (normcased) entry names, as fnmatch.filter() would apply it
+    """
+    return re.compile(fnmatch.translate(os.path.normcase(part))).match
+
+
+def _scan_dir(dirname, dironly):
+    """
+    List a directory with a single os.scandir() pass.
+
+    Args:
+        dirname (str): Directory to list ('' means the current directory)
+        dironly (bool): Only return subdirectories
+
+    Returns:
+        list: os.DirEntry objects in directory order, empty if unreadable
+    """
+    entries = []
+    try:
+        with os.scandir(dirname or os.curdir) as it:
+            for entry in it:
+                if dironly:
+                    try:
+                        # DirEntry caches the file type from readdir(), so this
+                        # is free except for symlinks (which glob also follows)
+                        if not entry.is_dir():
+                            continue
+                    except OSError:
+                        continue
+                entries.append(entry)
+    except OSError:
+        pass
+    return entries
+
+
+def _is_dir_entry(entry):
+    """Return entry.is_dir(), treating unreadable entries as non-directories."""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _list_recursive(dirname, dironly, exclude_matcher, pruned):
+    """
+    Yield (relative name, DirEntry) for all non-hidden entries below dirname ('**' expansion).
+
+    Walks iteratively with an explicit stack (pre-order, same order as glob),
+    so deep trees don't pay for a chain of nested generators per entry.
+    Directories whose subtree is excluded are recorded in pruned and never
+    descended into; they are only yielded themselves when the caller wants
+    final matches (not dironly).
+    """
+    # Each frame: (relative name + separator, path to scan + separator, pending entries).
+    # Keeping the separator on the prefixes turns the per-entry os.path.join()
+    # calls into plain string concatenation.
+    sep = os.sep
+    stack = [('', os.path.join(dirname, '') if dirname else '', iter(_scan_dir(dirname, dironly)))]
+    while stack:
+        prefix, parent, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        name = entry.name
+        if name[0] == '.':
+            continue  # glob's '**' never matches hidden entries
+        relname = prefix + name
+        is_dir = _is_dir_entry(entry)
+        if is_dir:
+            # Build the path like glob does (entry.path would add a './' prefix)
+            path = parent + name
+            if exclude_matcher and exclude_matcher.excludes_subtree(path, name):
+                pruned.append(path)
+                if not dironly:
+                    yield relname, entry
+                continue
+        yield relname, entry
+        if is_dir:
+            stack.append((relname + sep, path + sep, iter(_scan_dir(path, dironly))))
+
+
+def _walk_filtered(root, pattern_parts, recursive, exclude_matcher=None, pruned=None):
+    """
+    Walk from root matching pattern components, pruning excluded directories.
+
+    Produces the same paths, in the same order, as glob.iglob() would for the
+    equivalent pattern, but never descends into a directory whose whole
+    subtree is excluded by exclude_matcher.
+
+    Args:
+        root (str): Static anchor directory from _split_glob_pattern()
+        pattern_parts (list): Remaining pattern components (non-empty)
+        recursive (bool): Treat '**' as "zero or more directories"
+        exclude_matcher (ExcludeMatcher): Optional precompiled exclusion patterns
+        pruned (list): Receives the paths of directories that were skipped
+
+    Yields:
+        tuple: (path, os.DirEntry or None) for each matching file or directory.
+               The entry is None for paths that were not produced by a
+               directory scan (literal components, '**' matching root itself).
+    """
+    if pruned is None:
+        pruned = []
+    part = pattern_parts[0]
+    rest = pattern_parts[1:]
+    # Intermediate components can only ever match directories
+    dironly = bool(rest)
+
+    expand_recursive = recursive and part == '**'
+    if expand_recursive:
+        # '**' matches the directory itself plus everything below it
+        matches = itertools.chain((('', None),), _list_recursive(root, dironly, exclude_matcher, pruned))
+    elif glob.has_magic(part):
+        entries = _scan_dir(root, dironly)
+        if part[0] != '.':
+            entries = [entry for entry in entries if entry.name[0] != '.']
+        match = _compile_glob_part(part)
+        normcase = os.path.normcase
+        matches = [(entry.name, entry) for entry in entries if match(normcase(entry.name))]
+    elif part:
+        matches = [(part, None)] if os.path.lexists(os.path.join(root, part)) else []
+    else:
+        # Trailing separator: only matches if root is a directory
+        matches = [(part, None)] if os.path.isdir(root) else []
+
+    for name, entry in matches:
+        path = os.path.join(root, name) if root else name
+        if rest:
+            # '**' expansion has already pruned its directories
+            if name and not expand_recursive and exclude_matcher and exclude_matcher.excludes_subtree(path, name):
+                pruned.append(path)
+                continue
+            yield from _walk_filtered(path, rest, recursive, exclude_matcher, pruned)
+        elif path:
+            yield path, entry
+
+
+def discover_files(file_path, recursive, exclude_patterns_list, exclude_matcher=None):
     """
     Discover files based on glob patterns and exclusion filters.
 
     This function finds all files matching the given pattern(s) and applies
-    exclusion filters to remove unwanted files/directories.
+    exclusion filters to remove unwanted files/directories. Directories whose
+    entire contents would be excluded are skipped without being scanned.
 
     Args:
         file_path (str): File path or glob pattern to match
         recursive (bool): Enable recursive matching for '**' patterns
         exclude_patterns_list (list): List of exclusion patterns
+        exclude_matcher (ExcludeMatcher): Precompiled form of exclude_patterns_list
+                                          (e.g., Config.exclude_matcher); compiled
+                                          here if not provided
 
     Returns:
-        tuple: (list of file paths, list of directory paths)
+        tuple: (list of file paths, list of directory paths, base path).
+               The base path is what calculate_base_path() returns for the
+               two lists, computed from the parent directories seen during
+               the walk instead of another pass over the files.
 
     Process:
-        1. Use glob.glob() to find all items matching the pattern
-        2. Apply exclusion filters to remove unwanted items
-        3. Separate files from directories
-        4. Return both lists
+        1. Split the pattern into a static anchor and wildcard components
+        2. Walk from the anchor with os.scandir(), pruning excluded directories
+        3. Apply exclusion filters to each matched item
+        4. Separate files from directories, collecting the files' parent directories
+        5. Return both lists and the base path
 
     Examples:
         >>> discover_files('*.pdf', False, [])
-        (['report.pdf', 'invoice.pdf'], [])
+        (['report.pdf', 'invoice.pdf'], [], '')
 
         >>> discover_files('src/**/*.py', True, ['__pycache__', '*.pyc'])
-        (['src/main.py', 'src/utils.py'], [])
+        (['src/main.py', 'src/utils.py'], [], '')
     """
-    # Use glob to find all files/directories matching the pattern
-    # glob.glob() returns a list of paths matching a pathname pattern
-    # Examples: '*.txt' finds all .txt files, '**/*.py' finds all .py files recursively
-    local_items_unfiltered = glob.glob(file_path, recursive=recursive)
-
-    # Apply exclusion filters if provided
-    if exclude_patterns_list:
-        local_items = [item for item in local_items_unfiltered if not should_exclude_path(item, exclude_patterns_list)]
-        excluded_count = len(local_items_unfiltered) - len(local_items)
-        if excluded_count > 0 and is_debug_enabled():
-            print(f"[=] Excluded {excluded_count} item(s) matching exclusion patterns")
+    # Compile the exclusion patterns once for the whole walk
+    if exclude_matcher is None:
+        exclude_matcher = compile_exclude_patterns(exclude_patterns_list)
+
+    # Literal path (no wildcards): a single stat() answers existence and type.
+    # Anything unusual (missing, excluded, special file) takes the general path
+    # below so error reporting stays in one place.
+    if not glob.has_magic(file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            st = None
+        if st is not None and not exclude_matcher.matches(file_path):
+            if stat.S_ISREG(st.st_mode):
+                return [file_path], [], calculate_base_path([file_path], [])
+            if stat.S_ISDIR(st.st_mode):
+                return [], [file_path], calculate_base_path([], [file_path])
+
+    pruned_dirs = []
+
+    # Only scan below the static part of the pattern
+    # Examples: '*.txt' scans the current directory, 'src/**/*.py' walks 'src'
+    anchor, pattern_parts = _split_glob_pattern(file_path)
+    if pattern_parts:
+        matched_items = _walk_filtered(anchor, pattern_parts, recursive, exclude_matcher, pruned_dirs)
     else:
-        local_items = local_items_unfiltered
+        matched_items = [(file_path, None)] if os.path.lexists(file_path) else []
+
+    local_files = []  # Will contain paths to actual files
+    local_dirs = []   # Will contain paths to directories
+    parent_dirs = set()  # Parent directories of local_files (for the base path)
+    last_parent = None
+    kept_count = 0
+    excluded_count = 0     # Excluded files
+    excluded_dirs = set()  # Excluded directories (matched or pruned during the walk)
+
+    # Filter and categorize each matched item in a single pass
+    for item, entry in matched_items:
+        if exclude_matcher.matches(item):
+            try:
+                excluded_dir = entry.is_dir() if entry is not None else os.path.isdir(item)
+            except OSError:
+                excluded_dir = False
+            if excluded_dir:
+                excluded_dirs.add(item)
+            else:
+                excluded_count += 1
+            continue
+        kept_count += 1
+        if entry is not None:
+            # Reuse the file type cached by os.scandir() instead of another stat()
+            try:
+                is_file = entry.is_file()
+                is_dir = not is_file and entry.is_dir()
+            except OSError:
+                continue
+        else:
+            # One stat() answers both questions (isfile() + isdir() would be two)
+            try:
+                mode = os.stat(item).st_mode
+            except OSError:
+                continue
+            is_file = stat.S_ISREG(mode)
+            is_dir = stat.S_ISDIR(mode)
+        if is_file:  # Path points to a file
+            local_files.append(item)  # Add to files list
+            # Matches arrive grouped by directory, so only hash a parent when it changes
+            parent = os.path.dirname(item)
+            if parent != last_parent:
+                parent_dirs.add(parent)
+                last_parent = parent
+        elif is_dir:  # Path points to a directory
+            local_dirs.append(item)   # Add to directories list
+
+    # Directories are counted separately: files inside pruned ones were never listed
+    excluded_dirs.update(pruned_dirs)
+    excluded_dir_count = len(excluded_dirs)
+    if (excluded_count or excluded_dir_count) and logger.isEnabledFor(logging.DEBUG):
+        for pruned_dir in pruned_dirs:
+            logger.debug(f"[=] Skipped excluded directory: {pruned_dir}")
+        logger.debug(f"[=] Excluded {excluded_count} file(s) and {excluded_dir_count} director(y/ies) matching exclusion patterns")
 
     # Exit with error if no matches found
-    if not local_items:
-        if exclude_patterns_list and local_items_unfiltered:
+    if not kept_count:
+        if exclude_patterns_list and (excluded_count or excluded_dir_count):
             print(f"[Error] All files matched by pattern '{file_path}' were excluded by filters")
-            print(f"[Error] {len(local_items_unfiltered)} file(s) found but all matched exclusion patterns: {', '.join(exclude_patterns_list)}")
+            print(f"[Error] {excluded_count} file(s) and {excluded_dir_count} director(y/ies) matched exclusion patterns: {', '.join(exclude_patterns_list)}")
         else:
             print(f"[Error] No files or directories matched pattern: {file_path}")
         sys.exit(1)  # Exit code 1 indicates error to calling process (e.g., GitHub Actions)
 
-    # Separate files from directories
-    local_files = []  # Will contain paths to actual files
-    local_dirs = []   # Will contain paths to directories
-
-    # Iterate through each matched item and categorize it
-    for item in local_items:
-        if os.path.isfile(item):  # Check if path points to a file
-            local_files.append(item)  # Add to files list
-        elif os.path.isdir(item):  # Check if path points to a directory
-            local_dirs.append(item)   # Add to directories list
-
-    return local_files, local_dirs
+    return local_files, local_dirs, calculate_base_path(local_files, local_dirs, parent_dirs)
 
 
 # ====================================================================
 # BASE PATH CALCULATION - For maintaining folder structure
 # ====================================================================
 
-def calculate_base_path(local_files, local_dirs):
+def calculate_base_path(local_files, local_dirs, parent_dirs=None):
     """
     Calculate the base path to strip from file paths when uploading.
 
@@ -645,6 +917,8 @@ def calculate_base_path(local_files, local_dirs):
     Args:
         local_files (list): List of file paths
         local_dirs (list): List of directory paths
+        parent_dirs (set): Optional precomputed set of os.path.dirname() of
+                           every file (e.g., collected by discover_files())
 
     Returns:
         str: Base path to use for relative path calculation
@@ -666,7 +940,16 @@ def calculate_base_path(local_files, local_dirs):
         # If only files were selected, find their common parent directory
         # os.path.commonpath() finds the longest common path prefix
         # Example: ["/a/b/file1.txt", "/a/b/c/file2.txt"] → "/a/b"
-        base_path = os.path.dirname(os.path.commonpath(local_files))
+        if len(local_files) == 1:
+            common_path = os.path.commonpath(local_files)
+        else:
+            # A file is never a prefix of another file, so the common path of
+            # distinct files equals the common path of their (far fewer) parent
+            # directories
+            if parent_dirs is None:
+                parent_dirs = {os.path.dirname(p) for p in local_files}
+            common_path = os.path.commonpath(parent_dirs)
+        base_path = os.path.dirname(common_path)
 
     return base_path
 
@@ -683,72 +966,75 @@ def print_summary(total_files, whatif_mode=False):
         total_files (int): Total number of files processed
         whatif_mode (bool): Whether sync deletion is in WhatIf mode
     """
-    def format_bytes(bytes_val):
-        """Convert bytes to human-readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes_val < 1024.0:
-                return f"{bytes_val:.1f} {unit}"
-            bytes_val /= 1024.0
-        return f"{bytes_val:.1f} TB"
-
     # Create visual separator for better readability
-    print()  # Empty print - won't get [Main] prefix in DEBUG mode
-    print("="*60)
-    print("[✓] SYNC PROCESS COMPLETED")
-    print("="*60)
+    lines = ['']  # Empty line - won't get [Main] prefix in DEBUG mode
+    lines.append(BANNER_BAR)
+    lines.append("[✓] SYNC PROCESS COMPLETED")
+    lines.append(BANNER_BAR)
 
     # Show detailed statistics
     stats = upload_stats.stats
-    print(f"[STATS] Sync Statistics:")
-    print(f"   - New files uploaded:       {stats['new_files']:>6}")
-    print(f"   - Files updated:            {stats['replaced_files']:>6}")
-    print(f"   - Files skipped (unchanged):{stats['skipped_files']:>6}")
+    lines.append(f"[STATS] Sync Statistics:")
+    lines.append(f"   - New files uploaded:       {stats['new_files']:>6}")
+    lines.append(f"   - Files updated:            {stats['replaced_files']:>6}")
+    lines.append(f"   - Files skipped (unchanged):{stats['skipped_files']:>6}")
 
     # Show deleted files with WhatIf indicator if applicable
     if stats['deleted_files'] > 0:
         if whatif_mode:
-            print(f"   - Files deleted (WhatIf):   {stats['deleted_files']:>6}")
+            lines.append(f"   - Files deleted (WhatIf):   {stats['deleted_files']:>6}")
         else:
-            print(f"   - Files deleted:            {stats['deleted_files']:>6}")
+            lines.append(f"   - Files deleted:            {stats['deleted_files']:>6}")
 
-    print(f"   - Failed uploads:           {stats['failed_files']:>6}")
-    print(f"   - Total files processed:    {total_files:>6}")
+    lines.append(f"   - Failed uploads:           {stats['failed_files']:>6}")
+    lines.append(f"   - Total files processed:    {total_files:>6}")
 
     # Show comparison methods if files were compared
     total_compared = stats.get('compared_by_hash', 0) + stats.get('compared_by_size', 0)
     if total_compared > 0:
-        print(f"\n[COMPARE] File Comparison Methods:")
+        lines.append(f"\n[COMPARE] File Comparison Methods:")
         hash_count = stats.get('compared_by_hash', 0)
         size_count = stats.get('compared_by_size', 0)
         hash_pct = (hash_count / total_compared * 100) if total_compared > 0 else 0
         size_pct = (size_count / total_compared * 100) if total_compared > 0 else 0
-        print(f"   - Compared by hash:         {hash_count:>6} ({hash_pct:.1f}%)")
-        print(f"   - Compared by size:         {size_count:>6} ({size_pct:.1f}%)")
+        lines.append(f"   - Compared by hash:         {hash_count:>6} ({hash_pct:.1f}%)")
+        lines.append(f"   - Compared by size:         {size_count:>6} ({size_pct:.1f}%)")
 
     # Show FileHash column statistics if any hash operations occurred
     total_hash_ops = (stats.get('hash_new_saved', 0) + stats.get('hash_updated', 0) +
                      stats.get('hash_matched', 0) + stats.get('hash_save_failed', 0))
     if total_hash_ops > 0:
-        print(f"\n[HASH] FileHash Column Statistics:")
+        lines.append(f"\n[HASH] FileHash Column Statistics:")
         if stats.get('hash_new_saved', 0) > 0:
-            print(f"   - New hashes saved:         {stats.get('hash_new_saved', 0):>6}")
+            lines.append(f"   - New hashes saved:         {stats.get('hash_new_saved', 0):>6}")
         if stats.get('hash_updated', 0) > 0:
-            print(f"   - Hashes updated:           {stats.get('hash_updated', 0):>6}")
+            lines.append(f"   - Hashes updated:           {stats.get('hash_updated', 0):>6}")
         if stats.get('hash_matched', 0) > 0:
-            print(f"   - Hash matches (skipped):   {stats.get('hash_matched', 0):>6}")
+            lines.append(f"   - Hash matches (skipped):   {stats.get('hash_matched', 0):>6}")
         if stats.get('hash_save_failed', 0) > 0:
-            print(f"   - Hash save failures:       {stats.get('hash_save_failed', 0):>6}")
+            lines.append(f"   - Hash save failures:       {stats.get('hash_save_failed', 0):>6}")
 
-    print(f"\n[DATA] Transfer Summary:")
-    print(f"   - Data uploaded:   {format_bytes(stats['bytes_uploaded'])}")
-    print(f"   - Data skipped:    {format_bytes(stats['bytes_skipped'])}")
-    print(f"   - Total savings:   {format_bytes(stats['bytes_skipped'])} ({stats['skipped_files']} files not re-uploaded)")
+    lines.append(f"\n[DATA] Transfer Summary:")
+    lines.append(f"   - Data uploaded:   {format_bytes(stats['bytes_uploaded'])}")
+    lines.append(f"   - Data skipped:    {format_bytes(stats['bytes_skipped'])}")
+    lines.append(f"   - Total savings:   {format_bytes(stats['bytes_skipped'])} ({stats['skipped_files']} files not re-uploaded)")
 
     # Calculate efficiency percentage
     total_processed = stats['new_files'] + stats['replaced_files'] + stats['skipped_files']
     if total_processed > 0:
         efficiency = (stats['skipped_files'] / total_processed) * 100
-        print(f"\n[EFFICIENCY] {efficiency:.1f}% of files were already up-to-date")
+        lines.append(f"\n[EFFICIENCY] {efficiency:.1f}% of files were already up-to-date")
+
+    # Write the whole report at once (one write instead of one per line); in
+    # DEBUG mode keep per-line print() so every line gets its [Main] prefix
+    if is_debug_enabled():
+        for line in lines:
+            if line:
+                print(line)
+            else:
+                print()
+    else:
+        sys.stdout.write('\n'.join(lines) + '\n')
 
     # Display rate limiting statistics
     print_rate_limiting_summary()
@@ -781,51 +1067,179 @@ def get_library_name_from_path(upload_path):
 # SYNC DELETION - Remove orphaned files from SharePoint
 # ====================================================================
 
+# Above this many SharePoint files, orphans are found by merging sorted path
+# lists instead of hashing (sequential access over shared path prefixes)
+SORTED_DIFF_THRESHOLD = 500_000
+
+
+def _sorted_path_difference(sp_paths, local_paths):
+    """
+    Find SharePoint paths missing from the local paths (case-insensitive) by a sorted merge.
+
+    Args:
+        sp_paths (list): SharePoint relative paths
+        local_paths (set): Local relative paths
+
+    Returns:
+        list: Paths from sp_paths with no casefolded match in local_paths,
+              in casefolded order
+    """
+    local_sorted = sorted(path.casefold() for path in local_paths)
+    local_count = len(local_sorted)
+    orphans = []
+    j = 0
+    for path in sorted(sp_paths, key=str.casefold):
+        key = path.casefold()
+        while j < local_count and local_sorted[j] < key:
+            j += 1
+        if j == local_count or local_sorted[j] != key:
+            orphans.append(path)
+    return orphans
+
+
 def identify_files_to_delete(sharepoint_files, local_files_set):
     """
     Identify SharePoint files that should be deleted (not in local sync set).
 
     Args:
-        sharepoint_files (list): List of file dicts from SharePoint (from list_files_in_folder_recursive)
+        sharepoint_files (list or dict): List of file dicts from SharePoint (from
+            list_files_in_folder_recursive), or the files dict of the SharePoint
+            cache ({path: entry}, from build_sharepoint_cache)
         local_files_set (set): Set of relative file paths from local sync set
 
-    Returns:
-        list: List of file dicts that should be deleted
+    Yields:
+        dict: File dicts that should be deleted ({'path', 'id', 'size', 'name', 'drive_item'}),
+              built one at a time so deletion can start before all are created
 
     Note:
         Compares SharePoint files with local sync set to identify orphaned files
         that no longer exist locally and should be deleted from SharePoint.
+        SharePoint paths are case-insensitive, so both sides are compared
+        casefolded, and the orphans are found with one set difference.
+        When given the cache dict, file dicts are only built for the orphans.
     """
-    files_to_delete = []
     debug_enabled = is_debug_enabled()
 
+    if isinstance(sharepoint_files, dict):
+        # Skip entries recorded as absent (None)
+        sp_paths = [path for path, info in sharepoint_files.items() if info is not None]
+
+        def to_file_dict(path):
+            # Convert cache entry to same format as list_files_in_folder_recursive
+            file_info = sharepoint_files[path]
+            return {
+                'path': path,
+                'id': file_info.get('item_id'),
+                'size': file_info.get('size'),
+                'name': file_info.get('name'),
+                'drive_item': None  # Not needed for deletion with Graph API
+            }
+    else:
+        files_by_path = {sp_file['path']: sp_file for sp_file in sharepoint_files}
+        sp_paths = list(files_by_path)
+        to_file_dict = files_by_path.__getitem__
+
+    # Normalize once: a file uploaded as 'Readme.html' over an existing
+    # 'README.html' keeps the remote casing and must not count as orphaned
+    if len(sp_paths) > SORTED_DIFF_THRESHOLD:
+        orphan_paths = _sorted_path_difference(sp_paths, local_files_set)
+    else:
+        local_keys = frozenset(path.casefold() for path in local_files_set)
+        sp_by_key = {path.casefold(): path for path in sp_paths}
+
+        # Orphans are a single set difference; sorted so deletions run in a stable order
+        orphan_paths = [sp_by_key[key] for key in sorted(sp_by_key.keys() - local_keys)]
+
     if debug_enabled:
-        print(f"\n[DEBUG] Comparing {len(sharepoint_files)} SharePoint files with {len(local_files_set)} local files...")
+        local_keys = frozenset(path.casefold() for path in local_files_set)
+        print(f"\n[DEBUG] Comparing {len(sp_paths)} SharePoint files with {len(local_files_set)} local files...")
         print(f"[DEBUG] SharePoint files:")
-        for sp_file in sharepoint_files:
-            print(f"  [SP] {sp_file['path']}")
+        print_lines(f"  [SP] {sp_path}" for sp_path in sp_paths)
         print(f"\n[DEBUG] Local files set:")
-        for local_path in sorted(local_files_set):
-            print(f"  [LOCAL] {local_path}")
+        print_lines(f"  [LOCAL] {local_path}" for local_path in sorted(local_files_set))
         print(f"\n[DEBUG] Starting comparison...")
+        print_lines(
+            f"  [✓] MATCHED: {sp_path}" if sp_path.casefold() in local_keys
+            else f"  [×] ORPHANED: {sp_path} (not in local sync set)"
+            for sp_path in sp_paths
+        )
+
+    for path in orphan_paths:
+        yield to_file_dict(path)
 
-    for sp_file in sharepoint_files:
-        # The path in SharePoint (relative to upload folder)
-        sp_path = sp_file['path']
 
-        # Check if this file exists in our local set
-        if sp_path not in local_files_set:
-            files_to_delete.append(sp_file)
+# Normalizes path separators to forward slashes (SharePoint style) in one
+# C-level pass: os.sep plus '\\' for Windows-style paths on any platform
+_TO_FORWARD_SLASHES = str.maketrans({'\\': '/', os.sep: '/'})
 
-            if debug_enabled:
-                print(f"  [×] ORPHANED: {sp_path} (not in local sync set)")
-        elif debug_enabled:
-            print(f"  [✓] MATCHED: {sp_path}")
 
-    return files_to_delete
+def _make_sharepoint_rel_path(base_path, convert_md):
+    """
+    Build a function mapping a local file to its sanitized SharePoint path.
 
+    base_path and convert_md are fixed for a whole sync, so the returned
+    function is specialized for them up front and carries no per-file checks
+    for either. The result MUST match how upload_file_with_structure
+    calculates paths.
 
-def perform_sync_deletion(local_files, base_path, config, sharepoint_cache=None):
+    Args:
+        base_path (str): Base path for maintaining folder structure
+        convert_md (bool): Whether .md files are uploaded as .html
+
+    Returns:
+        callable: to_rel_path(local_file) -> relative path with forward
+                  slashes, as stored in SharePoint
+    """
+    relpath = os.path.relpath
+    translate = str.translate
+    sanitize = sanitize_path_components
+
+    if base_path:
+        # Calculate relative path from base_path (preserve folder structure!).
+        # relpath() normalizes and may call getcwd(), so it is computed once per
+        # directory and the file name appended
+        split = os.path.split
+        curdir = os.curdir
+        sep = os.sep
+        rel_dirs = {}
+
+        def to_forward_rel_path(local_file):
+            head, tail = split(local_file)
+            rel_dir = rel_dirs.get(head)
+            if rel_dir is None:
+                try:
+                    rel_dir = relpath(head or curdir, base_path)
+                except ValueError:
+                    # On Windows, relpath fails if paths are on different drives
+                    rel_dir = False
+                rel_dirs[head] = rel_dir
+            if rel_dir is False:
+                # Fall back to absolute path calculation
+                return translate(local_file, _TO_FORWARD_SLASHES)
+            rel_path = tail if rel_dir == curdir else rel_dir + sep + tail
+            return translate(rel_path, _TO_FORWARD_SLASHES)
+    else:
+        # No base_path means upload to root - use full path
+        def to_forward_rel_path(local_file):
+            return translate(local_file, _TO_FORWARD_SLASHES)
+
+    if convert_md:
+        def to_rel_path(local_file):
+            rel_path = to_forward_rel_path(local_file)
+            if local_file.lower().endswith('.md'):
+                # If converting .md to .html, the SharePoint file will be .html
+                rel_path = rel_path[:-3] + '.html'
+            # Sanitize path to match how uploader sanitizes
+            return sanitize(rel_path)
+    else:
+        def to_rel_path(local_file):
+            return sanitize(to_forward_rel_path(local_file))
+
+    return to_rel_path
+
+
+def perform_sync_deletion(local_files, base_path, config, sharepoint_cache=None, max_workers=None,
+                          should_stop=None, deleted_paths=None, log=print):
     """
     Delete files from SharePoint that are not in the local sync set.
 
@@ -835,6 +1249,13 @@ def perform_sync_deletion(local_files, base_path, config, sharepoint_cache=None)
         config: Configuration object
         sharepoint_cache (dict): Optional pre-built cache of SharePoint files
                                 If provided, eliminates API call to list files
+        max_workers (int): Max concurrent deletion batches (default: config.max_upload_workers)
+        should_stop (callable): Optional check made before each new batch; once it
+                                returns True, in-flight batches finish and the run stops
+        deleted_paths (set): Optional set of SharePoint paths already deleted; skipped
+                             here and extended with the files this run deletes
+        log (callable): Receives the result lines (default: print); debug output
+                        is always printed directly
 
     Returns:
         int: Number of files successfully deleted
@@ -850,7 +1271,7 @@ def perform_sync_deletion(local_files, base_path, config, sharepoint_cache=None)
 
     # Step 1: Get list of files currently in SharePoint folder
     # Use cache if available (eliminates API call), otherwise query SharePoint
-    print("\n[*] Checking for orphaned files...")
+    log("\n[*] Checking for orphaned files...")
     if sharepoint_cache is not None:
         # Extract files from cache - handle both old and new structure
         # Old structure: direct dict of files
@@ -859,18 +1280,9 @@ def perform_sync_deletion(local_files, base_path, config, sharepoint_cache=None)
         if isinstance(sharepoint_cache, dict) and 'files' in sharepoint_cache:
             files_cache = sharepoint_cache['files']
 
-        # Convert cache to same format as list_files_in_folder_recursive
-        # Cache format: {"path/to/file.html": {"item_id": "...", "size": ..., "name": "..."}}
-        # Need format: [{"path": "path/to/file.html", "id": "...", "size": ..., "name": "...", "drive_item": None}]
-        sharepoint_files = []
-        for file_path, file_info in files_cache.items():
-            sharepoint_files.append({
-                'path': file_path,
-                'id': file_info.get('item_id'),
-                'size': file_info.get('size'),
-                'name': file_info.get('name'),
-                'drive_item': None  # Not needed for deletion with Graph API
-            })
+        # Compared directly against the local set; file dicts are only built
+        # for orphans (see identify_files_to_delete)
+        sharepoint_files = files_cache
         if debug_enabled:
             print(f"[DEBUG] Using cached SharePoint file list: {len(sharepoint_files)} files")
     else:
@@ -885,96 +1297,129 @@ def perform_sync_deletion(local_files, base_path, config, sharepoint_cache=None)
                 config.client_id,
                 config.client_secret,
                 config.login_endpoint,
-                config.graph_endpoint
+                config.graph_endpoint,
+                max_workers=config.max_upload_workers
             )
-            print(f"[OK] Found {len(sharepoint_files)} files in SharePoint")
+            log(f"[OK] Found {len(sharepoint_files)} files in SharePoint")
         except Exception as e:
-            print(f"[!] Failed to list SharePoint files: {str(e)}")
+            log(f"[!] Failed to list SharePoint files: {str(e)}")
             return 0
 
     # Step 2: Build set of local file relative paths
     # Need to calculate the relative paths the same way upload does
-    local_files_set = set()
-
     if debug_enabled:
         print(f"\n[DEBUG] Building local file set (base_path: {base_path})...")
 
-    for local_file in local_files:
-        # Calculate relative path from base_path (preserve folder structure!)
-        # This MUST match how upload_file_with_structure calculates paths
-        if base_path:
-            try:
-                rel_path = os.path.relpath(local_file, base_path)
-            except ValueError:
-                # On Windows, relpath fails if paths are on different drives
-                # Fall back to absolute path calculation
-                rel_path = local_file
-        else:
-            # No base_path means upload to root - use full path
-            rel_path = local_file
-
-        # Normalize path separators to forward slashes (SharePoint style)
-        rel_path = rel_path.replace(os.sep, '/')
-        rel_path = rel_path.replace('\\', '/')  # Extra safety for Windows paths
-
-        # Handle markdown to HTML conversion
-        if local_file.lower().endswith('.md') and config.convert_md_to_html:
-            # If converting .md to .html, the SharePoint file will be .html
-            rel_path = rel_path[:-3] + '.html'
-
-        # Sanitize path to match how uploader sanitizes
-        from sharepoint_sync.file_handler import sanitize_path_components
-        rel_path = sanitize_path_components(rel_path)
-
-        local_files_set.add(rel_path)
-
-        if debug_enabled:
-            print(f"  [+] Local: {local_file} → {rel_path}")
+    to_rel_path = _make_sharepoint_rel_path(base_path, config.convert_md_to_html)
+    local_files_set = set(map(to_rel_path, local_files))
+    if deleted_paths:
+        # Already deleted by an earlier run that was stopped
+        local_files_set |= deleted_paths
 
     if debug_enabled:
+        print_lines(
+            f"  [+] Local: {local_file} → {to_rel_path(local_file)}"
+            for local_file in local_files
+        )
         print(f"\n[DEBUG] Local files set contains {len(local_files_set)} items")
         print(f"[DEBUG] SharePoint returned {len(sharepoint_files)} items")
 
-    # Step 3: Identify files to delete
-    files_to_delete = identify_files_to_delete(sharepoint_files, local_files_set)
+    # Step 3: Identify files to delete (streamed straight into the deletion below)
+    # Steady state: every cached path is still synced, so there is nothing to
+    # compare (an exact-case superset check; case-only differences fall through)
+    if isinstance(sharepoint_files, dict) and local_files_set >= sharepoint_files.keys():
+        first_orphan = None
+    else:
+        files_to_delete = identify_files_to_delete(sharepoint_files, local_files_set)
+        first_orphan = next(files_to_delete, None)
 
-    if not files_to_delete:
+    if first_orphan is None:
         sync_delete_elapsed = time.time() - sync_delete_start
-        print(f"\n[✓] No orphaned files to delete from SharePoint ({sync_delete_elapsed:.3f}s)")
+        log(f"\n[✓] No orphaned files to delete from SharePoint ({sync_delete_elapsed:.3f}s)")
         return 0
+    orphan_count = 0
+
+    def count_orphans(orphans):
+        # Running total of the streamed orphans, for the summary line
+        nonlocal orphan_count
+        for file_info in orphans:
+            orphan_count += 1
+            yield file_info
+
+    files_to_delete = count_orphans(itertools.chain((first_orphan,), files_to_delete))
 
     # Step 4: Delete orphaned files (or show what would be deleted in WhatIf mode)
+    # The total is reported once all orphans have been processed
     if config.sync_delete_whatif:
-        print(f"\n[!] Found {len(files_to_delete)} orphaned files (WhatIf mode - no actual deletions will occur)")
+        log(f"\n[!] Found orphaned files (WhatIf mode - no actual deletions will occur)")
     else:
-        print(f"\n[!] Found {len(files_to_delete)} orphaned files to delete from SharePoint")
+        log(f"\n[!] Found orphaned files to delete from SharePoint")
 
     deleted_count = 0
-    for file_info in files_to_delete:
-        try:
-            success = delete_file_from_sharepoint(
-                file_info['drive_item'],
-                file_info['path'],
-                whatif=config.sync_delete_whatif,
-                file_id=file_info['id'],
-                site_url=config.tenant_url,
-                tenant_id=config.tenant_id,
-                client_id=config.client_id,
-                client_secret=config.client_secret,
-                login_endpoint=config.login_endpoint,
-                graph_endpoint=config.graph_endpoint
-            )
-            if success:
+    if config.sync_delete_whatif:
+        for file_info in files_to_delete:
+            if delete_file_from_sharepoint(file_info['drive_item'], file_info['path'], whatif=True):
                 deleted_count += 1
                 upload_stats.stats['deleted_files'] += 1
+    else:
+        # Delete in $batch requests of up to 20 files (Graph API limit),
+        # sending up to max_upload_workers batches concurrently. At most two
+        # batches per worker are queued, so orphans are only turned into file
+        # dicts as the deletions catch up
+        max_workers = max_workers or config.max_upload_workers
+        max_pending = max_workers * 2
+
+        # Authenticate once for all batches instead of once per batch
+        try:
+            token = acquire_token(config.tenant_id, config.client_id, config.client_secret,
+                                  config.login_endpoint, config.graph_endpoint)
         except Exception as e:
-            print(f"[!] Error deleting {file_info['path']}: {str(e)}")
+            log(f"[!] Failed to acquire token for sync deletion: {str(e)}")
+            return 0
+
+        stopped = False
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            while True:
+                if not stopped and should_stop is not None and should_stop():
+                    stopped = True
+                batch = [] if stopped else list(itertools.islice(files_to_delete, DELETE_BATCH_SIZE))
+                if batch:
+                    pending.add(executor.submit(
+                        delete_files_batch,
+                        batch,
+                        config.tenant_id,
+                        config.client_id,
+                        config.client_secret,
+                        config.login_endpoint,
+                        config.graph_endpoint,
+                        max_retries=config.max_retry,
+                        token=token,
+                        log=log
+                    ))
+                    if len(pending) < max_pending:
+                        continue
+                elif not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_deleted = [path for path, success in future.result().items() if success]
+                    deleted_count += len(batch_deleted)
+                    upload_stats.stats['deleted_files'] += len(batch_deleted)
+                    if deleted_paths is not None:
+                        deleted_paths.update(batch_deleted)
+
+        if stopped:
+            sync_delete_elapsed = time.time() - sync_delete_start
+            log(f"\n[!] Sync deletion paused after deleting {deleted_count} orphaned files ({sync_delete_elapsed:.3f}s)")
+            return deleted_count
 
     sync_delete_elapsed = time.time() - sync_delete_start
     if config.sync_delete_whatif:
-        print(f"\n[✓] WhatIf: Would delete {deleted_count} orphaned files from SharePoint ({sync_delete_elapsed:.3f}s)")
+        log(f"\n[✓] WhatIf: Would delete {deleted_count} of {orphan_count} orphaned files from SharePoint ({sync_delete_elapsed:.3f}s)")
     else:
-        print(f"\n[✓] Successfully deleted {deleted_count} orphaned files from SharePoint ({sync_delete_elapsed:.3f}s)")
+        log(f"\n[✓] Successfully deleted {deleted_count} of {orphan_count} orphaned files from SharePoint ({sync_delete_elapsed:.3f}s)")
     return deleted_count
 
 
@@ -991,7 +1436,9 @@ def main():
         2. Discover files matching the pattern
         3. Connect to SharePoint and verify FileHash column
         4. Calculate base path for folder structure preservation
-        5. Process each file (with markdown conversion if enabled)
+        5. Process each file (with markdown conversion if enabled), deleting
+           orphaned files alongside once uploads have started cleanly when
+           sync deletion is enabled
         6. Print summary statistics
         7. Exit with appropriate code
     """
@@ -1003,12 +1450,20 @@ def main():
         os.environ['DEBUG'] = 'true'
     if config.debug_metadata:
         os.environ['DEBUG_METADATA'] = 'true'
+    refresh_debug_flags()
+
+    # Size the shared HTTP connection pool for the upload workers. With 'auto',
+    # size it for the most workers tuning can pick, then measure the latency
+    # over the configured session so the probe's connection is reused
+    if config.auto_upload_workers:
+        configure_http_session(MAX_UPLOAD_WORKERS)
+        config = tune_upload_workers(config)
+    else:
+        configure_http_session(config.max_upload_workers)
 
     # Display system configuration stats box
-    print("\n" + "="*60)
-    print("[✓] SYSTEM CONFIGURATION")
-    print("="*60)
-    cpu_count = os.cpu_count() or 4
+    print_banner("[✓] SYSTEM CONFIGURATION")
+    cpu_count = get_available_cpu_count()
     print(f"CPU Cores Available:       {cpu_count}")
     print(f"Upload Workers:            {config.max_upload_workers} (concurrent uploads)")
     print(f"Markdown Workers:          {config.max_markdown_workers} (parallel conversion)")
@@ -1017,9 +1472,7 @@ def main():
     # ============================================================
     # [1/5] CONFIGURATION
     # ============================================================
-    print("\n" + "="*60)
-    print("[1/5] CONFIGURATION")
-    print("="*60)
+    print_banner("[1/5] CONFIGURATION")
 
     # Show sync mode
     if config.force_upload:
@@ -1053,17 +1506,17 @@ def main():
     # [2/5] FILE DISCOVERY
     # ============================================================
     discovery_start = time.time()
-    print("\n" + "="*60)
-    print("[2/5] FILE DISCOVERY")
-    print("="*60)
+    print_banner("[2/5] FILE DISCOVERY")
     print(f"[*] Working directory: {os.getcwd()}")
     print(f"[*] Pattern: {config.file_path} {'(recursive)' if config.recursive else ''}")
 
     # Discover files based on glob pattern and exclusions
-    local_files, local_dirs = discover_files(
+    # (also yields the base path for maintaining folder structure)
+    local_files, local_dirs, base_path = discover_files(
         config.file_path,
         config.recursive,
-        config.exclude_patterns_list
+        config.exclude_patterns_list,
+        exclude_matcher=config.exclude_matcher
     )
 
     if not local_files:
@@ -1073,16 +1526,11 @@ def main():
     discovery_elapsed = time.time() - discovery_start
     print(f"[✓] Found {len(local_files)} files to process ({discovery_elapsed:.3f}s)")
 
-    # Calculate base path for maintaining folder structure
-    base_path = calculate_base_path(local_files, local_dirs)
-
     # ============================================================
     # [3/5] SHAREPOINT CONNECTION
     # ============================================================
     connection_start = time.time()
-    print("\n" + "="*60)
-    print("[3/5] SHAREPOINT CONNECTION")
-    print("="*60)
+    print_banner("[3/5] SHAREPOINT CONNECTION")
     print("[*] Connecting to SharePoint...")
     try:
         # Get drive item using Graph REST API
@@ -1148,9 +1596,7 @@ def main():
         # - Smart sync mode (need file comparisons)
         # - Sync deletion enabled (need list of SharePoint files)
         cache_start = time.time()
-        print("\n" + "="*60)
-        print("[4/5] BUILDING METADATA CACHE")
-        print("="*60)
+        print_banner("[4/5] BUILDING METADATA CACHE")
         try:
             from sharepoint_sync.graph_api import build_sharepoint_cache
 
@@ -1176,38 +1622,89 @@ def main():
     # ============================================================
     # [5/5] FILE PROCESSING
     # ============================================================
-    print("\n" + "="*60)
-    print("[5/5] FILE PROCESSING")
-    print("="*60)
+    print_banner("[5/5] FILE PROCESSING")
 
     # Parallel upload - process all files concurrently
     # Track converted files to avoid uploading .md files when .html versions exist
     converted_md_files = set()
 
     # Initialize parallel uploader with auto-detected workers
-    parallel_uploader = ParallelUploader(
-        max_workers=config.max_upload_workers,
+    parallel_uploader = ParallelUploader.from_config(
+        config,
         upload_stats_instance=upload_stats,
         batch_metadata_updates=True  # Always use batch metadata updates
     )
 
+    # Reuse local file hashes from previous runs for unchanged files (opt-in)
+    open_hash_cache(config.hash_cache_path)
+
+    # Orphans are determined from the cache snapshot alone, so once the upload
+    # phase has started cleanly, real deletions run alongside the uploads. One
+    # batch is in flight at a time to stay within the Graph throttling budget
+    # the upload workers are already using. Deletion pauses at the first failed
+    # upload (the rest is deleted after the uploads, as before) and stops if the
+    # upload phase raises. Its output is printed after the upload summary.
+    # WhatIf previews and uncached runs (which list SharePoint) still run afterwards.
+    deletion_executor = None
+    deletion_future = None
+    deletion_log = []
+    deleted_paths = set()
+    stop_deletion = threading.Event()
+    start_deletion = None
+    if config.sync_delete and not config.sync_delete_whatif and sharepoint_cache is not None:
+        deletion_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Delete")
+
+        def should_stop_deletion():
+            if parallel_uploader.upload_failed.is_set():
+                stop_deletion.set()
+            return stop_deletion.is_set()
+
+        def start_deletion():
+            nonlocal deletion_future
+            deletion_future = deletion_executor.submit(
+                perform_sync_deletion, local_files, base_path, config, sharepoint_cache,
+                max_workers=1, should_stop=should_stop_deletion,
+                deleted_paths=deleted_paths, log=deletion_log.append
+            )
+
     # Process all files in parallel
-    failed_count = parallel_uploader.process_files(
-        local_files,
-        site_id,
-        drive_id,
-        root_item_id,
-        base_path,
-        config,
-        filehash_column_available,
-        library_name,
-        converted_md_files,
-        sharepoint_cache  # Pass cache for instant file lookups
-    )
+    try:
+        failed_count = parallel_uploader.process_files(
+            local_files,
+            site_id,
+            drive_id,
+            root_item_id,
+            base_path,
+            config,
+            filehash_column_available,
+            library_name,
+            converted_md_files,
+            sharepoint_cache,  # Pass cache for instant file lookups
+            on_uploads_started=start_deletion
+        )
+        # Forget files that are no longer synced (only after a complete pass)
+        prune_hash_cache()
+    except BaseException:
+        # Let in-flight deletion batches finish, but start no new ones
+        stop_deletion.set()
+        raise
+    finally:
+        close_hash_cache()
+        if deletion_executor is not None:
+            deletion_executor.shutdown(wait=True)
 
     # Perform sync deletion if enabled
-    if config.sync_delete:
-        perform_sync_deletion(local_files, base_path, config, sharepoint_cache)
+    deletion_error = None
+    if deletion_future is not None:
+        print_lines(deletion_log)
+        deletion_error = deletion_future.exception()
+        if deletion_error is not None:
+            print(f"[!] Sync deletion failed: {str(deletion_error)} - retrying after uploads")
+    if config.sync_delete and (deletion_future is None or stop_deletion.is_set()
+                               or deletion_error is not None):
+        # Never started, paused by a failed upload, or failed
+        perform_sync_deletion(local_files, base_path, config, sharepoint_cache,
+                              deleted_paths=deleted_paths)
 
     # Print final summary report
     # Pass whatif mode status for proper deletion statistics labeling
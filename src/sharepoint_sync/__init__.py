@@ -13,6 +13,7 @@ Modules:
 - auth: Microsoft authentication
 - graph_api: Microsoft Graph API operations
 - file_handler: File operations (hashing, sanitization, comparison)
+- hash_cache: Persistent local hash cache reused across runs
 - uploader: Upload operations and folder management
 - markdown_converter: Markdown to HTML conversion with Mermaid diagrams
 - monitoring: Rate limiting monitoring and statistics tracking
@@ -5,7 +5,246 @@ Microsoft authentication module for SharePoint sync.
 This module handles Azure AD authentication using MSAL (Microsoft Authentication Library).
 """
 
-import msal
+import time
+import threading
+from dataclasses import dataclass, field
+
+from .thread_utils import print_lines
+
+# MSAL apps created so far, keyed by (authority_url, client_id, client_secret).
+# Reusing the app lets MSAL serve still-valid tokens from its in-memory cache.
+_APP_CACHE = {}
+_APP_LOCK = threading.Lock()
+
+# Token providers, keyed by acquire_token()'s arguments
+_TOKEN_PROVIDERS = {}
+
+# A token is treated as expired this many seconds before its actual expiry
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+
+@dataclass(frozen=True, slots=True)
+class Token:
+    """
+    Access token returned by acquire_token().
+
+    Holds only what callers use, instead of MSAL's full response dict.
+    """
+
+    access_token: str
+    token_type: str
+    expires_at: float  # time.time() at which the token expires
+
+    # Authorization header value, built once per token (computed in __post_init__)
+    authorization: str = field(init=False)
+
+    def __post_init__(self):
+        """Build the header value once (frozen, so bypass __setattr__)."""
+        object.__setattr__(self, 'authorization', f"{self.token_type} {self.access_token}")
+
+
+class TokenProvider:
+    """
+    Serve a client-credentials token to many threads, refreshing it ahead of expiry.
+
+    The token is handed out without calling MSAL until its refresh point
+    (MSAL's 'refresh_in' hint, or half its lifetime). After that one caller
+    refreshes it while the others keep using the still-valid current token;
+    callers only wait when there is no valid token at all.
+    """
+
+    def __init__(self, app, scopes):
+        """
+        Args:
+            app (msal.ConfidentialClientApplication): App to acquire tokens with
+            scopes (list): Scopes to request
+        """
+        self._app = app
+        self._scopes = scopes
+        self._lock = threading.Lock()
+        self._token = None
+        self._refresh_at = 0
+        self._expires_at = 0
+
+    def get(self):
+        """
+        Get the current token, refreshing it if due.
+
+        Returns:
+            Token: Current token, or MSAL's error dict if no valid token could be acquired
+        """
+        token = self._token
+        if token is not None and time.time() < self._refresh_at:
+            return token
+
+        if token is not None and time.time() < self._expires_at:
+            # Refresh due but the current token is still valid - let one
+            # caller refresh it instead of stalling every worker
+            if not self._lock.acquire(blocking=False):
+                return token
+        else:
+            self._lock.acquire()
+
+        try:
+            # Another caller may have refreshed while we waited for the lock
+            if self._token is not None and time.time() < self._refresh_at:
+                return self._token
+
+            result = self._app.acquire_token_for_client(scopes=self._scopes)
+            if "access_token" in result:
+                now = time.time()
+                expires_in = int(result.get("expires_in", 3600))
+                self._token = Token(result["access_token"], result.get("token_type", "Bearer"), now + expires_in)
+                self._expires_at = now + expires_in - TOKEN_EXPIRY_MARGIN_SECONDS
+                self._refresh_at = now + int(result.get("refresh_in", expires_in // 2))
+                return self._token
+            if self._token is not None and time.time() < self._expires_at:
+                # Refresh failed - keep serving the current token until it expires
+                return self._token
+            return result
+        finally:
+            self._lock.release()
+
+
+def _explain_invalid_client(login_endpoint, graph_endpoint):
+    """Troubleshooting steps for rejected client credentials."""
+    lines = [
+        "[!] Error: Invalid client credentials",
+        "[!] ",
+        "[!] Troubleshooting steps:",
+        "[!]   1. Verify your CLIENT_ID is correct (check Azure AD app registration)",
+        "[!]   2. Verify your CLIENT_SECRET is correct and hasn't been copied with extra spaces",
+        "[!]   3. Check if the client secret has expired in Azure AD portal",
+        "[!]   4. Ensure you're using the correct TENANT_ID",
+    ]
+    return "Invalid client credentials", lines
+
+
+def _explain_unauthorized_client(login_endpoint, graph_endpoint):
+    """Troubleshooting steps for an app without the required permissions."""
+    lines = [
+        "[!] Error: Application not authorized",
+        "[!] ",
+        "[!] Troubleshooting steps:",
+        "[!]   1. Go to Azure AD portal → App registrations → Your app",
+        "[!]   2. Navigate to 'API permissions'",
+        "[!]   3. Verify 'Microsoft Graph' permissions are added:",
+        "[!]      - Sites.ReadWrite.All (minimum)",
+        "[!]      - Sites.Manage.All or Sites.FullControl.All (for FileHash column)",
+        "[!]   4. Click 'Grant admin consent' button (requires admin privileges)",
+    ]
+    return "Application not authorized", lines
+
+
+def _explain_invalid_scope(login_endpoint, graph_endpoint):
+    """Troubleshooting steps for a wrong Graph endpoint."""
+    lines = [
+        "[!] Error: Invalid scope requested",
+        "[!] ",
+        "[!] Troubleshooting steps:",
+        f"[!]   1. Verify Graph API endpoint is correct: {graph_endpoint}",
+        "[!]   2. For commercial cloud, use: graph.microsoft.com",
+        "[!]   3. For GovCloud, use: graph.microsoft.us",
+        "[!]   4. For GovCloud High, use: graph.microsoft.us",
+    ]
+    return "Invalid scope", lines
+
+
+def _explain_invalid_request(login_endpoint, graph_endpoint):
+    """Troubleshooting steps for a malformed tenant or login endpoint."""
+    lines = [
+        "[!] Error: Invalid authentication request",
+        "[!] ",
+        "[!] Troubleshooting steps:",
+        "[!]   1. Verify TENANT_ID format (should be a GUID like: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx)",
+        f"[!]   2. Verify login endpoint is correct: {login_endpoint}",
+        "[!]   3. For commercial cloud, use: login.microsoftonline.com",
+        "[!]   4. For GovCloud, use: login.microsoftonline.us",
+    ]
+    return "Invalid request", lines
+
+
+def _explain_generic_auth_error(error_msg, error_desc, error_codes):
+    """Common causes for an authentication error without a specific handler (lines to print)."""
+    lines = [
+        f"[!] Error: {error_msg}",
+        "[!] ",
+        "[!] Common issues:",
+        "[!]   - Network connectivity problems",
+        "[!]   - Firewall blocking access to Microsoft identity platform",
+        "[!]   - Incorrect tenant ID or endpoint configuration",
+        "[!] ",
+        "[!] Technical details:",
+        f"[!]   Error: {error_msg}",
+        f"[!]   Description: {error_desc}",
+    ]
+    if error_codes:
+        lines.append(f"[!]   Error codes: {error_codes}")
+    lines.append("[!] ========================================")
+    return lines
+
+
+# Known authentication errors, checked in order:
+# (error substring, AADSTS error code, error_description marker, handler)
+# Each handler returns a short reason and the troubleshooting lines to print
+_AUTH_ERROR_HANDLERS = (
+    ("invalid_client", 7000215, None, _explain_invalid_client),
+    ("unauthorized_client", 700016, None, _explain_unauthorized_client),
+    ("invalid_scope", None, "AADSTS70011", _explain_invalid_scope),
+    ("invalid_request", None, None, _explain_invalid_request),
+)
+
+
+def _create_token_provider(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint):
+    """
+    Get or create the TokenProvider for a credential set and Graph endpoint.
+
+    Args:
+        tenant_id (str): Azure AD tenant ID
+        client_id (str): Application (client) ID
+        client_secret (str): Client secret value
+        login_endpoint (str): Azure AD authentication endpoint
+        graph_endpoint (str): Microsoft Graph API endpoint
+
+    Returns:
+        TokenProvider: Provider registered in _TOKEN_PROVIDERS
+    """
+    # Build the Azure AD authority URL
+    # Format: https://login.microsoftonline.com/{tenant_id}
+    authority_url = f'https://{login_endpoint}/{tenant_id}'
+
+    # Token requests share the Graph connection pool (imported here to avoid
+    # a circular import - graph_api imports this module)
+    from .graph_api import SESSION
+
+    provider_key = (tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
+    app_key = (authority_url, client_id, client_secret)
+    with _APP_LOCK:
+        provider = _TOKEN_PROVIDERS.get(provider_key)
+        if provider is not None:
+            return provider
+
+        # Create MSAL confidential client application (once per credential set)
+        # 'Confidential' means it can securely store credentials (unlike public/mobile apps)
+        app = _APP_CACHE.get(app_key)
+        if app is None:
+            # Imported on first use: msal pulls in cryptography and PyJWT, which
+            # runs that fail before authenticating never need
+            import msal
+
+            app = msal.ConfidentialClientApplication(
+                authority=authority_url,           # Azure AD endpoint
+                client_id=client_id,              # Your app registration's ID
+                client_credential=client_secret,   # Your app's secret key
+                http_client=SESSION,               # Reuse pooled TCP/TLS connections
+                validate_authority=False           # Endpoint comes from config; skip instance discovery
+            )
+            _APP_CACHE[app_key] = app
+
+        # '/.default' scope means "use all permissions granted to this app"
+        provider = TokenProvider(app, [f"https://{graph_endpoint}/.default"])
+        _TOKEN_PROVIDERS[provider_key] = provider
+        return provider
 
 
 def acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint):
@@ -23,114 +262,56 @@ def acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_end
         graph_endpoint (str): Microsoft Graph API endpoint (e.g., 'graph.microsoft.com')
 
     Returns:
-        dict: Token dictionary containing:
-            - 'access_token': The JWT token to authenticate API calls
-            - 'token_type': Usually 'Bearer'
-            - 'expires_in': Token lifetime in seconds
+        Token: Token with:
+            - access_token: The JWT token to authenticate API calls
+            - token_type: Usually 'Bearer'
+            - expires_at: time.time() at which the token expires
+            - authorization: Authorization header value ("Bearer <token>")
 
     Raises:
         Exception: If authentication fails (wrong credentials, network issues, etc.)
 
     Example:
         token = acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
-        headers = {'Authorization': f"{token['token_type']} {token['access_token']}"}
+        headers = {'Authorization': token.authorization}
 
     Note:
         This uses the client credentials flow, suitable for automated scripts.
         The app registration must have Graph API Sites.ReadWrite.All permission.
+        The MSAL app is created once per credential set, and tokens are served
+        by a shared TokenProvider that refreshes them ahead of expiry.
     """
-    # Build the Azure AD authority URL
-    # Format: https://login.microsoftonline.com/{tenant_id}
-    authority_url = f'https://{login_endpoint}/{tenant_id}'
-
-    # Create MSAL confidential client application
-    # 'Confidential' means it can securely store credentials (unlike public/mobile apps)
-    app = msal.ConfidentialClientApplication(
-        authority=authority_url,           # Azure AD endpoint
-        client_id=client_id,              # Your app registration's ID
-        client_credential=client_secret    # Your app's secret key
-    )
+    # Providers are keyed by the raw arguments, so the hot path is one dict
+    # lookup - URLs and scopes are only formatted when a provider is created
+    provider = _TOKEN_PROVIDERS.get((tenant_id, client_id, client_secret, login_endpoint, graph_endpoint))
+    if provider is None:
+        provider = _create_token_provider(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
 
     # Request an access token for Microsoft Graph API
-    # '/.default' scope means "use all permissions granted to this app"
-    token = app.acquire_token_for_client(scopes=[f"https://{graph_endpoint}/.default"])
-
-    # Check for authentication errors (MSAL returns errors in the token dict, not as exceptions)
-    if "access_token" not in token:
-        error_msg = token.get("error", "unknown_error")
-        error_desc = token.get("error_description", "No description provided")
-        error_codes = token.get("error_codes", [])
-
-        # Provide user-friendly error messages based on error type
-        print("[!] ========================================")
-        print("[!] AUTHENTICATION FAILED")
-        print("[!] ========================================")
-
-        if "invalid_client" in error_msg or 7000215 in error_codes:
-            print("[!] Error: Invalid client credentials")
-            print("[!] ")
-            print("[!] Troubleshooting steps:")
-            print("[!]   1. Verify your CLIENT_ID is correct (check Azure AD app registration)")
-            print("[!]   2. Verify your CLIENT_SECRET is correct and hasn't been copied with extra spaces")
-            print("[!]   3. Check if the client secret has expired in Azure AD portal")
-            print("[!]   4. Ensure you're using the correct TENANT_ID")
-            print(f"[!] ")
-            print(f"[!] Technical details: {error_desc}")
-            raise Exception(f"Authentication failed: Invalid client credentials - {error_desc}")
-
-        elif "unauthorized_client" in error_msg or 700016 in error_codes:
-            print("[!] Error: Application not authorized")
-            print("[!] ")
-            print("[!] Troubleshooting steps:")
-            print("[!]   1. Go to Azure AD portal → App registrations → Your app")
-            print("[!]   2. Navigate to 'API permissions'")
-            print("[!]   3. Verify 'Microsoft Graph' permissions are added:")
-            print("[!]      - Sites.ReadWrite.All (minimum)")
-            print("[!]      - Sites.Manage.All or Sites.FullControl.All (for FileHash column)")
-            print("[!]   4. Click 'Grant admin consent' button (requires admin privileges)")
-            print(f"[!] ")
-            print(f"[!] Technical details: {error_desc}")
-            raise Exception(f"Authentication failed: Application not authorized - {error_desc}")
-
-        elif "invalid_scope" in error_msg or "AADSTS70011" in error_desc:
-            print("[!] Error: Invalid scope requested")
-            print("[!] ")
-            print("[!] Troubleshooting steps:")
-            print(f"[!]   1. Verify Graph API endpoint is correct: {graph_endpoint}")
-            print("[!]   2. For commercial cloud, use: graph.microsoft.com")
-            print("[!]   3. For GovCloud, use: graph.microsoft.us")
-            print("[!]   4. For GovCloud High, use: graph.microsoft.us")
-            print(f"[!] ")
-            print(f"[!] Technical details: {error_desc}")
-            raise Exception(f"Authentication failed: Invalid scope - {error_desc}")
-
-        elif "invalid_request" in error_msg:
-            print("[!] Error: Invalid authentication request")
-            print("[!] ")
-            print("[!] Troubleshooting steps:")
-            print(f"[!]   1. Verify TENANT_ID format (should be a GUID like: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx)")
-            print(f"[!]   2. Verify login endpoint is correct: {login_endpoint}")
-            print("[!]   3. For commercial cloud, use: login.microsoftonline.com")
-            print("[!]   4. For GovCloud, use: login.microsoftonline.us")
-            print(f"[!] ")
-            print(f"[!] Technical details: {error_desc}")
-            raise Exception(f"Authentication failed: Invalid request - {error_desc}")
+    token = provider.get()
 
-        else:
-            # Generic error message for unknown error types
-            print(f"[!] Error: {error_msg}")
-            print("[!] ")
-            print("[!] Common issues:")
-            print("[!]   - Network connectivity problems")
-            print("[!]   - Firewall blocking access to Microsoft identity platform")
-            print("[!]   - Incorrect tenant ID or endpoint configuration")
-            print(f"[!] ")
-            print(f"[!] Technical details:")
-            print(f"[!]   Error: {error_msg}")
-            print(f"[!]   Description: {error_desc}")
-            if error_codes:
-                print(f"[!]   Error codes: {error_codes}")
-            print("[!] ========================================")
-            raise Exception(f"Authentication failed: {error_msg} - {error_desc}")
-
-    return token
+    # MSAL returns errors in the token dict, not as exceptions
+    if isinstance(token, Token):
+        return token
+
+    error_msg = token.get("error", "unknown_error")
+    error_desc = token.get("error_description", "No description provided")
+    error_codes = token.get("error_codes", [])
+
+    # Provide user-friendly error messages based on error type, written as one
+    # block so worker output can't interleave with it
+    header = [
+        "[!] ========================================",
+        "[!] AUTHENTICATION FAILED",
+        "[!] ========================================",
+    ]
+    for error_name, error_code, desc_marker, explain in _AUTH_ERROR_HANDLERS:
+        if (error_name in error_msg
+                or (error_code is not None and error_code in error_codes)
+                or (desc_marker is not None and desc_marker in error_desc)):
+            reason, lines = explain(login_endpoint, graph_endpoint)
+            print_lines(header + lines + ["[!] ", f"[!] Technical details: {error_desc}"])
+            raise Exception(f"Authentication failed: {reason} - {error_desc}")
+
+    print_lines(header + _explain_generic_auth_error(error_msg, error_desc, error_codes))
+    raise Exception(f"Authentication failed: {error_msg} - {error_desc}")
@@ -6,14 +6,136 @@ This module handles command-line argument parsing and configuration setup.
 """
 
 import sys
+from dataclasses import dataclass, field, replace
 
+from .file_handler import ExcludeMatcher, compile_exclude_patterns
+from .utils import get_available_cpu_count
 
+# Default commercial-cloud endpoints
+DEFAULT_LOGIN_ENDPOINT = "login.microsoftonline.com"
+DEFAULT_GRAPH_ENDPOINT = "graph.microsoft.com"
+
+# Action inputs arrive as these exact strings, so most flags skip lower()
+_BOOL_INPUTS = {"true": True, "false": False}
+
+# Upload worker limits (default respects Graph API concurrent request limits)
+DEFAULT_UPLOAD_WORKERS = 4
+MAX_UPLOAD_WORKERS = 10
+
+# Auto-tuning adds one upload worker per this much Graph round-trip time (ms)
+RTT_MS_PER_UPLOAD_WORKER = 25
+
+
+def _parse_bool(value):
+    """Parse a 'true'/'false' action input (case-insensitive; anything else is False)."""
+    parsed = _BOOL_INPUTS.get(value)
+    if parsed is None:
+        parsed = value.lower() == "true"
+    return parsed
+
+
+def _parse_upload_workers(value):
+    """Parse max_upload_workers, capped at 10 to respect Graph API limits."""
+    # Default 4 (Graph API concurrent request limit)
+    # WARNING: Starting September 30, 2025, Microsoft will reduce per-app/per-user
+    # throttling limits to HALF the total per-tenant limit. Monitor for increased
+    # 429 responses after this date. Default of 4 workers should remain safe.
+    if _parse_auto_upload_workers(value):
+        return DEFAULT_UPLOAD_WORKERS  # Until tune_upload_workers() measures the latency
+    return min(int(value), MAX_UPLOAD_WORKERS)
+
+
+def _parse_auto_upload_workers(value):
+    """Parse whether max_upload_workers asks for auto-tuning ('auto')."""
+    return value.strip().lower() == "auto"
+
+
+# Positional arguments: (field name, argv index, parser)
+# Missing arguments keep the field's default. Empty strings also keep the
+# default, except for boolean flags, where an empty value means False.
+ARGV_SCHEMA = (
+    ('site_name', 1, str),
+    ('sharepoint_host_name', 2, str),
+    ('tenant_id', 3, str),
+    ('client_id', 4, str),
+    ('client_secret', 5, str),
+    ('upload_path', 6, str),
+    ('file_path', 7, str),
+    ('max_retry', 8, int),
+    ('login_endpoint', 9, str),
+    ('graph_endpoint', 10, str),
+    ('recursive', 11, _parse_bool),
+    ('force_upload', 12, _parse_bool),
+    ('convert_md_to_html', 13, _parse_bool),
+    ('force_md_to_html_regeneration', 14, _parse_bool),
+    ('exclude_patterns', 15, str),
+    ('sync_delete', 16, _parse_bool),
+    ('sync_delete_whatif', 17, _parse_bool),
+    ('max_upload_workers', 18, _parse_upload_workers),
+    ('auto_upload_workers', 18, _parse_auto_upload_workers),
+    ('debug', 19, _parse_bool),
+    ('debug_metadata', 20, _parse_bool),
+    ('hash_cache_path', 21, str),
+)
+
+# Required positional arguments (argv[1] - argv[7])
+REQUIRED_ARGC = 8
+REQUIRED_FIELDS = tuple(name for name, index, parse in ARGV_SCHEMA if index < REQUIRED_ARGC)
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration for SharePoint sync operations"""
+    """
+    Configuration for SharePoint sync operations.
+
+    Every value is parsed and typed once when the configuration is built
+    (see from_argv()), so the rest of the sync only reads plain bools, ints
+    and precompiled objects. Instances are immutable.
+    """
+
+    # Required arguments
+    site_name: str
+    sharepoint_host_name: str
+    tenant_id: str
+    client_id: str
+    client_secret: str
+    upload_path: str
+    file_path: str
+
+    # Optional arguments with defaults
+    max_retry: int = 3
+    login_endpoint: str = DEFAULT_LOGIN_ENDPOINT
+    graph_endpoint: str = DEFAULT_GRAPH_ENDPOINT
+    recursive: bool = False
+    force_upload: bool = False
+    convert_md_to_html: bool = True
+    force_md_to_html_regeneration: bool = False
+    exclude_patterns: str = ""
+    sync_delete: bool = False
+    sync_delete_whatif: bool = True
+    max_upload_workers: int = DEFAULT_UPLOAD_WORKERS
+    auto_upload_workers: bool = False
+    max_markdown_workers: int = 4
+    debug: bool = False
+    debug_metadata: bool = False
+    hash_cache_path: str = ""
+
+    # Derived values (computed in __post_init__)
+    tenant_url: str = field(init=False)
+    exclude_patterns_list: list = field(init=False)
+    exclude_matcher: ExcludeMatcher = field(init=False, repr=False)
 
-    def __init__(self):
+    def __post_init__(self):
+        """Compute derived values once (frozen, so bypass __setattr__)."""
+        exclude_patterns_list = [p.strip() for p in self.exclude_patterns.split(',') if p.strip()]
+        object.__setattr__(self, 'tenant_url', f'https://{self.sharepoint_host_name}/sites/{self.site_name}')
+        object.__setattr__(self, 'exclude_patterns_list', exclude_patterns_list)
+        object.__setattr__(self, 'exclude_matcher', compile_exclude_patterns(exclude_patterns_list))
+
+    @classmethod
+    def from_argv(cls, argv=None):
         """
-        Parse command-line arguments and initialize configuration.
+        Parse command-line arguments into a Config.
 
         Arguments are parsed from sys.argv in the following order:
         1. site_name - SharePoint site name
@@ -33,56 +155,43 @@ class Config:
         15. exclude_patterns (optional) - Comma-separated exclusion patterns (default: "")
         16. sync_delete (optional) - Delete SharePoint files not in sync set (default: False)
         17. sync_delete_whatif (optional) - Preview deletions without actually deleting (default: True)
-        18. max_upload_workers (optional) - Max concurrent uploads (default: 4, respects Graph API limits)
+        18. max_upload_workers (optional) - Max concurrent uploads (default: 4, respects Graph API limits;
+            'auto' sets auto_upload_workers, see tune_upload_workers())
         19. debug (optional) - Enable general debug output (default: False)
         20. debug_metadata (optional) - Enable metadata-specific debug output (default: False)
+        21. hash_cache_path (optional) - Local hash cache database, relative to $RUNNER_TEMP
+            unless absolute (default: "" - no cache)
+
+        Args:
+            argv (list): Argument vector to parse (default: sys.argv)
+
+        Returns:
+            Config: Parsed (not yet validated) configuration
+
+        Raises:
+            IndexError: If required arguments are missing
         """
-        # Required arguments
-        self.site_name = sys.argv[1]
-        self.sharepoint_host_name = sys.argv[2]
-        self.tenant_id = sys.argv[3]
-        self.client_id = sys.argv[4]
-        self.client_secret = sys.argv[5]
-        self.upload_path = sys.argv[6]
-        self.file_path = sys.argv[7]
-
-        # Optional arguments with defaults
-        self.max_retry = int(sys.argv[8]) if len(sys.argv) > 8 and sys.argv[8] else 3
-        self.login_endpoint = sys.argv[9] if len(sys.argv) > 9 and sys.argv[9] else "login.microsoftonline.com"
-        self.graph_endpoint = sys.argv[10] if len(sys.argv) > 10 and sys.argv[10] else "graph.microsoft.com"
-        self.recursive = (sys.argv[11] if len(sys.argv) > 11 else "false").lower() == "true"
-        self.force_upload = (sys.argv[12] if len(sys.argv) > 12 else "false").lower() == "true"
-        self.convert_md_to_html = (sys.argv[13] if len(sys.argv) > 13 else "true").lower() == "true"
-        self.force_md_to_html_regeneration = (sys.argv[14] if len(sys.argv) > 14 else "false").lower() == "true"
-        self.exclude_patterns = sys.argv[15] if len(sys.argv) > 15 and sys.argv[15] else ""
-        self.sync_delete = (sys.argv[16] if len(sys.argv) > 16 else "false").lower() == "true"
-        self.sync_delete_whatif = (sys.argv[17] if len(sys.argv) > 17 else "true").lower() == "true"
-
-        # Parallel processing configuration (auto-detect optimal values)
-        import os as os_module
-        cpu_count = os_module.cpu_count() or 4
-
-        # Max upload workers: Default 4 (Graph API concurrent request limit)
-        # Can be overridden but should not exceed 10 to respect API limits
-        # WARNING: Starting September 30, 2025, Microsoft will reduce per-app/per-user
-        # throttling limits to HALF the total per-tenant limit. Monitor for increased
-        # 429 responses after this date. Default of 4 workers should remain safe.
-        if len(sys.argv) > 18 and sys.argv[18]:
-            self.max_upload_workers = min(int(sys.argv[18]), 10)
-        else:
-            self.max_upload_workers = 4  # Safe default for Graph API
+        if argv is None:
+            argv = sys.argv
+
+        # Required arguments must be present (even if empty - validate() checks that)
+        if len(argv) < REQUIRED_ARGC:
+            raise IndexError(f"Expected at least {REQUIRED_ARGC - 1} arguments, got {len(argv) - 1}")
+
+        kwargs = {}
+        for name, index, parse in ARGV_SCHEMA:
+            if len(argv) <= index:
+                continue  # Optional argument not given - keep the field default
+            raw = argv[index]
+            if not raw and index >= REQUIRED_ARGC and parse is not _parse_bool:
+                continue  # Empty optional value - keep the field default
+            kwargs[name] = parse(raw)
 
         # Max markdown workers: Default 4 (mermaid-cli subprocess limit)
         # Balance between parallelism and Chromium memory usage
-        self.max_markdown_workers = min(4, cpu_count)
-
-        # Debug flags
-        self.debug = (sys.argv[19] if len(sys.argv) > 19 else "false").lower() == "true"
-        self.debug_metadata = (sys.argv[20] if len(sys.argv) > 20 else "false").lower() == "true"
+        kwargs['max_markdown_workers'] = min(4, get_available_cpu_count())
 
-        # Derived values
-        self.tenant_url = f'https://{self.sharepoint_host_name}/sites/{self.site_name}'
-        self.exclude_patterns_list = [p.strip() for p in self.exclude_patterns.split(',') if p.strip()]
+        return cls(**kwargs)
 
     def validate(self):
         """
@@ -91,24 +200,46 @@ class Config:
         Raises:
             ValueError: If configuration is invalid
         """
-        if not self.site_name:
-            raise ValueError("site_name cannot be empty")
-        if not self.sharepoint_host_name:
-            raise ValueError("sharepoint_host_name cannot be empty")
-        if not self.tenant_id:
-            raise ValueError("tenant_id cannot be empty")
-        if not self.client_id:
-            raise ValueError("client_id cannot be empty")
-        if not self.client_secret:
-            raise ValueError("client_secret cannot be empty")
-        if not self.upload_path:
-            raise ValueError("upload_path cannot be empty")
-        if not self.file_path:
-            raise ValueError("file_path cannot be empty")
+        # Report every empty required argument at once
+        missing = [name for name in REQUIRED_FIELDS if not getattr(self, name)]
+        if missing:
+            raise ValueError(f"{', '.join(missing)} cannot be empty")
         if self.max_retry < 0:
             raise ValueError("max_retry must be non-negative")
 
 
+def tune_upload_workers(config):
+    """
+    Size the upload worker pool from the measured Graph API round-trip time.
+
+    Uploads are latency-bound, so a high-latency runner needs more requests in
+    flight to keep the link busy: one worker per RTT_MS_PER_UPLOAD_WORKER ms
+    of RTT, never below DEFAULT_UPLOAD_WORKERS or above MAX_UPLOAD_WORKERS.
+
+    Only used when max_upload_workers is 'auto'. Call after the debug flags are
+    applied and graph_api.configure_http_session() has sized the pool for
+    MAX_UPLOAD_WORKERS, so the probe's connection is kept for the sync.
+
+    Args:
+        config (Config): Validated configuration
+
+    Returns:
+        Config: config with max_upload_workers set from the RTT (unchanged if
+                the RTT could not be measured)
+    """
+    # Imported here: graph_api pulls in the HTTP stack, which config doesn't otherwise need
+    from .graph_api import measure_graph_rtt
+
+    rtt = measure_graph_rtt(config.graph_endpoint)
+    if rtt is None:
+        return config
+
+    rtt_ms = rtt * 1000
+    workers = max(DEFAULT_UPLOAD_WORKERS, min(MAX_UPLOAD_WORKERS, int(rtt_ms / RTT_MS_PER_UPLOAD_WORKER)))
+    print(f"[=] Graph API round-trip time {rtt_ms:.0f}ms - using {workers} upload workers")
+    return replace(config, max_upload_workers=workers)
+
+
 def parse_config():
     """
     Parse configuration from command-line arguments.
@@ -120,6 +251,6 @@ def parse_config():
         ValueError: If configuration is invalid
         IndexError: If required arguments are missing
     """
-    config = Config()
+    config = Config.from_argv()
     config.validate()
     return config
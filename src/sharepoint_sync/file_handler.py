@@ -6,11 +6,112 @@ This module provides functions for file sanitization, hashing, comparison, and e
 """
 
 import os
+import re
+import mmap
 import xxhash
 import fnmatch
-from .utils import is_debug_enabled
-
-
+import logging
+import functools
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from .utils import is_debug_metadata_enabled, logger, get_available_cpu_count
+from .hash_cache import get_active_hash_cache
+from .thread_utils import stats_incrementer
+
+# Files up to this size are hashed through a single mmap; larger files are
+# read in chunks so the mapping doesn't pin gigabytes of page cache at once
+MMAP_HASH_MAX_SIZE = 1024 * 1024 * 1024  # 1GB
+
+# Files smaller than this are hashed from a single read() - setting up and
+# tearing down a mapping costs more than copying a few hundred KB
+MMAP_HASH_MIN_SIZE = 256 * 1024  # 256KB
+
+# Troubleshooting text for hashing failures, shown in debug mode after the
+# one-line warning (built once here rather than per failing file)
+_HASH_HELP_FILE_NOT_FOUND = """\
+[!] File may have been deleted or moved during sync operation.
+[!] Troubleshooting:
+[!]   - Verify file exists before running sync
+[!]   - Check if file was moved by another process
+[!]   - Exclude this file if it's temporary or auto-generated"""
+
+_HASH_HELP_PERMISSION_DENIED = """\
+[!] Troubleshooting:
+[!]   1. Verify file permissions allow reading
+[!]   2. Check if file is locked by another process
+[!]   3. On Windows, check if file is opened exclusively by another app
+[!]   4. Run with appropriate permissions if needed
+[!]   5. Consider excluding this file from sync"""
+
+_HASH_HELP_IO_ERROR = """\
+[!] Troubleshooting:
+[!]   1. Check disk health if errors persist (run: chkdsk on Windows, fsck on Linux)
+[!]   2. Verify network drive connectivity if file is on network share
+[!]   3. Check available disk space (may be full)
+[!]   4. Verify filesystem is not corrupted"""
+
+_HASH_HELP_OUT_OF_MEMORY = """\
+[!] File size: %.2f MB
+[!] Troubleshooting:
+[!]   1. File may be extremely large
+[!]   2. Increase available memory for Docker container
+[!]   3. Close other memory-intensive processes
+[!]   4. Consider excluding very large files from sync
+[!] Note: Hash calculation uses dynamic chunk sizing (64KB-8MB)
+[!]       to minimize memory usage, but very large files may still
+[!]       cause issues on low-memory systems."""
+
+_HASH_HELP_PATH_ENCODING = """\
+[!] FILE PATH ENCODING ERROR
+[!] File path contains characters that cannot be decoded.
+[!] Troubleshooting:
+[!]   1. File path may contain non-UTF-8 characters
+[!]   2. Rename file to use standard ASCII characters
+[!]   3. Check filesystem encoding settings
+[!] Technical details: %.200s"""
+
+# Map of illegal characters to safe replacements
+# Using Unicode similar characters that are visually similar but allowed
+SHAREPOINT_CHAR_REPLACEMENTS = {
+    '#': '＃',    # Fullwidth number sign
+    '%': '％',    # Fullwidth percent sign
+    '&': '＆',    # Fullwidth ampersand
+    '*': '＊',    # Fullwidth asterisk
+    ':': '：',    # Fullwidth colon
+    '<': '＜',    # Fullwidth less-than
+    '>': '＞',    # Fullwidth greater-than
+    '?': '？',    # Fullwidth question mark
+    '/': '／',    # Fullwidth solidus
+    '\\': '＼',   # Fullwidth reverse solidus
+    '|': '｜',    # Fullwidth vertical line
+    '"': '＂',    # Fullwidth quotation mark
+    '{': '｛',    # Fullwidth left curly bracket
+    '}': '｝',    # Fullwidth right curly bracket
+    '~': '～',    # Fullwidth tilde
+}
+
+# Translation table so all replacements happen in one C-level pass. For ASCII
+# names CPython's str.translate() walks a lookup table over the raw buffer,
+# which is what a hand-written C helper would do
+_SHAREPOINT_CHAR_TABLE = str.maketrans(SHAREPOINT_CHAR_REPLACEMENTS)
+
+# Reserved names (Windows legacy)
+SHAREPOINT_RESERVED_NAMES = frozenset([
+    'CON', 'PRN', 'AUX', 'NUL',
+    'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9',
+    'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9'
+])
+
+
+# Path components repeat across a tree (every file under Projects/2024/ shares
+# them), so sanitized names and paths are memoized. functools.lru_cache is
+# implemented in C, so a repeat call costs about one dict lookup and the Python
+# body only runs for new inputs.
+SANITIZE_NAME_CACHE_SIZE = 8192
+SANITIZE_PATH_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=SANITIZE_NAME_CACHE_SIZE)
 def sanitize_sharepoint_name(name, is_folder=False):
     r"""
     Sanitize file/folder names to be compatible with SharePoint/OneDrive.
@@ -32,50 +133,20 @@ def sanitize_sharepoint_name(name, is_folder=False):
     if not name:
         return name
 
-    # Map of illegal characters to safe replacements
-    # Using Unicode similar characters that are visually similar but allowed
-    char_replacements = {
-        '#': '＃',    # Fullwidth number sign
-        '%': '％',    # Fullwidth percent sign
-        '&': '＆',    # Fullwidth ampersand
-        '*': '＊',    # Fullwidth asterisk
-        ':': '：',    # Fullwidth colon
-        '<': '＜',    # Fullwidth less-than
-        '>': '＞',    # Fullwidth greater-than
-        '?': '？',    # Fullwidth question mark
-        '/': '／',    # Fullwidth solidus
-        '\\': '＼',   # Fullwidth reverse solidus
-        '|': '｜',    # Fullwidth vertical line
-        '"': '＂',    # Fullwidth quotation mark
-        '{': '｛',    # Fullwidth left curly bracket
-        '}': '｝',    # Fullwidth right curly bracket
-        '~': '～',    # Fullwidth tilde
-    }
-
-    # Start with original name
-    sanitized = name
-
-    # Replace illegal characters
-    for char, replacement in char_replacements.items():
-        sanitized = sanitized.replace(char, replacement)
+    # Replace illegal characters (single pass, see SHAREPOINT_CHAR_REPLACEMENTS)
+    sanitized = name.translate(_SHAREPOINT_CHAR_TABLE)
 
     # Remove leading ~ or $ characters
-    while sanitized and sanitized[0] in ['~', '$', '～']:
-        sanitized = sanitized[1:]
+    sanitized = sanitized.lstrip('~$～')
 
     # Remove trailing periods and spaces
     sanitized = sanitized.rstrip('. ')
 
-    # Check for reserved names (Windows legacy)
-    reserved_names = [
-        'CON', 'PRN', 'AUX', 'NUL',
-        'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9',
-        'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9'
-    ]
-
-    # Check if name (without extension) is reserved
-    name_without_ext = sanitized.split('.')[0] if not is_folder else sanitized
-    if name_without_ext.upper() in reserved_names:
+    # Check if name (without extension) is reserved. No reserved name is longer
+    # than 4 characters, so only the first 5 can decide it
+    head = sanitized[:5]
+    name_without_ext = head.partition('.')[0] if not is_folder else head
+    if len(name_without_ext) <= 4 and name_without_ext.upper() in SHAREPOINT_RESERVED_NAMES:
         sanitized = f"_{sanitized}"  # Prefix with underscore to make it safe
 
     # Ensure name isn't empty after sanitization
@@ -85,21 +156,22 @@ def sanitize_sharepoint_name(name, is_folder=False):
     # Truncate if too long (SharePoint limit is 255 chars for file/folder name)
     if len(sanitized) > 255:
         # If it's a file, preserve the extension
-        if not is_folder and '.' in name:
-            ext = name.split('.')[-1]
+        _, dot, ext = name.rpartition('.')
+        if not is_folder and dot:
             base_max_len = 255 - len(ext) - 1  # -1 for the dot
             base = sanitized[:base_max_len]
             sanitized = f"{base}.{ext}"
         else:
             sanitized = sanitized[:255]
 
-    # Log if name was changed
+    # Log if name was changed (once per distinct name, results are cached)
     if sanitized != name:
-        if is_debug_enabled():
-            print(f"[!] Sanitized name: '{name}' -> '{sanitized}'")
+        logger.debug("[!] Sanitized name: '%s' -> '%s'", name, sanitized)
 
     return sanitized
 
+
+@functools.lru_cache(maxsize=SANITIZE_PATH_CACHE_SIZE)
 def sanitize_path_components(path):
     """
     Sanitize all components of a file path for SharePoint compatibility.
@@ -110,21 +182,29 @@ def sanitize_path_components(path):
     Returns:
         str: Sanitized path with all components made SharePoint-safe
     """
-    # Split path into components
-    path = path.replace('\\', '/')
-    components = path.split('/')
+    # The parent directory is sanitized (and cached) as a whole, so sibling
+    # files only pay for their own name
+    parent, _, name = path.replace('\\', '/').rpartition('/')
+    sanitized_parent = _sanitize_folder_path(parent)
+    if not name:
+        return sanitized_parent
 
-    # Sanitize each component
-    sanitized_components = []
-    for i, component in enumerate(components):
-        if component:  # Skip empty components
-            # Last component might be a file, others are folders
-            is_folder = (i < len(components) - 1) or not ('.' in component)
-            sanitized = sanitize_sharepoint_name(component, is_folder)
-            sanitized_components.append(sanitized)
+    # Last component might be a file, others are folders
+    sanitized_name = sanitize_sharepoint_name(name, '.' not in name)
+    return f"{sanitized_parent}/{sanitized_name}" if sanitized_parent else sanitized_name
 
-    # Rejoin path
-    return '/'.join(sanitized_components)
+
+@functools.lru_cache(maxsize=SANITIZE_NAME_CACHE_SIZE)
+def _sanitize_folder_path(path):
+    """Sanitize a '/'-separated directory path, treating every component as a folder."""
+    if not path:
+        return path
+    parent, _, name = path.rpartition('/')
+    sanitized_parent = _sanitize_folder_path(parent)
+    if not name:
+        return sanitized_parent  # Skip empty components
+    sanitized_name = sanitize_sharepoint_name(name, True)
+    return f"{sanitized_parent}/{sanitized_name}" if sanitized_parent else sanitized_name
 
 
 def get_optimal_chunk_size(file_size):
@@ -152,14 +232,123 @@ def get_optimal_chunk_size(file_size):
         return 8 * 1024 * 1024  # 8MB chunks - optimal for very large files
 
 
+def _hash_file_contents(file_path, file_size):
+    """
+    Read a file and return its xxHash128 hex digest.
+
+    Args:
+        file_path (str): Path to the file to hash
+        file_size (int): Size of the file in bytes
+
+    Returns:
+        str: Hexadecimal xxHash128 digest
+    """
+    chunk_size = get_optimal_chunk_size(file_size)
+
+    # Use xxh128 (alias for xxh3_128) for maximum speed on modern CPUs
+    hasher = xxhash.xxh128()
+
+    # Unbuffered: chunked reads go straight into our buffer, without a
+    # second copy through the io.BufferedReader
+    with open(file_path, 'rb', buffering=0) as f:
+        if file_size < MMAP_HASH_MIN_SIZE:
+            return xxhash.xxh128(f.readall()).hexdigest()
+
+        if file_size <= MMAP_HASH_MAX_SIZE:
+            # Map the file and hash it in a single C call - no per-chunk
+            # Python loop or bytes copies. Falls back to chunked reads if
+            # the file can't be mapped (e.g., some network filesystems).
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                mapped = None
+            if mapped is not None:
+                with mapped:
+                    if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mapped.madvise(mmap.MADV_SEQUENTIAL)  # Aggressive readahead
+                    hasher.update(mapped)
+                return hasher.hexdigest()
+
+        # Very large files: stream in chunks to keep memory bounded, reusing
+        # one buffer instead of allocating a new bytes object per chunk
+        fadvise = getattr(os, 'posix_fadvise', None)
+        if fadvise is not None:
+            fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)  # Aggressive readahead
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while n := f.readinto(buffer):
+            hasher.update(view[:n])
+        if fadvise is not None and file_size > MMAP_HASH_MAX_SIZE:
+            # Don't let multi-GB files push everything else out of the page
+            # cache (smaller files stay cached for a possible upload)
+            fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+    return hasher.hexdigest()
+
+
+# Hashes being computed ahead of time (see prefetch_file_hashes()): {path: Future}
+_prefetched_hashes = {}
+_prefetch_lock = threading.Lock()
+_prefetch_executor = None
+
+
+def prefetch_file_hashes(file_paths, max_workers=None):
+    """
+    Start hashing files in the background, ahead of their calculate_file_hash() call.
+
+    Upload workers spend much of their time waiting on the network; a separate
+    pool keeps the disk and CPU busy hashing the files they will ask for next
+    (xxhash releases the GIL while hashing). calculate_file_hash() returns the
+    prefetched result, waiting for it if it isn't ready yet.
+
+    Call clear_prefetched_hashes() when done.
+
+    Args:
+        file_paths (list): Files to hash, in the order they will be needed
+        max_workers (int): Hashing threads (default: available CPUs, at most 8)
+    """
+    global _prefetch_executor
+    if not file_paths:
+        return
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=max_workers or min(8, get_available_cpu_count()),
+                thread_name_prefix="Hash"
+            )
+        for file_path in file_paths:
+            if file_path not in _prefetched_hashes:
+                _prefetched_hashes[file_path] = _prefetch_executor.submit(_calculate_file_hash, file_path)
+
+
+def clear_prefetched_hashes():
+    """Cancel outstanding hash prefetches and shut down the prefetch pool."""
+    global _prefetch_executor
+    with _prefetch_lock:
+        executor = _prefetch_executor
+        _prefetch_executor = None
+        _prefetched_hashes.clear()
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def calculate_file_hash(file_path):
     """
-    Calculate xxHash128 for a file using dynamic chunk sizing.
+    Calculate xxHash128 for a file.
+
+    Small files are hashed from a single read, files up to MMAP_HASH_MAX_SIZE
+    are memory-mapped and hashed in one pass, and larger files are streamed
+    using dynamic chunk sizing.
 
     xxHash128 is a non-cryptographic hash that's 10-20x faster than SHA-256
     while still providing excellent avalanche properties and collision resistance
     for file deduplication purposes.
 
+    If a hash cache is active (see hash_cache.open_hash_cache()), files whose
+    path, size and mtime match a previous run return the stored hash without
+    being read. Files queued with prefetch_file_hashes() return the
+    background result.
+
     Args:
         file_path (str): Path to the file to hash
 
@@ -169,119 +358,81 @@ def calculate_file_hash(file_path):
     Note:
         The hash is deterministic - same file always produces same hash
         regardless of when/where it's calculated (no timestamps involved).
+
+        The hex digest is kept rather than raw bytes: it is the value stored in
+        the FileHash column and the hash cache, so comparisons against remote
+        hashes need no conversion, and a 32-character compare is a single memcmp.
+    """
+    future = _prefetched_hashes.pop(file_path, None)
+    if future is not None:
+        try:
+            return future.result()
+        except CancelledError:
+            pass  # Prefetch pool was shut down - hash it here instead
+    return _calculate_file_hash(file_path)
+
+
+def _calculate_file_hash(file_path):
+    """
+    Calculate xxHash128 for a file (see calculate_file_hash()), ignoring prefetched results.
+
+    Args:
+        file_path (str): Path to the file to hash
+
+    Returns:
+        str: Hexadecimal xxHash128 digest, or None if the file could not be read
     """
     try:
-        file_size = os.path.getsize(file_path)
-        chunk_size = get_optimal_chunk_size(file_size)
+        st = os.stat(file_path)
+
+        hash_cache = get_active_hash_cache()
+        if hash_cache is not None:
+            cached_hash = hash_cache.get(file_path, st)
+            if cached_hash:
+                return cached_hash
 
-        # Use xxh128 (alias for xxh3_128) for maximum speed on modern CPUs
-        hasher = xxhash.xxh128()
+        file_hash = _hash_file_contents(file_path, st.st_size)
 
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(chunk_size):
-                hasher.update(chunk)
+        if hash_cache is not None:
+            hash_cache.put(file_path, st, file_hash)
 
-        return hasher.hexdigest()
+        return file_hash
 
     except FileNotFoundError:
         # File was deleted or moved during sync
-        print(f"[!] ========================================")
-        print(f"[!] FILE NOT FOUND")
-        print(f"[!] ========================================")
-        print(f"[!] File: {file_path}")
-        print(f"[!] ")
-        print(f"[!] File may have been deleted or moved during sync operation.")
-        print(f"[!] ")
-        print(f"[!] Troubleshooting:")
-        print(f"[!]   - Verify file exists before running sync")
-        print(f"[!]   - Check if file was moved by another process")
-        print(f"[!]   - Exclude this file if it's temporary or auto-generated")
-        print(f"[!] ========================================")
+        logger.warning("[!] File not found (deleted or moved during sync?): %s", file_path)
+        logger.debug(_HASH_HELP_FILE_NOT_FOUND)
         return None
 
     except PermissionError:
         # Cannot read file due to permissions
-        print(f"[!] ========================================")
-        print(f"[!] PERMISSION DENIED")
-        print(f"[!] ========================================")
-        print(f"[!] File: {file_path}")
-        print(f"[!] ")
-        print(f"[!] Cannot read file - permission denied.")
-        print(f"[!] ")
-        print(f"[!] Troubleshooting:")
-        print(f"[!]   1. Verify file permissions allow reading")
-        print(f"[!]   2. Check if file is locked by another process")
-        print(f"[!]   3. On Windows, check if file is opened exclusively by another app")
-        print(f"[!]   4. Run with appropriate permissions if needed")
-        print(f"[!]   5. Consider excluding this file from sync")
-        print(f"[!] ========================================")
+        logger.warning("[!] Permission denied reading file: %s", file_path)
+        logger.debug(_HASH_HELP_PERMISSION_DENIED)
         return None
 
     except OSError as e:
         # I/O errors (disk issues, network drive problems, etc.)
-        print(f"[!] ========================================")
-        print(f"[!] FILE I/O ERROR")
-        print(f"[!] ========================================")
-        print(f"[!] File: {file_path}")
-        print(f"[!] ")
-        print(f"[!] Could not read file due to I/O error.")
-        print(f"[!] ")
-        print(f"[!] Troubleshooting:")
-        print(f"[!]   1. Check disk health if errors persist (run: chkdsk on Windows, fsck on Linux)")
-        print(f"[!]   2. Verify network drive connectivity if file is on network share")
-        print(f"[!]   3. Check available disk space (may be full)")
-        print(f"[!]   4. Verify filesystem is not corrupted")
-        print(f"[!] ")
-        print(f"[!] Technical details: {str(e)[:200]}")
-        print(f"[!] ========================================")
+        logger.warning("[!] File I/O error reading %s: %.200s", file_path, e)
+        logger.debug(_HASH_HELP_IO_ERROR)
         return None
 
     except MemoryError:
         # Out of memory - file may be extremely large
-        file_size_mb = os.path.getsize(file_path) / (1024 * 1024) if os.path.exists(file_path) else 0
-        print(f"[!] ========================================")
-        print(f"[!] OUT OF MEMORY")
-        print(f"[!] ========================================")
-        print(f"[!] File: {file_path}")
-        print(f"[!] File size: {file_size_mb:.2f} MB")
-        print(f"[!] ")
-        print(f"[!] Ran out of memory while calculating hash.")
-        print(f"[!] ")
-        print(f"[!] Troubleshooting:")
-        print(f"[!]   1. File may be extremely large")
-        print(f"[!]   2. Increase available memory for Docker container")
-        print(f"[!]   3. Close other memory-intensive processes")
-        print(f"[!]   4. Consider excluding very large files from sync")
-        print(f"[!] ")
-        print(f"[!] Note: Hash calculation uses dynamic chunk sizing (64KB-8MB)")
-        print(f"[!]       to minimize memory usage, but very large files may still")
-        print(f"[!]       cause issues on low-memory systems.")
-        print(f"[!] ========================================")
+        logger.warning("[!] Out of memory while hashing file: %s", file_path)
+        if logger.isEnabledFor(logging.DEBUG):
+            file_size_mb = os.path.getsize(file_path) / (1024 * 1024) if os.path.exists(file_path) else 0
+            logger.debug(_HASH_HELP_OUT_OF_MEMORY, file_size_mb)
         return None
 
     except UnicodeDecodeError as e:
         # File path has encoding issues (rare but possible)
-        if is_debug_enabled():
-            print(f"[!] ========================================")
-            print(f"[!] FILE PATH ENCODING ERROR")
-            print(f"[!] ========================================")
-            print(f"[!] File path contains characters that cannot be decoded.")
-            print(f"[!] ")
-            print(f"[!] Troubleshooting:")
-            print(f"[!]   1. File path may contain non-UTF-8 characters")
-            print(f"[!]   2. Rename file to use standard ASCII characters")
-            print(f"[!]   3. Check filesystem encoding settings")
-            print(f"[!] ")
-            print(f"[!] Technical details: {str(e)[:200]}")
-            print(f"[!] ========================================")
+        logger.debug(_HASH_HELP_PATH_ENCODING, e)
         return None
 
     except Exception as e:
         # Unexpected errors - show detailed info in debug mode
-        if is_debug_enabled():
-            print(f"[!] Unexpected error calculating hash for {file_path}")
-            print(f"    Error type: {type(e).__name__}")
-            print(f"    Error: {str(e)[:200]}")
+        logger.debug("[!] Unexpected error calculating hash for %s\n    Error type: %s\n    Error: %.200s",
+                     file_path, type(e).__name__, e)
         return None
 
 
@@ -291,11 +442,14 @@ def should_exclude_path(path, exclude_patterns):
 
     This function provides cross-platform exclusion filtering using fnmatch for
     pattern matching. It checks both the full path and individual path components
-    (for directory exclusions like '__pycache__' or 'node_modules').
+    (for directory exclusions like '__pycache__' or 'node_modules'). The patterns
+    are compiled into an ExcludeMatcher once per distinct list; callers matching
+    many paths can also pass the matcher itself (see compile_exclude_patterns()).
 
     Args:
         path (str): File or directory path to check (can be absolute or relative)
-        exclude_patterns (list): List of exclusion patterns (e.g., ['*.tmp', '*.log', '__pycache__'])
+        exclude_patterns (list or ExcludeMatcher): List of exclusion patterns
+            (e.g., ['*.tmp', '*.log', '__pycache__']) or a precompiled matcher
 
     Returns:
         bool: True if path should be excluded, False otherwise
@@ -321,51 +475,333 @@ def should_exclude_path(path, exclude_patterns):
     if not exclude_patterns:
         return False
 
-    # Normalize path separators for cross-platform compatibility
-    # Convert backslashes to forward slashes for consistent handling
-    normalized_path = path.replace('\\', '/')
+    # Same rules as the matcher, compiled once per distinct pattern list
+    if not isinstance(exclude_patterns, ExcludeMatcher):
+        exclude_patterns = _compile_exclude_patterns_cached(tuple(exclude_patterns))
+    return exclude_patterns.matches(path)
 
-    # Get the basename (filename or directory name)
-    basename = os.path.basename(normalized_path)
 
-    # Split path into components for directory matching
-    # This allows matching directory names anywhere in the path
-    path_components = normalized_path.split('/')
+@functools.lru_cache(maxsize=32)
+def _compile_exclude_patterns_cached(exclude_patterns):
+    """Compile a (hashable) pattern tuple for should_exclude_path()."""
+    return ExcludeMatcher(exclude_patterns)
 
-    for pattern in exclude_patterns:
-        # Match against basename (most common case)
-        # This handles patterns like '*.tmp', '__pycache__', 'file.log'
-        if fnmatch.fnmatch(basename, pattern):
+
+def _has_wildcard(pattern):
+    """Check if an fnmatch pattern contains any wildcard characters."""
+    return '*' in pattern or '?' in pattern or '[' in pattern
+
+
+def _is_plain_name(pattern):
+    """Check if a pattern is a literal single path component (no wildcards or separators)."""
+    return bool(pattern) and not _has_wildcard(pattern) and '/' not in pattern and '\\' not in pattern
+
+
+def _split_affix_patterns(patterns):
+    """
+    Split fnmatch patterns into literal suffixes ('*lit'), literal prefixes ('lit*') and the rest.
+
+    A '*lit' pattern matches exactly the strings ending in 'lit' (and 'lit*' those
+    starting with it), which str.endswith()/startswith() test with a tuple in C
+    instead of a regex alternative per pattern.
+
+    Args:
+        patterns (list): fnmatch patterns
+
+    Returns:
+        tuple: (suffixes tuple, prefixes tuple, list of remaining patterns),
+               affixes normcased like the regex patterns
+    """
+    normcase = os.path.normcase
+    suffixes = []
+    prefixes = []
+    rest = []
+    for p in patterns:
+        if p.startswith('*') and not _has_wildcard(p[1:]):
+            suffixes.append(normcase(p[1:]))
+        elif p.endswith('*') and not _has_wildcard(p[:-1]):
+            prefixes.append(normcase(p[:-1]))
+        else:
+            rest.append(p)
+    return tuple(suffixes), tuple(prefixes), rest
+
+
+class ExcludeMatcher:
+    """
+    Precompiled form of an exclusion pattern list.
+
+    Gives the same answers as should_exclude_path(), but the patterns are
+    sorted into tiers once up front so each path pays only for the kind of
+    pattern it can match:
+
+    1. Literal names ('__pycache__', '.git') - set lookups on the path components
+    2. Bare extensions ('tmp', '*.tmp') - one set lookup on the basename's extension
+    3. '*lit' / 'lit*' globs - one endswith()/startswith() tuple test each
+    4. Everything else - one regex alternation for the basename, one for the path
+
+    Attributes:
+        patterns (list): Original exclusion patterns
+        literal_names (frozenset): Wildcard-free patterns matched against path components
+        basename_names (frozenset): Normcased wildcard-free patterns matched against the basename
+        extensions (frozenset): Normcased extensions (without the dot) excluded by 'ext' / '*.ext'
+        basename_suffixes (tuple): Normcased literal suffixes of '*lit' basename patterns
+        basename_prefixes (tuple): Normcased literal prefixes of 'lit*' basename patterns
+        basename_re (re.Pattern): Union of the remaining patterns (plus '*.ext' forms) for the basename
+        path_suffixes (tuple): Normcased literal suffixes of '*lit' full-path patterns
+        path_prefixes (tuple): Normcased literal prefixes of 'lit*' full-path patterns
+        path_re (re.Pattern): Union of the remaining patterns for the full normalized path
+        subtree_re (re.Pattern): Union of patterns ending in '*', used for directory pruning
+    """
+
+    def __init__(self, exclude_patterns):
+        self.patterns = list(exclude_patterns or [])
+        self.literal_names = frozenset(p for p in self.patterns if not _has_wildcard(p))
+
+        normcase = os.path.normcase
+        basename_names = set()
+        extensions = set()
+        basename_patterns = []
+        path_patterns = []
+        for p in self.patterns:
+            # '*.ext' behaves exactly like the bare extension 'ext'
+            ext = p[2:] if p.startswith('*.') else p
+            if _is_plain_name(ext) and '.' not in ext:
+                extensions.add(normcase(ext))
+                if ext == p:
+                    basename_names.add(normcase(p))
+                continue
+
+            if _is_plain_name(p):
+                # A literal without separators can only ever equal the basename
+                basename_names.add(normcase(p))
+            elif '/' in p or '\\' in p:
+                # Can't match a basename, only the full path
+                path_patterns.append(p)
+                continue
+            else:
+                basename_patterns.append(p)
+                # Wildcards can span '/' in the full path ('build*' matches
+                # 'buildout/x'), except a lone leading '*' before a literal
+                # suffix: that matches the path exactly when it matches the basename
+                if not (p.startswith('*') and not _has_wildcard(p[1:])):
+                    path_patterns.append(p)
+
+            # Extension-only patterns also match as '*.ext' (e.g., 'tar.gz' -> '*.tar.gz')
+            if not p.startswith('*') and not p.startswith('.'):
+                basename_patterns.append(f'*.{p}')
+
+        self.basename_names = frozenset(basename_names)
+        self.extensions = frozenset(extensions)
+        self.basename_suffixes, self.basename_prefixes, basename_patterns = _split_affix_patterns(basename_patterns)
+        self.basename_re = self._compile_union(basename_patterns)
+        self.path_suffixes, self.path_prefixes, path_patterns = _split_affix_patterns(path_patterns)
+        self.path_re = self._compile_union(path_patterns)
+        self.subtree_re = self._compile_union([p for p in self.patterns if p.endswith('*')])
+
+    @staticmethod
+    def _compile_union(patterns):
+        """Compile fnmatch patterns into one alternation (None if no patterns)."""
+        if not patterns:
+            return None
+        # fnmatch.fnmatch() applies os.path.normcase() to both sides; do the
+        # same here so Windows matching stays case-insensitive
+        return re.compile('|'.join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def matches(self, path):
+        """
+        Check if a path should be excluded (same rules as should_exclude_path()).
+
+        Args:
+            path (str): File or directory path to check
+
+        Returns:
+            bool: True if path should be excluded, False otherwise
+        """
+        if not self.patterns:
+            return False
+
+        normalized_path = path.replace('\\', '/')
+        if not self.literal_names.isdisjoint(normalized_path.split('/')):
+            return True
+
+        normcase = os.path.normcase
+        # Separators are already normalized to '/', so no need for os.path.basename()
+        basename = normcase(normalized_path.rpartition('/')[2])
+        if basename in self.basename_names:
+            return True
+        _, dot, ext = basename.rpartition('.')
+        if dot and ext in self.extensions:
+            return True
+        if basename.endswith(self.basename_suffixes) or basename.startswith(self.basename_prefixes):
+            return True
+        if self.basename_re is not None and self.basename_re.match(basename):
+            return True
+        normalized_path = normcase(normalized_path)
+        if normalized_path.endswith(self.path_suffixes) or normalized_path.startswith(self.path_prefixes):
             return True
+        return self.path_re is not None and self.path_re.match(normalized_path) is not None
 
-        # If pattern doesn't contain wildcards, check if it matches any path component
-        # This allows excluding directories like '__pycache__' or 'node_modules' anywhere in path
-        if '*' not in pattern and '?' not in pattern and '[' not in pattern:
-            if pattern in path_components:
-                return True
+    def excludes_subtree(self, path, name):
+        """
+        Check if every path below a directory is guaranteed to be excluded.
 
-        # Check if pattern matches full path (for more specific exclusions)
-        if fnmatch.fnmatch(normalized_path, pattern):
+        Used to skip descending into directories during discovery. This is
+        stricter than matches(): a directory named 'build.tmp' matches '*.tmp'
+        itself, but the files inside it do not.
+
+        Args:
+            path (str): Directory path
+            name (str): Directory basename
+
+        Returns:
+            bool: True if the directory's contents can be skipped entirely
+        """
+        if name in self.literal_names:
             return True
+        if self.subtree_re is None:
+            return False
+        # A pattern ending in '*' that matches "dir/" matches "dir/<anything>"
+        return self.subtree_re.match(os.path.normcase(path.replace('\\', '/') + '/')) is not None
+
+
+def compile_exclude_patterns(exclude_patterns):
+    """
+    Build an ExcludeMatcher for a list of exclusion patterns.
+
+    Compile once per run and reuse the matcher for every path instead of
+    passing the raw pattern list to should_exclude_path().
+
+    Args:
+        exclude_patterns (list): List of exclusion patterns
+
+    Returns:
+        ExcludeMatcher: Precompiled matcher (falsy when there are no patterns)
+
+    Examples:
+        >>> matcher = compile_exclude_patterns(['__pycache__', 'tmp'])
+        >>> matcher.matches('src/__pycache__/module.pyc')
+        True
+        >>> matcher.matches('notes.tmp')
+        True
+    """
+    return ExcludeMatcher(exclude_patterns)
 
-        # Auto-add wildcard for extension-only patterns (e.g., 'tmp' -> '*.tmp')
-        if not pattern.startswith('*') and not pattern.startswith('.'):
-            wildcard_pattern = f'*.{pattern}'
-            if fnmatch.fnmatch(basename, wildcard_pattern):
-                return True
 
-    return False
+def _fetch_item_fields(sanitized_name, site_id, drive_id, parent_item_id, tenant_id, client_id,
+                       client_secret, login_endpoint, graph_endpoint, log_debug):
+    """
+    Fetch a file's drive item with its list item fields for check_file_needs_update().
+
+    Only the path-based query is used: a filename-only search is unreliable for
+    duplicate names. Errors are logged (debug) and reported as a missing file.
+
+    Args:
+        sanitized_name (str): SharePoint-safe file name
+        site_id (str): SharePoint site ID
+        drive_id (str): SharePoint drive ID
+        parent_item_id (str): Parent folder item ID
+        tenant_id (str): Azure AD tenant ID
+        client_id (str): Azure AD client ID
+        client_secret (str): Azure AD client secret
+        login_endpoint (str): Azure AD login endpoint
+        graph_endpoint (str): Microsoft Graph API endpoint
+        log_debug (bool): Whether debug output is enabled
+
+    Returns:
+        dict: Drive item with its 'listItem' expanded, or None if the file could
+              not be found (or the query could not be made)
+    """
+    if not all([tenant_id, client_id, client_secret, login_endpoint, graph_endpoint]):
+        return None
+
+    if not all([site_id, drive_id, parent_item_id]):
+        if log_debug:
+            logger.debug(f"[DEBUG] Missing required parameters: site_id={site_id is not None}, drive_id={drive_id is not None}, parent_item_id={parent_item_id is not None}")
+            logger.debug(f"[!] Cannot verify file status, assuming needs update: {sanitized_name}")
+        return None
+
+    if log_debug:
+        logger.debug(f"[DEBUG] Querying by path: parent={parent_item_id}, file={sanitized_name}")
+
+    try:
+        # Use path-based query to get exact file (fixes duplicate filename bug)
+        from .graph_api import get_drive_item_by_path_with_list_item
+
+        item_with_list = get_drive_item_by_path_with_list_item(
+            site_id, drive_id, parent_item_id, sanitized_name,
+            tenant_id, client_id, client_secret, login_endpoint, graph_endpoint
+        )
+    except Exception as api_error:
+        # File might not exist, or we can't access it
+        if log_debug:
+            logger.debug(f"[!] Could not retrieve file metadata via REST API: {str(api_error)[:100]}")
+        return None
+
+    if not item_with_list or 'listItem' not in item_with_list:
+        if log_debug:
+            logger.debug(f"[DEBUG] Could not retrieve file metadata by path")
+        return None
+
+    if log_debug:
+        logger.debug(f"[DEBUG] Retrieved file metadata by path")
+    return item_with_list
+
+
+def _backfill_file_hash(site_url, list_name, list_item_id, local_hash, tenant_id, client_id,
+                        client_secret, login_endpoint, graph_endpoint, inc, log_debug):
+    """
+    Store the local hash in an unchanged file's empty FileHash field (no re-upload).
+
+    Args:
+        site_url (str): SharePoint site URL
+        list_name (str): SharePoint library name
+        list_item_id (str): List item ID of the remote file
+        local_hash (str): Hash of the local file
+        tenant_id (str): Azure AD tenant ID
+        client_id (str): Azure AD client ID
+        client_secret (str): Azure AD client secret
+        login_endpoint (str): Azure AD login endpoint
+        graph_endpoint (str): Microsoft Graph API endpoint
+        inc (callable): Statistics incrementer from stats_incrementer()
+        log_debug (bool): Whether debug output is enabled
+    """
+    try:
+        from .graph_api import update_sharepoint_list_item_field
+
+        success = update_sharepoint_list_item_field(
+            site_url, list_name, list_item_id, 'FileHash', local_hash,
+            tenant_id, client_id, client_secret, login_endpoint, graph_endpoint
+        )
+
+        if success:
+            if log_debug:
+                logger.debug(f"[✓] FileHash backfilled: {local_hash[:8]}...")
+            inc('hash_backfilled')
+        else:
+            if log_debug:
+                logger.debug(f"[!] Failed to backfill FileHash")
+            inc('hash_backfill_failed')
+
+    except Exception as backfill_error:
+        if log_debug:
+            logger.debug(f"[!] Error backfilling FileHash: {str(backfill_error)[:200]}")
+        inc('hash_backfill_failed')
 
 
 def check_file_needs_update(local_path, file_name, site_url, list_name, filehash_column_available,
                             tenant_id=None, client_id=None, client_secret=None, login_endpoint=None,
                             graph_endpoint=None, upload_stats_dict=None, pre_calculated_hash=None, display_path=None,
-                            site_id=None, drive_id=None, parent_item_id=None, sharepoint_cache=None):
+                            site_id=None, drive_id=None, parent_item_id=None, sharepoint_cache=None,
+                            pre_calculated_size=None, local_stat=None):
     """
     Check if a file in SharePoint needs to be updated by comparing hash or size.
 
     This function implements efficient file comparison to avoid unnecessary uploads.
     Files are compared using:
+    0. Cached size mismatch without a stored FileHash - skips hashing entirely
     1. Cache lookup (if cache provided) - fastest, no API calls
     2. FileHash (xxHash128) via API if column exists - most reliable
     3. Size comparison as fallback - works without custom columns
@@ -389,20 +825,28 @@ def check_file_needs_update(local_path, file_name, site_url, list_name, filehash
         pre_calculated_hash (str, optional): Pre-calculated hash to use instead of calculating from file
                                              (useful for converted markdown where source .md hash is used)
         display_path (str, optional): Relative path for display in debug output (e.g., 'docs/api/README.html')
-                                     If not provided, falls back to sanitized_name
+                                     If not provided, falls back to file_name
         site_id (str, optional): SharePoint site ID for path-based queries (preferred method)
         drive_id (str, optional): SharePoint drive ID for path-based queries (preferred method)
         parent_item_id (str, optional): Parent folder item ID for path-based queries (preferred method)
         sharepoint_cache (dict, optional): Pre-built cache of SharePoint file metadata
                                           Format: {"path/to/file.html": {"file_hash": "...", "size": 123, ...}}
-                                          If None, falls back to individual API queries
+                                          A None entry marks a path known not to exist (see
+                                          batch_get_drive_items()). If None, falls back to
+                                          individual API queries
+        pre_calculated_size (int, optional): Size of the local file if the caller already knows it.
+                                             Together with pre_calculated_hash this is the fast path:
+                                             the local file is not touched at all
+        local_stat (os.stat_result, optional): Stat of the local file if the caller already has one
+                                               (e.g., from file discovery); saves a stat() call
 
     Returns:
         tuple: (needs_update: bool, exists: bool, remote_file: None, local_hash: str or None)
             - needs_update: True if file should be uploaded
             - exists: True if file exists in SharePoint
             - remote_file: Always None (no longer using Office365 DriveItem objects)
-            - local_hash: The calculated or provided hash of the file
+            - local_hash: The calculated or provided hash of the file (None if a
+                          cached size mismatch skipped hashing)
 
     Example:
         # With cache (recommended for bulk operations)
@@ -420,393 +864,227 @@ def check_file_needs_update(local_path, file_name, site_url, list_name, filehash
         )
     """
 
-    # Sanitize the file name to match what would be stored in SharePoint
-    sanitized_name = sanitize_sharepoint_name(file_name, is_folder=False)
+    # Read the debug switches once; they're checked throughout
+    log_debug = logger.isEnabledFor(logging.DEBUG)
+    debug_metadata = is_debug_metadata_enabled()
+
+    # Resolve the statistics backend once instead of at every counter
+    inc = stats_incrementer(upload_stats_dict)
+
+    # Name used in debug output until the API fallback needs the sanitized name
+    display_name = display_path or file_name
+
+    # Get local file size (no stat needed when the caller already knows it)
+    if local_stat is not None:
+        local_size = local_stat.st_size
+    elif pre_calculated_size is not None:
+        local_size = pre_calculated_size
+    else:
+        local_size = os.path.getsize(local_path)
+
+    # Look the file up in the cache once (compare with None rather than testing the
+    # cache for truth: len() of the ChainMap used by parallel checks walks every key)
+    cached_file = None
+    if sharepoint_cache is not None and display_path:
+        cached_file = sharepoint_cache.get(display_path)
+
+    # A size mismatch already proves the file changed - don't hash it just to compare.
+    # The caller hashes the file itself if it needs the value for FileHash metadata.
+    # A stored FileHash still takes precedence (SharePoint may change the remote size
+    # of Office documents on upload), so only entries compared by size qualify.
+    if (not pre_calculated_hash and cached_file and cached_file.get('size') is not None
+            and cached_file['size'] != local_size
+            and not (filehash_column_available and cached_file.get('file_hash'))):
+        if log_debug:
+            logger.debug(f"[*] File changed (cached size mismatch, hash skipped): {display_path}")
+        inc('cache_hits')
+        inc('compared_by_size')
+        return True, True, None, None
 
     # Use pre-calculated hash if provided, otherwise calculate from file
     local_hash = None
     if pre_calculated_hash:
         local_hash = pre_calculated_hash
-        if is_debug_enabled():
-            print(f"[#] Using pre-calculated hash: {local_hash[:8]}... for {sanitized_name}")
+        if log_debug:
+            logger.debug(f"[#] Using pre-calculated hash: {local_hash[:8]}... for {display_name}")
     else:
         local_hash = calculate_file_hash(local_path)
         if local_hash:
-            if is_debug_enabled():
-                print(f"[#] Local hash: {local_hash[:8]}... for {sanitized_name}")
-
-    # Get local file information
-    local_size = os.path.getsize(local_path)
-
-    # Get debug flag (used throughout function)
-    debug_metadata = os.environ.get('DEBUG_METADATA', 'false').lower() == 'true'
+            if log_debug:
+                logger.debug(f"[#] Local hash: {local_hash[:8]}... for {display_name}")
 
     # Debug: Show what we're checking
-    if is_debug_enabled():
-        display_name = display_path if display_path else sanitized_name
-        print(f"[?] Checking if file exists in SharePoint: {display_name}")
+    if log_debug:
+        logger.debug(f"[?] Checking if file exists in SharePoint: {display_name}")
 
     # ============================================================================
     # CACHE LOOKUP (if available) - fastest path, no API calls
     # ============================================================================
     if sharepoint_cache is not None and display_path:
-        # Try cache lookup using display_path (relative path)
-        cached_file = sharepoint_cache.get(display_path)
-
         if cached_file:
             # Cache hit! Use cached metadata instead of API call
-            if upload_stats_dict:
-                if hasattr(upload_stats_dict, 'increment'):
-                    upload_stats_dict.increment('cache_hits')
-                else:
-                    upload_stats_dict['cache_hits'] = upload_stats_dict.get('cache_hits', 0) + 1
+            inc('cache_hits')
 
-            if is_debug_enabled():
-                print(f"[CACHE HIT] Found {display_path} in cache")
+            if log_debug:
+                logger.debug(f"[CACHE HIT] Found {display_path} in cache")
 
             cached_hash = cached_file.get('file_hash')
             cached_size = cached_file.get('size')
             list_item_id = cached_file.get('list_item_id')
 
-            # Try hash comparison first if available
+            # Compare by hash if available, otherwise fall back to size
             if filehash_column_available and cached_hash and local_hash:
-                if upload_stats_dict:
-                    if hasattr(upload_stats_dict, 'increment'):
-                        upload_stats_dict.increment('compared_by_hash')
-                    else:
-                        upload_stats_dict['compared_by_hash'] = upload_stats_dict.get('compared_by_hash', 0) + 1
-
-                if cached_hash == local_hash:
-                    # Hash match - file unchanged
-                    if is_debug_enabled():
-                        print(f"[=] File unchanged (cached hash match): {display_path}")
-                    if upload_stats_dict:
-                        upload_stats_dict['skipped_files'] += 1
-                        upload_stats_dict['bytes_skipped'] += local_size
-                        if hasattr(upload_stats_dict, 'increment'):
-                            upload_stats_dict.increment('hash_matched')
-                        else:
-                            upload_stats_dict['hash_matched'] = upload_stats_dict.get('hash_matched', 0) + 1
-                    return False, True, None, local_hash
-                else:
-                    # Hash mismatch - file changed
-                    if is_debug_enabled():
-                        print(f"[*] File changed (cached hash mismatch): {display_path}")
-                    return True, True, None, local_hash
-
-            # Fall back to size comparison if hash not available
+                compared_by, unchanged = 'hash', cached_hash == local_hash
             elif cached_size is not None:
-                if upload_stats_dict:
-                    if hasattr(upload_stats_dict, 'increment'):
-                        upload_stats_dict.increment('compared_by_size')
-                    else:
-                        upload_stats_dict['compared_by_size'] = upload_stats_dict.get('compared_by_size', 0) + 1
-
-                if cached_size == local_size:
-                    # Size match - likely unchanged
-                    if is_debug_enabled():
-                        print(f"[=] File unchanged (cached size match): {display_path}")
-                    if upload_stats_dict:
-                        upload_stats_dict['skipped_files'] += 1
-                        upload_stats_dict['bytes_skipped'] += local_size
-
-                    # Backfill empty FileHash if column exists
-                    if (filehash_column_available and not cached_hash and local_hash and
-                        list_item_id and site_url and list_name):
-                        if is_debug_enabled():
-                            print(f"[#] Backfilling empty FileHash for cached file: {display_path}")
-                        try:
-                            from .graph_api import update_sharepoint_list_item_field
-                            success = update_sharepoint_list_item_field(
-                                site_url, list_name, list_item_id, 'FileHash', local_hash,
-                                tenant_id, client_id, client_secret, login_endpoint, graph_endpoint
-                            )
-                            if success:
-                                if is_debug_enabled():
-                                    print(f"[✓] FileHash backfilled: {local_hash[:8]}...")
-                                if upload_stats_dict:
-                                    if hasattr(upload_stats_dict, 'increment'):
-                                        upload_stats_dict.increment('hash_backfilled')
-                                    else:
-                                        upload_stats_dict['hash_backfilled'] = upload_stats_dict.get('hash_backfilled', 0) + 1
-                            else:
-                                if upload_stats_dict:
-                                    if hasattr(upload_stats_dict, 'increment'):
-                                        upload_stats_dict.increment('hash_backfill_failed')
-                                    else:
-                                        upload_stats_dict['hash_backfill_failed'] = upload_stats_dict.get('hash_backfill_failed', 0) + 1
-                        except Exception:
-                            if upload_stats_dict:
-                                if hasattr(upload_stats_dict, 'increment'):
-                                    upload_stats_dict.increment('hash_backfill_failed')
-                                else:
-                                    upload_stats_dict['hash_backfill_failed'] = upload_stats_dict.get('hash_backfill_failed', 0) + 1
-
-                    return False, True, None, local_hash
-                else:
-                    # Size mismatch - file changed
-                    if is_debug_enabled():
-                        print(f"[*] File changed (cached size mismatch): {display_path}")
+                compared_by, unchanged = 'size', cached_size == local_size
+            else:
+                compared_by = None  # Nothing to compare - verify with an API query below
+
+            if compared_by:
+                # Literal keys are interned; an f-string key would be built and hashed per file
+                inc('compared_by_hash' if compared_by == 'hash' else 'compared_by_size')
+
+                if not unchanged:
+                    if log_debug:
+                        logger.debug(f"[*] File changed (cached {compared_by} mismatch): {display_path}")
                     return True, True, None, local_hash
+
+                if log_debug:
+                    logger.debug(f"[=] File unchanged (cached {compared_by} match): {display_path}")
+                inc('skipped_files')
+                inc('bytes_skipped', local_size)
+
+                if compared_by == 'hash':
+                    inc('hash_matched')
+
+                # Backfill empty FileHash if column exists (size match only)
+                elif (filehash_column_available and not cached_hash and local_hash and
+                      list_item_id and site_url and list_name):
+                    if log_debug:
+                        logger.debug(f"[#] Backfilling empty FileHash for cached file: {display_path}")
+                    _backfill_file_hash(site_url, list_name, list_item_id, local_hash, tenant_id, client_id,
+                                        client_secret, login_endpoint, graph_endpoint, inc, log_debug)
+
+                return False, True, None, local_hash
+        elif display_path in sharepoint_cache:
+            # Batch lookup already confirmed the file does not exist (entry is None)
+            inc('cache_hits')
+
+            if log_debug:
+                logger.debug(f"[CACHE HIT] {display_path} confirmed absent - new file")
+            return True, False, None, local_hash
         else:
             # Cache miss - file not found in cache
             # Fall through to API query to verify file status (safer than assuming new)
-            if upload_stats_dict:
-                if hasattr(upload_stats_dict, 'increment'):
-                    upload_stats_dict.increment('cache_misses')
-                else:
-                    upload_stats_dict['cache_misses'] = upload_stats_dict.get('cache_misses', 0) + 1
-
-            if is_debug_enabled():
-                print(f"[CACHE MISS] {display_path} not found in cache - verifying with API query")
+            inc('cache_misses')
+
+            if log_debug:
+                logger.debug(f"[CACHE MISS] {display_path} not found in cache - verifying with API query")
             # Don't return - fall through to API query below for safety
 
     # ============================================================================
     # FALLBACK: Individual API query (cache miss or cache not available)
     # ============================================================================
     # Track API query (fallback when cache not available)
-    if upload_stats_dict:
-        if hasattr(upload_stats_dict, 'increment'):
-            upload_stats_dict.increment('api_queries')
-        else:
-            upload_stats_dict['api_queries'] = upload_stats_dict.get('api_queries', 0) + 1
-
-    # Use Graph REST API to check file existence and get metadata
-    # This replaces the Office365 library usage
-    try:
-        # Try to get the FileHash property and other metadata using direct REST API
-        hash_comparison_available = False
-        file_exists = False
-        remote_size = None
-
-        # Try to get file metadata using Graph REST API
-        if all([tenant_id, client_id, client_secret, login_endpoint, graph_endpoint]):
-            try:
-                # Prefer path-based query (most reliable, especially for duplicate filenames)
-                list_item_data = None
-                if all([site_id, drive_id, parent_item_id]):
-                    if is_debug_enabled():
-                        print(f"[DEBUG] Querying by path: parent={parent_item_id}, file={sanitized_name}")
-
-                    # Use path-based query to get exact file (fixes duplicate filename bug)
-                    from .graph_api import get_drive_item_by_path_with_list_item
-
-                    item_with_list = get_drive_item_by_path_with_list_item(
-                        site_id, drive_id, parent_item_id, sanitized_name,
-                        tenant_id, client_id, client_secret, login_endpoint, graph_endpoint
-                    )
-
-                    # Extract listItem fields from the response
-                    if item_with_list and 'listItem' in item_with_list:
-                        list_item_data = {
-                            'fields': item_with_list['listItem'].get('fields', {})
-                        }
-                        if is_debug_enabled():
-                            print(f"[DEBUG] Retrieved file metadata by path")
-
-                # If path-based query failed, we cannot reliably check the file
-                # (filename-only search is unreliable for duplicate names)
-                if not list_item_data:
-                    if is_debug_enabled():
-                        print(f"[DEBUG] Could not retrieve file metadata by path")
-                        print(f"[DEBUG] Missing required parameters: site_id={site_id is not None}, drive_id={drive_id is not None}, parent_item_id={parent_item_id is not None}")
-
-                    # Without path-based query, we must assume file needs update
-                    # This is safer than using unreliable filename-only search
-                    if is_debug_enabled():
-                        print(f"[!] Cannot verify file status, assuming needs update: {sanitized_name}")
-                    return True, False, None, local_hash
-
-                if list_item_data and 'fields' in list_item_data:
-                    file_exists = True  # File found in SharePoint
-                    fields = list_item_data['fields']
-
-                    if debug_metadata:
-                        print(f"[DEBUG] Retrieving metadata for {sanitized_name}")
-                        print(f"[DEBUG] Available field properties: {list(fields.keys())}")
-
-                    # Get file size if available
-                    remote_size = fields.get('FileSizeDisplay') or fields.get('File_x0020_Size')
-                    if isinstance(remote_size, str):
-                        try:
-                            remote_size = int(remote_size)
-                        except (ValueError, TypeError):
-                            remote_size = None
-
-                    # Try to get FileHash if column is available
-                    if filehash_column_available:
-                        remote_hash = fields.get('FileHash')
-
-                        if remote_hash:
-                            hash_comparison_available = True
-                            if is_debug_enabled():
-                                print(f"[#] Remote hash: {remote_hash[:8]}... for {sanitized_name}")
-
-                            # Compare hashes - this is the most reliable comparison
-                            if upload_stats_dict:
-                                # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                                if hasattr(upload_stats_dict, 'increment'):
-                                    upload_stats_dict.increment('compared_by_hash')
-                                else:
-                                    upload_stats_dict['compared_by_hash'] = upload_stats_dict.get('compared_by_hash', 0) + 1
-
-                            if local_hash and local_hash == remote_hash:
-                                if is_debug_enabled():
-                                    print(f"[=] File unchanged (hash match): {sanitized_name}")
-                                if upload_stats_dict:
-                                    upload_stats_dict['skipped_files'] += 1
-                                    upload_stats_dict['bytes_skipped'] += local_size
-                                    # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                                    if hasattr(upload_stats_dict, 'increment'):
-                                        upload_stats_dict.increment('hash_matched')
-                                    else:
-                                        upload_stats_dict['hash_matched'] = upload_stats_dict.get('hash_matched', 0) + 1
-                                return False, True, None, local_hash
-                            elif local_hash:
-                                if is_debug_enabled():
-                                    print(f"[*] File changed (hash mismatch): {sanitized_name}")
-                                return True, True, None, local_hash
-                        else:
-                            # FileHash column exists but value is empty for this file
-                            if debug_metadata:
-                                print(f"[DEBUG] FileHash not found in list item fields")
-                            if upload_stats_dict:
-                                # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                                if hasattr(upload_stats_dict, 'increment'):
-                                    upload_stats_dict.increment('hash_empty_found')
-                                else:
-                                    upload_stats_dict['hash_empty_found'] = upload_stats_dict.get('hash_empty_found', 0) + 1
-                    else:
-                        # FileHash column doesn't exist at all
-                        if upload_stats_dict:
-                            # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                            if hasattr(upload_stats_dict, 'increment'):
-                                upload_stats_dict.increment('hash_column_unavailable')
-                            else:
-                                upload_stats_dict['hash_column_unavailable'] = upload_stats_dict.get('hash_column_unavailable', 0) + 1
-                elif debug_metadata:
-                    print(f"[DEBUG] Could not retrieve list item data for {sanitized_name}")
-
-            except Exception as api_error:
-                # File might not exist, or we can't access it
-                if is_debug_enabled():
-                    print(f"[!] Could not retrieve file metadata via REST API: {str(api_error)[:100]}")
-                file_exists = False
-                hash_comparison_available = False
-
-        # If file doesn't exist, needs upload
-        if not file_exists:
-            if is_debug_enabled():
-                print(f"[+] New file to upload: {sanitized_name}")
-            return True, False, None, local_hash
-
-        # If hash comparison wasn't available, fall back to size comparison
-        if not hash_comparison_available:
-            if debug_metadata:
-                print(f"[DEBUG] FileHash not available, using size comparison")
-
-            if remote_size is None:
-                # If we still can't get size, assume file needs update
-                if is_debug_enabled():
-                    print(f"[!] Cannot determine remote file size for: {sanitized_name}")
-                return True, True, None, local_hash
-
-            # Compare file sizes only (hash comparison not available)
-            if upload_stats_dict:
-                # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                if hasattr(upload_stats_dict, 'increment'):
-                    upload_stats_dict.increment('compared_by_size')
-                else:
-                    upload_stats_dict['compared_by_size'] = upload_stats_dict.get('compared_by_size', 0) + 1
-
-            size_matches = (local_size == remote_size)
-            needs_update = not size_matches
-
-            if not needs_update:
-                if is_debug_enabled():
-                    print(f"[=] File unchanged (size: {local_size:,} bytes): {sanitized_name}")
-                if upload_stats_dict:
-                    upload_stats_dict['skipped_files'] += 1
-                    upload_stats_dict['bytes_skipped'] += local_size
-
-                # Backfill empty FileHash values
-                # If FileHash column exists but value is empty, and we have confirmed
-                # file is unchanged via size comparison, update the hash without re-uploading
-                if (filehash_column_available and
-                    not hash_comparison_available and  # Hash was empty
-                    local_hash and  # We have a calculated hash
-                    site_url and list_name and  # Required for update
-                    item_with_list and 'listItem' in item_with_list and 'id' in item_with_list['listItem']):
-
-                    # Attempt to backfill the FileHash
-                    item_id = item_with_list['listItem']['id']
-
-                    if is_debug_enabled():
-                        display_name = display_path if display_path else sanitized_name
-                        print(f"[#] Backfilling empty FileHash for unchanged file: {display_name}")
-
-                    try:
-                        from .graph_api import update_sharepoint_list_item_field
-
-                        success = update_sharepoint_list_item_field(
-                            site_url, list_name, item_id, 'FileHash', local_hash,
-                            tenant_id, client_id, client_secret, login_endpoint, graph_endpoint
-                        )
-
-                        if success:
-                            if is_debug_enabled():
-                                print(f"[✓] FileHash backfilled: {local_hash[:8]}...")
-                            if upload_stats_dict:
-                                # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                                if hasattr(upload_stats_dict, 'increment'):
-                                    upload_stats_dict.increment('hash_backfilled')
-                                else:
-                                    upload_stats_dict['hash_backfilled'] = upload_stats_dict.get('hash_backfilled', 0) + 1
-                        else:
-                            if is_debug_enabled():
-                                print(f"[!] Failed to backfill FileHash")
-                            if upload_stats_dict:
-                                # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                                if hasattr(upload_stats_dict, 'increment'):
-                                    upload_stats_dict.increment('hash_backfill_failed')
-                                else:
-                                    upload_stats_dict['hash_backfill_failed'] = upload_stats_dict.get('hash_backfill_failed', 0) + 1
-
-                    except Exception as backfill_error:
-                        if is_debug_enabled():
-                            print(f"[!] Error backfilling FileHash: {str(backfill_error)[:200]}")
-                        if upload_stats_dict:
-                            # Use atomic increment if available (parallel mode), otherwise use get/set pattern
-                            if hasattr(upload_stats_dict, 'increment'):
-                                upload_stats_dict.increment('hash_backfill_failed')
-                            else:
-                                upload_stats_dict['hash_backfill_failed'] = upload_stats_dict.get('hash_backfill_failed', 0) + 1
-
-            else:
-                if is_debug_enabled():
-                    display_name = display_path if display_path else sanitized_name
-                    print(f"[*] File size changed (local: {local_size:,} vs remote: {remote_size:,}): {display_name}")
-
-            return needs_update, True, None, local_hash
+    inc('api_queries')
 
-        # Should not reach here, but return safe default
-        return True, file_exists, None, local_hash
+    # Sanitize the file name to match what would be stored in SharePoint
+    # (only needed here - cache lookups are keyed by display_path)
+    sanitized_name = sanitize_sharepoint_name(file_name, is_folder=False)
 
-    except Exception as e:
-        # File doesn't exist in SharePoint (404 error is expected)
-        # Check if it's actually a 404 or another error
-        error_str = str(e)
-        if "404" in error_str or "not found" in error_str.lower() or "itemNotFound" in error_str:
-            if is_debug_enabled():
-                print(f"[+] New file to upload: {sanitized_name}")
-        else:
-            # Some other error occurred
-            print(f"[?] Error checking file existence: {e}")
-            print(f"[DEBUG] Error type: {type(e).__name__}")
-            print(f"[DEBUG] Full error: {error_str[:500]}")  # First 500 chars
-            print(f"[+] Assuming new file: {sanitized_name}")
+    # Use Graph REST API to check file existence and get metadata
+    item_with_list = _fetch_item_fields(
+        sanitized_name, site_id, drive_id, parent_item_id,
+        tenant_id, client_id, client_secret, login_endpoint, graph_endpoint, log_debug
+    )
+    if item_with_list is None:
+        if log_debug:
+            logger.debug(f"[+] New file to upload: {sanitized_name}")
         return True, False, None, local_hash
 
+    fields = item_with_list['listItem'].get('fields', {})
+    fget = fields.get
+    if debug_metadata:
+        print(f"[DEBUG] Retrieving metadata for {sanitized_name}")
+        print(f"[DEBUG] Available field properties: {list(fields.keys())}")
+
+    # Get file size if available (drive item size is exact, list fields are a fallback)
+    remote_size = item_with_list.get('size')
+    if remote_size is None:
+        remote_size = fget('FileSizeDisplay') or fget('File_x0020_Size')
+    if isinstance(remote_size, str):
+        try:
+            remote_size = int(remote_size)
+        except (ValueError, TypeError):
+            remote_size = None
+
+    remote_hash = fget('FileHash') if filehash_column_available else None
+
+    # Different sizes prove a change unless a stored FileHash decides instead:
+    # SharePoint can rewrite Office documents on upload (property promotion),
+    # so the remote size of an unchanged file may differ from the local one
+    if remote_size is not None and remote_size != local_size and not remote_hash:
+        inc('compared_by_size')
+        if log_debug:
+            logger.debug(f"[*] File size changed (local: {local_size:,} vs remote: {remote_size:,}): "
+                         f"{display_path or sanitized_name}")
+        return True, True, None, local_hash
+
+    # Compare hashes - this is the most reliable comparison
+    if remote_hash:
+        if log_debug:
+            logger.debug(f"[#] Remote hash: {remote_hash[:8]}... for {sanitized_name}")
+        inc('compared_by_hash')
+
+        if local_hash and local_hash == remote_hash:
+            if log_debug:
+                logger.debug(f"[=] File unchanged (hash match): {sanitized_name}")
+            inc('skipped_files')
+            inc('bytes_skipped', local_size)
+            inc('hash_matched')
+            return False, True, None, local_hash
+
+        if local_hash and log_debug:
+            logger.debug(f"[*] File changed (hash mismatch): {sanitized_name}")
+        return True, True, None, local_hash
+
+    if filehash_column_available:
+        # FileHash column exists but value is empty for this file
+        if debug_metadata:
+            print(f"[DEBUG] FileHash not found in list item fields")
+        inc('hash_empty_found')
+    else:
+        # FileHash column doesn't exist at all
+        inc('hash_column_unavailable')
+
+    # Hash comparison not available - fall back to size comparison
+    if debug_metadata:
+        print(f"[DEBUG] FileHash not available, using size comparison")
+
+    if remote_size is None:
+        # If we still can't get size, assume file needs update
+        if log_debug:
+            logger.debug(f"[!] Cannot determine remote file size for: {sanitized_name}")
+        return True, True, None, local_hash
+
+    # Sizes match here (a mismatch returned above)
+    inc('compared_by_size')
+    if log_debug:
+        logger.debug(f"[=] File unchanged (size: {local_size:,} bytes): {sanitized_name}")
+    inc('skipped_files')
+    inc('bytes_skipped', local_size)
+
+    # Backfill empty FileHash values: the file is confirmed unchanged by size,
+    # so store the hash without re-uploading
+    list_item_id = item_with_list['listItem'].get('id')
+    if filehash_column_available and local_hash and site_url and list_name and list_item_id:
+        logger.debug("[#] Backfilling empty FileHash for unchanged file: %s",
+                     display_path or sanitized_name)
+        _backfill_file_hash(site_url, list_name, list_item_id, local_hash, tenant_id, client_id,
+                            client_secret, login_endpoint, graph_endpoint, inc, log_debug)
+
+    return False, True, None, local_hash
+
 
 def check_files_need_update_parallel(file_list, site_url, list_name,
                                      filehash_available, tenant_id, client_id,
@@ -842,7 +1120,7 @@ def check_files_need_update_parallel(file_list, site_url, list_name,
 
     Note:
         - 2-4x faster than sequential checks
-        - Thread-safe statistics updates via locking
+        - Thread-safe statistics updates via per-thread counters
         - Useful for force_upload=False mode
     """
     from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -878,7 +1156,9 @@ def check_files_need_update_parallel(file_list, site_url, list_name,
                 future.result()
             except Exception as e:
                 # Errors already logged by check_file_needs_update
-                if is_debug_enabled():
-                    print(f"[!] File check error: {e}")
+                logger.debug("[!] File check error: %s", e)
+
+    # Fold the per-thread counters into upload_stats_dict
+    stats_wrapper.flush()
 
     return results
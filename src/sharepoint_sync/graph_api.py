@@ -6,8 +6,12 @@ This module provides all Graph API interactions including column management,
 list item operations, and request retry logic.
 """
 
+import os
 import time
+import random
+import statistics
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from .auth import acquire_token
 from .monitoring import rate_monitor
@@ -22,6 +26,95 @@ column_mapping_cache = {}
 # Global cache for site/drive IDs (used by deletion operations)
 site_drive_id_cache = {}
 
+# Default connection pool size (matches the max_upload_workers cap)
+DEFAULT_HTTP_POOL_SIZE = 10
+
+# Maximum sub-requests in one Graph API $batch request
+DELETE_BATCH_SIZE = 20
+
+
+def _mount_http_adapter(session, pool_size):
+    """
+    Mount a connection-pooling adapter on a session.
+
+    Retries are left to make_graph_request_with_retry(), so the adapter itself
+    never retries.
+
+    Args:
+        session (requests.Session): Session to configure
+        pool_size (int): Number of connections to keep open per host
+    """
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+# Shared HTTP session - reuses TCP/TLS connections across all Graph requests
+# and the MSAL token requests made by auth.acquire_token()
+SESSION = requests.Session()
+_mount_http_adapter(SESSION, DEFAULT_HTTP_POOL_SIZE)
+
+
+def configure_http_session(max_workers):
+    """
+    Resize the shared session's connection pool for the configured worker count.
+
+    Call once at startup, before requests are made from worker threads.
+
+    Args:
+        max_workers (int): Maximum concurrent upload workers
+    """
+    _mount_http_adapter(SESSION, max(1, max_workers) * 2)
+
+
+def measure_graph_rtt(graph_endpoint, samples=5):
+    """
+    Measure the median round-trip time to the Graph API endpoint.
+
+    Sends lightweight unauthenticated HEAD requests through the shared session.
+    The first request only opens the connection (TCP/TLS handshake) and is not
+    timed, so the result reflects requests over a kept-alive connection.
+
+    Args:
+        graph_endpoint (str): Graph API endpoint (e.g., 'graph.microsoft.com')
+        samples (int): Number of timed requests (default: 5)
+
+    Returns:
+        float: Median round-trip time in seconds, or None if the endpoint is unreachable
+    """
+    url = f"https://{graph_endpoint}/v1.0/"
+    timings = []
+    try:
+        SESSION.head(url, timeout=10)
+        for _ in range(samples):
+            start = time.perf_counter()
+            SESSION.head(url, timeout=10)
+            timings.append(time.perf_counter() - start)
+    except requests.RequestException as e:
+        print(f"[!] Could not measure Graph API latency: {e}")
+        return None
+    return statistics.median(timings)
+
+
+def _retry_delay(attempt, offset=1, cap=60):
+    """
+    Calculate an exponential backoff delay with random jitter.
+
+    Parallel upload workers that hit the same throttling or server error
+    would otherwise all sleep for the same duration and retry in lockstep,
+    re-creating the burst that caused the error. Up to one second of random
+    jitter spreads the retries out.
+
+    Args:
+        attempt (int): Zero-based retry attempt
+        offset (int): Seconds added to the exponential term (default: 1)
+        cap (int): Maximum delay in seconds (default: 60)
+
+    Returns:
+        float: Seconds to wait before the next attempt
+    """
+    return min(cap, (2 ** attempt) + offset + random.random())
+
 
 def make_graph_request_with_retry(url, headers, method='GET', json_data=None, data=None, params=None, max_retries=3):
     """
@@ -29,17 +122,20 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
     Includes rate limiting monitoring via response header analysis.
 
     Retry Logic:
-        - 429 (Rate Limit): Waits for Retry-After header duration
-        - 5xx (Server Error): Exponential backoff (1s, 3s, 7s)
-        - 409 (Conflict/Lock): Exponential backoff (2s, 4s, 8s) - files being processed
+        - 429 (Rate Limit): Waits for Retry-After header duration (plus jitter)
+        - 5xx (Server Error): Exponential backoff (~2s, 3s, 5s)
+        - 409 (Conflict/Lock): Exponential backoff (~3s, 4s, 6s) - files being processed
         - 4xx (Client Error): No retry (except 409)
+        All delays include up to 1s of random jitter so parallel workers
+        don't retry in lockstep (see _retry_delay).
 
     Args:
         url (str): The Graph API endpoint URL
         headers (dict): Request headers including Authorization
         method (str): HTTP method ('GET', 'POST', 'PATCH', 'PUT', 'DELETE', etc.)
         json_data (dict): JSON data for POST/PATCH requests (mutually exclusive with data)
-        data (bytes): Binary data for PUT/POST requests (mutually exclusive with json_data)
+        data (bytes or file): Binary data for PUT/POST requests (mutually exclusive with json_data).
+            A binary file object is streamed and rewound before each retry.
         params (dict): URL parameters for GET requests
         max_retries (int): Maximum number of retry attempts (default: 3)
 
@@ -55,8 +151,14 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
     """
     debug_metadata = is_debug_metadata_enabled()
 
+    # Streamed bodies are consumed by each attempt - remember where to rewind to
+    data_start = data.tell() if hasattr(data, 'seek') else None
+
     for attempt in range(max_retries + 1):
         try:
+            if data_start is not None:
+                data.seek(data_start)
+
             # Add proactive delay if approaching rate limits
             if rate_monitor.should_slow_down() and attempt > 0:
                 delay = 2 ** attempt
@@ -66,21 +168,21 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
 
             # Make the request based on method
             if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=params)
+                response = SESSION.get(url, headers=headers, params=params)
             elif method.upper() == 'POST':
                 if data is not None:
-                    response = requests.post(url, headers=headers, data=data)
+                    response = SESSION.post(url, headers=headers, data=data)
                 else:
-                    response = requests.post(url, headers=headers, json=json_data)
+                    response = SESSION.post(url, headers=headers, json=json_data)
             elif method.upper() == 'PATCH':
-                response = requests.patch(url, headers=headers, json=json_data)
+                response = SESSION.patch(url, headers=headers, json=json_data)
             elif method.upper() == 'PUT':
                 if data is not None:
-                    response = requests.put(url, headers=headers, data=data)
+                    response = SESSION.put(url, headers=headers, data=data)
                 else:
-                    response = requests.put(url, headers=headers, json=json_data)
+                    response = SESSION.put(url, headers=headers, json=json_data)
             elif method.upper() == 'DELETE':
-                response = requests.delete(url, headers=headers)
+                response = SESSION.delete(url, headers=headers)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
 
@@ -102,7 +204,7 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
                     if debug_metadata:
                         print(f"[DEBUG] Retry-After header: {retry_after}")
                         print(f"[DEBUG] Rate limit response: {response.text[:300]}")
-                    time.sleep(wait_seconds)
+                    time.sleep(wait_seconds + random.random())
                     continue
                 else:
                     print(f"[!] Rate limiting exhausted all retries. Final 429 response:")
@@ -112,9 +214,9 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
             elif 500 <= response.status_code < 600:
                 # Server error - retry with exponential backoff
                 if attempt < max_retries:
-                    wait_seconds = (2 ** attempt) + 1  # 1, 3, 7 seconds
+                    wait_seconds = _retry_delay(attempt)
                     if is_debug_enabled():
-                        print(f"[!] Server error ({response.status_code}). Retrying in {wait_seconds} seconds... ({attempt + 1}/{max_retries})")
+                        print(f"[!] Server error ({response.status_code}). Retrying in {wait_seconds:.1f} seconds... ({attempt + 1}/{max_retries})")
                     if debug_metadata:
                         print(f"[DEBUG] Server error response: {response.text[:300]}")
                     time.sleep(wait_seconds)
@@ -129,9 +231,9 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
                 # Conflict error (file locked, being processed, etc.) - retry with exponential backoff
                 # This is often transient (SharePoint processing, virus scan, indexing)
                 if attempt < max_retries:
-                    wait_seconds = (2 ** attempt) + 2  # 2, 4, 8 seconds (longer than server errors)
+                    wait_seconds = _retry_delay(attempt, offset=2)  # Longer than server errors
                     if is_debug_enabled():
-                        print(f"[!] Conflict/Lock error (409). File may be locked or processing. Retrying in {wait_seconds} seconds... ({attempt + 1}/{max_retries})")
+                        print(f"[!] Conflict/Lock error (409). File may be locked or processing. Retrying in {wait_seconds:.1f} seconds... ({attempt + 1}/{max_retries})")
                     if debug_metadata:
                         print(f"[DEBUG] Conflict response: {response.text[:300]}")
                     time.sleep(wait_seconds)
@@ -150,9 +252,9 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
         except requests.exceptions.Timeout as e:
             # Request timeout - retry with exponential backoff
             if attempt < max_retries:
-                wait_seconds = (2 ** attempt) + 1
+                wait_seconds = _retry_delay(attempt)
                 timeout_info = str(e)[:100] if str(e) else "timeout"
-                print(f"[!] Request timeout ({timeout_info}). Retrying in {wait_seconds} seconds... ({attempt + 1}/{max_retries})")
+                print(f"[!] Request timeout ({timeout_info}). Retrying in {wait_seconds:.1f} seconds... ({attempt + 1}/{max_retries})")
                 time.sleep(wait_seconds)
                 continue
             else:
@@ -230,9 +332,9 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
         except requests.exceptions.ConnectionError as e:
             # Network/DNS connection errors - retry with exponential backoff
             if attempt < max_retries:
-                wait_seconds = (2 ** attempt) + 1
+                wait_seconds = _retry_delay(attempt)
                 error_detail = str(e)[:100]
-                print(f"[!] Network connection error: {error_detail}. Retrying in {wait_seconds} seconds... ({attempt + 1}/{max_retries})")
+                print(f"[!] Network connection error: {error_detail}. Retrying in {wait_seconds:.1f} seconds... ({attempt + 1}/{max_retries})")
                 time.sleep(wait_seconds)
                 continue
             else:
@@ -256,8 +358,8 @@ def make_graph_request_with_retry(url, headers, method='GET', json_data=None, da
         except requests.exceptions.RequestException as e:
             # Catch-all for other request errors (should be rare after specific catches above)
             if attempt < max_retries:
-                wait_seconds = (2 ** attempt) + 1
-                print(f"[!] HTTP request error: {str(e)[:100]}. Retrying in {wait_seconds} seconds... ({attempt + 1}/{max_retries})")
+                wait_seconds = _retry_delay(attempt)
+                print(f"[!] HTTP request error: {str(e)[:100]}. Retrying in {wait_seconds:.1f} seconds... ({attempt + 1}/{max_retries})")
                 time.sleep(wait_seconds)
                 continue
             else:
@@ -487,12 +589,12 @@ def check_and_create_filehash_column(site_url, list_name, tenant_id, client_id,
         print("[?] Checking for FileHash column in SharePoint...")
         token = acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
 
-        if 'access_token' not in token:
-            print(f"[!] Failed to acquire token for Graph API: {token.get('error_description', 'Unknown error')}")
+        if not token.access_token:
+            print("[!] Failed to acquire token for Graph API")
             return False, list_name
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Content-Type': 'application/json'
         }
 
@@ -605,7 +707,7 @@ def check_and_create_filehash_column(site_url, list_name, tenant_id, client_id,
 
                 # Verify the newly created column
                 is_valid, validation_msg = verify_column_for_filehash_operations(
-                    site_id, list_id, token['access_token'], graph_endpoint
+                    site_id, list_id, token.access_token, graph_endpoint
                 )
                 if not is_valid:
                     print(f"[⚠] FileHash column created but verification failed: {validation_msg}")
@@ -620,7 +722,7 @@ def check_and_create_filehash_column(site_url, list_name, tenant_id, client_id,
 
         # Column already exists - verify it's suitable for operations
         is_valid, validation_msg = verify_column_for_filehash_operations(
-            site_id, list_id, token['access_token'], graph_endpoint
+            site_id, list_id, token.access_token, graph_endpoint
         )
 
         if not is_valid:
@@ -684,12 +786,12 @@ def update_sharepoint_list_item_field(site_url, list_name, item_id, field_name,
         # Get token for Graph API
         token = acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
 
-        if 'access_token' not in token:
-            print(f"[!] Failed to acquire token for Graph API: {token.get('error_description', 'Unknown error')}")
+        if not token.access_token:
+            print("[!] Failed to acquire token for Graph API")
             return False
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Content-Type': 'application/json'
         }
 
@@ -742,7 +844,7 @@ def update_sharepoint_list_item_field(site_url, list_name, item_id, field_name,
             return False
 
         # Resolve field name to internal name for reliable API access
-        resolved_field_name = resolve_field_name(site_id, list_id, token['access_token'], graph_endpoint, field_name)
+        resolved_field_name = resolve_field_name(site_id, list_id, token.access_token, graph_endpoint, field_name)
 
         if resolved_field_name != field_name and debug_metadata:
             print(f"[=] Resolved field name '{field_name}' to '{resolved_field_name}'")
@@ -755,7 +857,7 @@ def update_sharepoint_list_item_field(site_url, list_name, item_id, field_name,
             print(f"[DEBUG] PATCH endpoint: {fields_endpoint}")
             print(f"[DEBUG] Field data to update: {field_data}")
 
-        update_response = requests.patch(fields_endpoint, headers=headers, json=field_data)
+        update_response = SESSION.patch(fields_endpoint, headers=headers, json=field_data)
 
         # Check for rate limiting headers in response
         if debug_metadata:
@@ -1162,13 +1264,51 @@ def create_graph_client(tenant_id, client_id, client_secret, login_endpoint, gra
     )
 
 
+def list_folder_children_paged(site_id, drive_id, item_id, headers, graph_endpoint, select=None):
+    """
+    List every child of a folder, following @odata.nextLink paging.
+
+    Args:
+        site_id (str): SharePoint site ID
+        drive_id (str): SharePoint drive ID
+        item_id (str): Folder item ID
+        headers (dict): Request headers including Authorization
+        graph_endpoint (str): Microsoft Graph API endpoint
+        select (str): Optional comma-separated $select properties
+
+    Returns:
+        list: Child drive item dictionaries from all pages
+
+    Raises:
+        Exception: If any page request fails
+    """
+    url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{item_id}/children?$top=999"
+    if select:
+        url += f"&$select={select}"
+
+    children = []
+    while url:
+        response = make_graph_request_with_retry(url, headers, method='GET')
+        if response.status_code != 200:
+            raise Exception(f"Failed to list children: {response.status_code} - {response.text}")
+        page = response.json()
+        children.extend(page.get('value', []))
+        url = page.get('@odata.nextLink')
+    return children
+
+
 def list_files_in_folder_recursive(drive, folder_path, site_url, tenant_id, client_id,
-                                   client_secret, login_endpoint, graph_endpoint, current_path=""):
+                                   client_secret, login_endpoint, graph_endpoint, max_workers=4):
     """
     Recursively list all files in a SharePoint folder using direct Graph REST API.
 
+    Folders are enumerated breadth-first with a thread pool: each folder's
+    children are fetched (all pages) in a worker, and subfolders are submitted
+    as soon as they are discovered, so wall time scales with tree depth rather
+    than total folder count.
+
     Args:
-        drive: Office365 Drive object representing the folder
+        drive: Unused (kept for backward compatibility; pass None)
         folder_path (str): The original folder path being synced
         site_url (str): SharePoint site URL
         tenant_id (str): Azure AD tenant ID
@@ -1176,10 +1316,10 @@ def list_files_in_folder_recursive(drive, folder_path, site_url, tenant_id, clie
         client_secret (str): Azure AD application client secret
         login_endpoint (str): Azure AD login endpoint
         graph_endpoint (str): Microsoft Graph API endpoint
-        current_path (str): Current relative path within the folder structure
+        max_workers (int): Maximum concurrent folder listings (default: 4)
 
     Returns:
-        list: List of dictionaries containing file information:
+        list: List of dictionaries containing file information, sorted by path:
             - name (str): File name
             - path (str): Relative path from root folder
             - id (str): SharePoint item ID
@@ -1190,6 +1330,8 @@ def list_files_in_folder_recursive(drive, folder_path, site_url, tenant_id, clie
         Uses direct Graph REST API calls instead of Office365 library property detection
         to reliably distinguish between files and folders.
     """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
     files = []
     debug_enabled = is_debug_enabled()
 
@@ -1200,149 +1342,124 @@ def list_files_in_folder_recursive(drive, folder_path, site_url, tenant_id, clie
         if not token:
             raise Exception("Failed to acquire authentication token")
 
-        # Get site and drive IDs if this is the first call
-        if not current_path:
-            # Parse site URL to get site ID
-            # Format: https://tenant.sharepoint.com/sites/sitename
-            import urllib.parse
-            parsed = urllib.parse.urlparse(site_url)
-            hostname = parsed.netloc
-            site_path = parsed.path
-
-            # Get site ID
-            site_id_url = f"https://{graph_endpoint}/v1.0/sites/{hostname}:{site_path}"
-            headers = {
-                'Authorization': f"Bearer {token['access_token']}",
-                'Accept': 'application/json'
-            }
-            site_response = make_graph_request_with_retry(site_id_url, headers, method='GET')
-
-            if site_response.status_code != 200:
-                raise Exception(f"Failed to get site ID: {site_response.status_code} - {site_response.text}")
-
-            site_data = site_response.json()
-            site_id = site_data['id']
-
-            if debug_enabled:
-                print(f"[DEBUG] Site ID: {site_id}")
-
-            # Get default drive ID
-            drive_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drive"
-            drive_response = make_graph_request_with_retry(drive_url, headers, method='GET')
-
-            if drive_response.status_code != 200:
-                raise Exception(f"Failed to get drive: {drive_response.status_code} - {drive_response.text}")
-
-            drive_data = drive_response.json()
-            drive_id = drive_data['id']
-
-            if debug_enabled:
-                print(f"[DEBUG] Drive ID: {drive_id}")
-
-            # Get the folder item by path
-            # URL encode the folder path
-            encoded_path = urllib.parse.quote(folder_path.strip('/'))
-            folder_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/root:/{encoded_path}"
-            folder_response = make_graph_request_with_retry(folder_url, headers, method='GET')
-
-            if folder_response.status_code != 200:
-                raise Exception(f"Failed to get folder: {folder_response.status_code} - {folder_response.text}")
-
-            folder_data = folder_response.json()
-            folder_item_id = folder_data['id']
-
-            if debug_enabled:
-                print(f"[DEBUG] Folder item ID: {folder_item_id}")
-
-            # Store these for recursive calls in global cache
-            site_drive_id_cache['site_id'] = site_id
-            site_drive_id_cache['drive_id'] = drive_id
-            site_drive_id_cache['current_item_id'] = folder_item_id
-        else:
-            # Use stored IDs from parent call
-            site_id = site_drive_id_cache.get('site_id')
-            drive_id = site_drive_id_cache.get('drive_id')
-            folder_item_id = site_drive_id_cache.get('current_item_id')
-
-        # Get children of the current folder using Graph API
-        children_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{folder_item_id}/children"
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Accept': 'application/json'
         }
 
-        children_response = make_graph_request_with_retry(children_url, headers, method='GET')
+        # Parse site URL to get site ID
+        # Format: https://tenant.sharepoint.com/sites/sitename
+        import urllib.parse
+        parsed = urllib.parse.urlparse(site_url)
+        hostname = parsed.netloc
+        site_path = parsed.path
 
-        if children_response.status_code != 200:
-            raise Exception(f"Failed to list children: {children_response.status_code} - {children_response.text}")
+        # Get site ID
+        site_id_url = f"https://{graph_endpoint}/v1.0/sites/{hostname}:{site_path}"
+        site_response = make_graph_request_with_retry(site_id_url, headers, method='GET')
 
-        children_data = children_response.json()
-        children = children_data.get('value', [])
+        if site_response.status_code != 200:
+            raise Exception(f"Failed to get site ID: {site_response.status_code} - {site_response.text}")
 
-        if debug_enabled and not current_path:
-            print(f"\n[DEBUG] SharePoint folder contains {len(children)} items")
+        site_data = site_response.json()
+        site_id = site_data['id']
 
-        for child in children:
-            # Build the relative path for this item
-            item_name = child.get('name', '')
-            item_path = f"{current_path}/{item_name}" if current_path else item_name
+        if debug_enabled:
+            print(f"[DEBUG] Site ID: {site_id}")
 
-            # Check if this item has a 'file' or 'folder' facet in the JSON
-            has_file = 'file' in child
-            has_folder = 'folder' in child
+        # Get default drive ID
+        drive_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drive"
+        drive_response = make_graph_request_with_retry(drive_url, headers, method='GET')
 
-            if debug_enabled:
-                item_type = "FILE" if has_file else ("FOLDER" if has_folder else "UNKNOWN")
-                print(f"[DEBUG] SharePoint item: {item_path} (type: {item_type})")
+        if drive_response.status_code != 200:
+            raise Exception(f"Failed to get drive: {drive_response.status_code} - {drive_response.text}")
 
-            # If it's a file, add to list
-            if has_file:
-                file_info = {
-                    'name': item_name,
-                    'path': item_path,
-                    'id': child.get('id', ''),
-                    'size': child.get('size', 0),
-                    'drive_item': None  # Graph API doesn't use Office365 drive_item objects
-                }
-                files.append(file_info)
+        drive_data = drive_response.json()
+        drive_id = drive_data['id']
 
-                if debug_enabled:
-                    print(f"  [+] Added to file list: {item_path} ({file_info['size']} bytes)")
+        if debug_enabled:
+            print(f"[DEBUG] Drive ID: {drive_id}")
 
-            # If it's a folder, recurse into it
-            elif has_folder:
-                if debug_enabled:
-                    print(f"  [→] Entering subfolder: {item_path}")
+        # Get the folder item by path
+        # URL encode the folder path
+        encoded_path = urllib.parse.quote(folder_path.strip('/'))
+        folder_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/root:/{encoded_path}"
+        folder_response = make_graph_request_with_retry(folder_url, headers, method='GET')
 
-                # Store the child item ID in the cache for the recursive call
-                child_item_id = child.get('id', '')
-                previous_item_id = site_drive_id_cache.get('current_item_id')
-                site_drive_id_cache['current_item_id'] = child_item_id
+        if folder_response.status_code != 200:
+            raise Exception(f"Failed to get folder: {folder_response.status_code} - {folder_response.text}")
 
-                # Recursively get files from this subfolder
-                subfolder_files = list_files_in_folder_recursive(
-                    drive, folder_path, site_url, tenant_id, client_id,
-                    client_secret, login_endpoint, graph_endpoint, item_path
-                )
-                files.extend(subfolder_files)
+        folder_data = folder_response.json()
+        folder_item_id = folder_data['id']
 
-                # Restore parent folder's item ID after recursion
-                site_drive_id_cache['current_item_id'] = previous_item_id
+        if debug_enabled:
+            print(f"[DEBUG] Folder item ID: {folder_item_id}")
 
-                if debug_enabled:
-                    print(f"  [←] Exited subfolder: {item_path} (found {len(subfolder_files)} files)")
-            else:
-                if debug_enabled:
-                    print(f"  [!] WARNING: Item is neither file nor folder: {item_path}")
+        # Store these in global cache (used by deletion operations)
+        site_drive_id_cache['site_id'] = site_id
+        site_drive_id_cache['drive_id'] = drive_id
+        site_drive_id_cache['current_item_id'] = folder_item_id
+
+        def list_children(item_id):
+            return list_folder_children_paged(
+                site_id, drive_id, item_id, headers, graph_endpoint,
+                select="id,name,size,file,folder"
+            )
+
+        # Breadth-first: every discovered folder is listed in parallel
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            pending = {executor.submit(list_children, folder_item_id): ""}
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    current_path = pending.pop(future)
+                    try:
+                        children = future.result()
+                    except Exception as e:
+                        print(f"[!] Error listing files in folder '{current_path}': {str(e)}")
+                        continue
+
+                    if debug_enabled and not current_path:
+                        print(f"\n[DEBUG] SharePoint folder contains {len(children)} items")
+
+                    for child in children:
+                        # Build the relative path for this item
+                        item_name = child.get('name', '')
+                        item_path = f"{current_path}/{item_name}" if current_path else item_name
+
+                        # Check if this item has a 'file' or 'folder' facet in the JSON
+                        if 'file' in child:
+                            files.append({
+                                'name': item_name,
+                                'path': item_path,
+                                'id': child.get('id', ''),
+                                'size': child.get('size', 0),
+                                'drive_item': None  # Graph API doesn't use Office365 drive_item objects
+                            })
+                            if debug_enabled:
+                                print(f"  [+] Added to file list: {item_path} ({child.get('size', 0)} bytes)")
+
+                        elif 'folder' in child:
+                            if debug_enabled:
+                                print(f"  [→] Queued subfolder: {item_path}")
+                            pending[executor.submit(list_children, child.get('id', ''))] = item_path
+
+                        elif debug_enabled:
+                            print(f"  [!] WARNING: Item is neither file nor folder: {item_path}")
 
     except Exception as e:
-        print(f"[!] Error listing files in folder '{current_path}': {str(e)}")
+        print(f"[!] Error listing files in folder '{folder_path}': {str(e)}")
         if is_debug_metadata_enabled():
             import traceback
             print(f"[DEBUG] Traceback: {traceback.format_exc()}")
 
-    # Debug summary for root folder only
-    if debug_enabled and not current_path and len(files) > 0:
+    # Completion order varies between runs - return a stable order
+    files.sort(key=lambda f: f['path'])
+
+    # Debug summary
+    if debug_enabled and len(files) > 0:
         print(f"[DEBUG] Returning {len(files)} FILES (folders excluded)")
         print(f"[DEBUG] Sample files (first 5):")
         for f in files[:5]:
@@ -1455,7 +1572,7 @@ def build_sharepoint_cache(folder_path, site_url, tenant_id, client_id,
             # Get site ID
             site_id_url = f"https://{graph_endpoint}/v1.0/sites/{hostname}:{site_path}"
             headers = {
-                'Authorization': f"Bearer {token['access_token']}",
+                'Authorization': token.authorization,
                 'Accept': 'application/json'
             }
             site_response = make_graph_request_with_retry(site_id_url, headers, method='GET')
@@ -1518,7 +1635,7 @@ def build_sharepoint_cache(folder_path, site_url, tenant_id, client_id,
                        f"/items/{folder_item_id}/children?$expand={expand_clause}")
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Accept': 'application/json'
         }
 
@@ -1720,7 +1837,7 @@ def delete_file_from_sharepoint(drive_item, file_path, whatif=False, file_id=Non
                 # Delete the file using Graph API
                 delete_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{file_id}"
                 headers = {
-                    'Authorization': f"Bearer {token['access_token']}",
+                    'Authorization': token.authorization,
                     'Accept': 'application/json'
                 }
 
@@ -1750,6 +1867,129 @@ def delete_file_from_sharepoint(drive_item, file_path, whatif=False, file_id=Non
         return False
 
 
+def delete_files_batch(file_infos, tenant_id, client_id, client_secret, login_endpoint,
+                       graph_endpoint, max_retries=3, token=None, log=print):
+    """
+    Delete up to 20 files from SharePoint with a single $batch request.
+
+    Replaces one DELETE round-trip per file with one POST per batch. Sub-requests
+    that are throttled (429) or hit a transient server error (503/504) are
+    re-sent in a smaller batch after the Retry-After delay.
+
+    Args:
+        file_infos (list): Up to 20 dicts with 'path' and 'id' keys (as returned
+                           by list_files_in_folder_recursive())
+        tenant_id (str): Azure AD tenant ID
+        client_id (str): Azure AD application client ID
+        client_secret (str): Azure AD application client secret
+        login_endpoint (str): Azure AD login endpoint
+        graph_endpoint (str): Microsoft Graph API endpoint
+        max_retries (int): Maximum re-sends of throttled sub-requests (default: 3)
+        token (auth.Token): Optional Token from acquire_token() (served by the
+                            shared TokenProvider), so callers sending many batches
+                            authenticate once; only its authorization header is
+                            used (acquired here if not provided)
+        log (callable): Receives the result lines (default: print), so callers
+                        running alongside other output can print them later
+
+    Returns:
+        dict: Mapping of {file_path: bool} - True if the file was deleted
+
+    Note:
+        Uses the site and drive IDs cached by list_files_in_folder_recursive()
+        or build_sharepoint_cache(), like delete_file_from_sharepoint().
+    """
+    if len(file_infos) > DELETE_BATCH_SIZE:
+        raise ValueError("Graph API $batch requests are limited to 20 sub-requests")
+
+    debug_enabled = is_debug_enabled()
+    results = {}
+    if not file_infos:
+        return results
+
+    try:
+        if token is None:
+            token = acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
+        if not token or not token.access_token:
+            raise Exception("Failed to acquire authentication token")
+
+        headers = {
+            'Authorization': token.authorization,
+            'Content-Type': 'application/json'
+        }
+        site_id = site_drive_id_cache.get('site_id')
+        drive_id = site_drive_id_cache.get('drive_id')
+        batch_endpoint = f"https://{graph_endpoint}/v1.0/$batch"
+
+        pending = list(range(len(file_infos)))
+        for attempt in range(max_retries + 1):
+            batch_request = {"requests": [
+                {
+                    "id": str(idx),
+                    "method": "DELETE",
+                    "url": f"/sites/{site_id}/drives/{drive_id}/items/{file_infos[idx]['id']}"
+                }
+                for idx in pending
+            ]}
+
+            batch_response = make_graph_request_with_retry(
+                batch_endpoint,
+                headers,
+                method='POST',
+                json_data=batch_request
+            )
+            if batch_response.status_code != 200:
+                raise Exception(f"Batch delete failed: {batch_response.status_code} - {batch_response.text[:200]}")
+
+            retry_ids = []
+            retry_after = 0
+            for result in batch_response.json().get('responses', []):
+                try:
+                    idx = int(result['id'])
+                    file_path = file_infos[idx]['path']
+                except (KeyError, ValueError, IndexError):
+                    continue
+                status = result.get('status')
+
+                if status in (200, 204):
+                    results[file_path] = True
+                    log(f"File Deleted: {file_path}")
+                    if debug_enabled:
+                        log(f"  → Deletion confirmed")
+                elif status in (429, 503, 504):
+                    retry_ids.append(idx)
+                    try:
+                        retry_after = max(retry_after, float((result.get('headers') or {}).get('Retry-After', 0)))
+                    except (TypeError, ValueError):
+                        pass
+                else:
+                    error = ((result.get('body') or {}).get('error') or {}).get('message', '')
+                    results[file_path] = False
+                    log(f"[!] Failed to delete file '{file_path}': {status} - {error}")
+
+            pending = retry_ids
+            if not pending or attempt == max_retries:
+                break
+
+            wait_time = retry_after or _retry_delay(attempt)
+            if debug_enabled:
+                print(f"[DEBUG] {len(pending)} deletions throttled, retrying in {wait_time:.1f}s...")
+            time.sleep(wait_time)
+
+        # Sub-requests still throttled or missing from the response
+        for info in file_infos:
+            if info['path'] not in results:
+                results[info['path']] = False
+                log(f"[!] Failed to delete file '{info['path']}': no successful response after {max_retries} retries")
+
+    except Exception as e:
+        log(f"[!] Batch deletion failed: {str(e)[:400]}")
+        for info in file_infos:
+            results.setdefault(info['path'], False)
+
+    return results
+
+
 def get_drive_item_by_path(site_url, folder_path, tenant_id, client_id,
                            client_secret, login_endpoint, graph_endpoint):
     """
@@ -1795,7 +2035,7 @@ def get_drive_item_by_path(site_url, folder_path, tenant_id, client_id,
         # Get site ID
         site_id_url = f"https://{graph_endpoint}/v1.0/sites/{hostname}:{site_path}"
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Accept': 'application/json'
         }
         site_response = make_graph_request_with_retry(site_id_url, headers, method='GET')
@@ -1886,7 +2126,7 @@ def get_drive_item_by_path_with_list_item(site_id, drive_id, parent_item_id, fil
         item_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{parent_item_id}:/{encoded_filename}?$expand=listItem"
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Accept': 'application/json'
         }
 
@@ -1942,7 +2182,7 @@ def get_drive_item_with_list_item(site_id, drive_id, item_id,
         item_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{item_id}?$expand=listItem"
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Accept': 'application/json'
         }
 
@@ -1961,6 +2201,144 @@ def get_drive_item_with_list_item(site_id, drive_id, item_id,
         return None
 
 
+def batch_get_drive_items(site_id, drive_id, root_item_id, relative_paths,
+                          tenant_id, client_id, client_secret, login_endpoint, graph_endpoint,
+                          filehash_available=True, batch_size=20, max_workers=4):
+    """
+    Fetch multiple drive items (with FileHash metadata) using batch requests.
+
+    Replaces one GET per file with one $batch POST per batch_size files. Each
+    sub-request addresses the item by path relative to the upload root folder.
+    Up to max_workers batches are in flight at once.
+
+    Args:
+        site_id (str): SharePoint site ID
+        drive_id (str): SharePoint drive ID
+        root_item_id (str): Item ID of the upload root folder
+        relative_paths (list): Sanitized paths relative to the root folder
+        tenant_id (str): Azure AD tenant ID
+        client_id (str): Azure AD application client ID
+        client_secret (str): Azure AD application client secret
+        login_endpoint (str): Azure AD login endpoint
+        graph_endpoint (str): Microsoft Graph API endpoint
+        filehash_available (bool): Whether FileHash column exists (default: True)
+        batch_size (int): Items per batch request (max 20 for Graph API)
+        max_workers (int): Maximum concurrent batch requests (default: 4; each
+                           carries batch_size lookups, so few are needed)
+
+    Returns:
+        dict: Mapping of {relative_path: entry} where entry uses the same format
+            as build_sharepoint_cache() file entries, or None if the item does
+            not exist (404). Paths whose lookup failed for any other reason are
+            omitted so callers fall back to a per-file check.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = {}
+    if not relative_paths:
+        return results
+    relative_paths = list(relative_paths)
+
+    try:
+        token = acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
+        if not token or not token.access_token:
+            print("[!] Failed to acquire token for batch item lookup")
+            return results
+
+        headers = {
+            'Authorization': token.authorization,
+            'Content-Type': 'application/json'
+        }
+
+        import urllib.parse
+
+        # Same field selection as build_sharepoint_cache()
+        if filehash_available:
+            expand_clause = "listItem($expand=fields($select=FileHash,FileSizeDisplay,FileLeafRef))"
+        else:
+            expand_clause = "listItem($expand=fields($select=FileSizeDisplay,FileLeafRef))"
+
+        batch_endpoint = f"https://{graph_endpoint}/v1.0/$batch"
+
+        def fetch_batch(batch_num):
+            """Look up one batch of paths; returns {path: entry or None}."""
+            batch = relative_paths[batch_num:batch_num+batch_size]
+            batch_index = batch_num // batch_size + 1
+            batch_results = {}
+
+            batch_request = {"requests": [
+                {
+                    "id": str(idx),
+                    "method": "GET",
+                    "url": (f"/sites/{site_id}/drives/{drive_id}/items/{root_item_id}"
+                            f":/{urllib.parse.quote(path)}?$expand={expand_clause}")
+                }
+                for idx, path in enumerate(batch)
+            ]}
+
+            try:
+                batch_response = make_graph_request_with_retry(
+                    batch_endpoint,
+                    headers,
+                    method='POST',
+                    json_data=batch_request
+                )
+
+                if batch_response.status_code != 200:
+                    if is_debug_enabled():
+                        print(f"[DEBUG] Batch item lookup {batch_index} failed: HTTP {batch_response.status_code}")
+                    return batch_results
+
+                for result in batch_response.json().get('responses', []):
+                    try:
+                        path = batch[int(result['id'])]
+                        status = result.get('status')
+
+                        if status == 404:
+                            batch_results[path] = None
+                        elif status == 200:
+                            item = result.get('body') or {}
+                            if 'file' not in item:
+                                continue
+
+                            list_item = item.get('listItem') or {}
+                            fields = list_item.get('fields') or {}
+
+                            batch_results[path] = {
+                                'item_id': item.get('id', ''),
+                                'list_item_id': list_item.get('id'),
+                                'parent_item_id': item.get('parentReference', {}).get('id'),
+                                'file_hash': fields.get('FileHash') if filehash_available else None,
+                                'size': item.get('size', 0),
+                                'name': item.get('name', path.rsplit('/', 1)[-1])
+                            }
+                        elif is_debug_enabled():
+                            print(f"[DEBUG] Batch lookup for {path} returned HTTP {status}")
+
+                    except Exception:
+                        continue
+
+            except Exception as batch_error:
+                print(f"[!] Error processing lookup batch {batch_index}: {str(batch_error)[:200]}")
+
+            return batch_results
+
+        batch_starts = range(0, len(relative_paths), batch_size)
+        if len(batch_starts) == 1 or max_workers <= 1:
+            for batch_results in map(fetch_batch, batch_starts):
+                results.update(batch_results)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(batch_starts)),
+                                    thread_name_prefix="Lookup") as executor:
+                for batch_results in executor.map(fetch_batch, batch_starts):
+                    results.update(batch_results)
+
+    except Exception as e:
+        print(f"[!] Batch item lookup failed: {str(e)[:400]}")
+
+    return results
+
+
 def upload_small_file_graph(site_id, drive_id, parent_item_id, filename, file_content,
                             tenant_id, client_id, client_secret, login_endpoint, graph_endpoint):
     """
@@ -1971,7 +2349,8 @@ def upload_small_file_graph(site_id, drive_id, parent_item_id, filename, file_co
         drive_id (str): SharePoint drive ID
         parent_item_id (str): Parent folder item ID
         filename (str): Name for the uploaded file
-        file_content (bytes): File content as bytes
+        file_content (bytes or file): File content as bytes, or a binary file
+            object opened by the caller (streamed without loading into memory)
         tenant_id (str): Azure AD tenant ID
         client_id (str): Azure AD application client ID
         client_secret (str): Azure AD application client secret
@@ -2006,13 +2385,22 @@ def upload_small_file_graph(site_id, drive_id, parent_item_id, filename, file_co
         upload_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{parent_item_id}:/{encoded_filename}:/content"
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Content-Type': 'application/octet-stream'
         }
 
+        if isinstance(file_content, (bytes, bytearray)):
+            content_size = len(file_content)
+        else:
+            content_size = os.fstat(file_content.fileno()).st_size
+            if content_size == 0:
+                # requests can't take a length from an empty file object and would
+                # send it chunked without Content-Length - send b'' (Content-Length: 0)
+                file_content = b''
+
         if debug_enabled:
             print(f"[DEBUG] Uploading to: {upload_url}")
-            print(f"[DEBUG] File size: {len(file_content)} bytes")
+            print(f"[DEBUG] File size: {content_size} bytes")
 
         # Make the upload request (use data parameter for binary content)
         upload_response = make_graph_request_with_retry(upload_url, headers, method='PUT', data=file_content)
@@ -2075,7 +2463,7 @@ def create_upload_session_graph(site_id, drive_id, parent_item_id, filename,
         session_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{parent_item_id}:/{encoded_filename}:/createUploadSession"
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Content-Type': 'application/json'
         }
 
@@ -2132,8 +2520,6 @@ def upload_file_chunk_graph(upload_url, chunk_data, chunk_start, chunk_end, tota
     debug_enabled = is_debug_enabled()
 
     try:
-        import requests
-
         headers = {
             'Content-Length': str(len(chunk_data)),
             'Content-Range': f"bytes {chunk_start}-{chunk_end}/{total_size}"
@@ -2142,8 +2528,8 @@ def upload_file_chunk_graph(upload_url, chunk_data, chunk_start, chunk_end, tota
         if debug_enabled:
             print(f"[DEBUG] Uploading chunk: bytes {chunk_start}-{chunk_end}/{total_size}")
 
-        # Use requests directly (no retry for chunks per MS documentation)
-        response = requests.put(upload_url, headers=headers, data=chunk_data, timeout=300)
+        # Send directly without retry wrapper (no retry for chunks per MS documentation)
+        response = SESSION.put(upload_url, headers=headers, data=chunk_data, timeout=300)
 
         # Check response
         if response.status_code in [200, 201, 202]:
@@ -2207,7 +2593,7 @@ def create_folder_graph(site_id, drive_id, parent_item_id, folder_name,
         create_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{parent_item_id}/children"
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Content-Type': 'application/json'
         }
 
@@ -2279,7 +2665,7 @@ def list_folder_children_graph(site_id, drive_id, item_id, tenant_id, client_id,
         children_url = f"https://{graph_endpoint}/v1.0/sites/{site_id}/drives/{drive_id}/items/{item_id}/children"
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Accept': 'application/json'
         }
 
@@ -2345,12 +2731,12 @@ def batch_update_filehash_fields(site_url, list_name, updates_list,
         # Get token for Graph API
         token = acquire_token(tenant_id, client_id, client_secret, login_endpoint, graph_endpoint)
 
-        if 'access_token' not in token:
+        if not token.access_token:
             print(f"[!] Failed to acquire token for batch updates")
             return {(parent_id, filename): False for parent_id, filename, _, _, _ in updates_list}
 
         headers = {
-            'Authorization': f"Bearer {token['access_token']}",
+            'Authorization': token.authorization,
             'Content-Type': 'application/json'
         }
 
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent local hash cache for SharePoint sync.
+
+This module stores xxHash128 values between runs, keyed by absolute file path
+and validated against size, modification time, inode and change time, so files
+that haven't changed since the last run are not read and hashed again.
+
+The cache is opt-in (hash_cache_path input). Only runners that keep the
+workspace between runs (self-hosted) benefit: actions/checkout gives every
+file a new mtime on a fresh clone, so a cache restored on a hosted runner
+never matches.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from .utils import is_debug_enabled
+
+# Commit pending inserts after this many new hashes (avoids an fsync per file)
+HASH_CACHE_COMMIT_INTERVAL = 100
+
+# Files changed more recently than this are hashed but not cached
+RACY_MTIME_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+# Cache opened for the current run (see open_hash_cache())
+_active_cache = None
+
+
+def resolve_hash_cache_path(path):
+    """
+    Resolve the hash_cache_path input to a database file path.
+
+    Relative paths are placed under $RUNNER_TEMP (~/.cache when it isn't set),
+    not the workspace: the workspace is the user's checkout, may not be
+    writable by the container user, and later steps could commit the file.
+
+    Args:
+        path (str): hash_cache_path input (absolute or relative)
+
+    Returns:
+        str: Path to the sqlite database file
+    """
+    if os.path.isabs(path):
+        return path
+    base_dir = os.environ.get('RUNNER_TEMP') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base_dir, path)
+
+
+class HashCache:
+    """
+    Thread-safe sqlite store of file hashes keyed by absolute path.
+
+    An entry is only used when the file's current size, st_mtime_ns, st_ino and
+    st_ctime_ns match the values recorded with the hash. Copy tools can keep the
+    size and mtime of a rewritten file (rsync -a, cp -p, touch -r), but not its
+    ctime, and a file replaced by rename gets a new inode.
+
+    The table is read into memory once when the cache is opened, so lookups
+    never touch sqlite or take the lock. Entries for files a run never looks
+    up are removed by prune(), so it only holds the files being synced.
+    """
+
+    def __init__(self, db_path):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path (str): Path to the sqlite database file
+
+        Raises:
+            sqlite3.Error, OSError: If the database cannot be opened
+        """
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS file_hashes ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+            'ino INTEGER, ctime_ns INTEGER, hash TEXT)'
+        )
+        self._conn.commit()
+        # {path: (size, mtime_ns, ino, ctime_ns, hash)} - one query instead of one per file
+        self._entries = {
+            row[0]: row[1:]
+            for row in self._conn.execute(
+                'SELECT path, size, mtime_ns, ino, ctime_ns, hash FROM file_hashes'
+            )
+        }
+        # Paths looked up or recorded in this run (see prune())
+        self._seen = set()
+
+    def get(self, file_path, st):
+        """
+        Look up the hash recorded for a file.
+
+        Args:
+            file_path (str): Path of the file
+            st (os.stat_result): Current stat of the file
+
+        Returns:
+            str: Cached hash, or None if missing or stale
+        """
+        path = os.path.abspath(file_path)
+        self._seen.add(path)
+        row = self._entries.get(path)
+        if row and row[:4] == (st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns):
+            return row[4]
+        return None
+
+    def put(self, file_path, st, file_hash):
+        """
+        Record the hash for a file.
+
+        Args:
+            file_path (str): Path of the file
+            st (os.stat_result): Stat of the file taken before hashing
+            file_hash (str): Hash of the file contents
+        """
+        # Don't trust files changed within the last couple of seconds: a
+        # same-size write in the same timestamp tick would go unnoticed next run
+        if time.time_ns() - max(st.st_mtime_ns, st.st_ctime_ns) < RACY_MTIME_WINDOW_NS:
+            return
+
+        path = os.path.abspath(file_path)
+        entry = (st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns, file_hash)
+        with self._lock:
+            self._seen.add(path)
+            self._entries[path] = entry
+            self._conn.execute(
+                'INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, ino, ctime_ns, hash) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (path,) + entry
+            )
+            self._pending += 1
+            if self._pending >= HASH_CACHE_COMMIT_INTERVAL:
+                self._conn.commit()
+                self._pending = 0
+
+    def prune(self):
+        """
+        Delete the entries of files that were not looked up or recorded in this run.
+
+        Call only after a complete sync pass, or entries of files the run never
+        reached are lost.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            stale = self._entries.keys() - self._seen
+            if stale:
+                self._conn.executemany('DELETE FROM file_hashes WHERE path=?', ((path,) for path in stale))
+                for path in stale:
+                    del self._entries[path]
+            return len(stale)
+
+    def close(self):
+        """Commit pending entries and close the database."""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+            self._pending = 0
+
+
+def open_hash_cache(path):
+    """
+    Open the hash cache and make it active for calculate_file_hash().
+
+    Nothing is opened or created when no path is configured. Failure to open
+    the cache is not fatal - hashing simply proceeds uncached.
+
+    Args:
+        path (str): hash_cache_path input (see resolve_hash_cache_path()), or
+                    an empty string to leave caching disabled
+
+    Returns:
+        HashCache: The active cache, or None if disabled or it could not be opened
+    """
+    global _active_cache
+    _active_cache = None
+    if not path:
+        return None
+
+    db_path = resolve_hash_cache_path(path)
+    try:
+        _active_cache = HashCache(db_path)
+        if is_debug_enabled():
+            print(f"[DEBUG] Using local hash cache: {db_path}")
+    except (sqlite3.Error, OSError) as e:
+        print(f"[!] Warning: Hash cache disabled, could not open {db_path}: {e}")
+    return _active_cache
+
+
+def get_active_hash_cache():
+    """
+    Get the hash cache opened for this run.
+
+    Returns:
+        HashCache: The active cache, or None if caching is disabled
+    """
+    return _active_cache
+
+
+def prune_hash_cache():
+    """Remove entries for files this run didn't hash from the active cache, if any."""
+    if _active_cache is None:
+        return
+    try:
+        removed = _active_cache.prune()
+    except sqlite3.Error as e:
+        print(f"[!] Warning: Could not prune hash cache: {e}")
+        return
+    if removed and is_debug_enabled():
+        print(f"[DEBUG] Removed {removed} stale hash cache entries")
+
+
+def close_hash_cache():
+    """Commit and close the active hash cache, if any."""
+    global _active_cache
+    if _active_cache is not None:
+        try:
+            _active_cache.close()
+        except sqlite3.Error as e:
+            print(f"[!] Warning: Could not save hash cache: {e}")
+        _active_cache = None
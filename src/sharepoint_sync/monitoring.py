@@ -6,7 +6,9 @@ This module provides classes for monitoring Graph API rate limits and tracking
 upload statistics.
 """
 
-import os
+import threading
+
+from .utils import is_debug_metadata_enabled, print_banner, BANNER_BAR
 
 
 class RateLimitMonitor:
@@ -19,10 +21,14 @@ class RateLimitMonitor:
     - x-ms-throttle-scope: Throttling scope details
 
     Headers only appear when >80% of limit consumed.
+
+    Responses arrive from many worker threads at once, so every counter
+    update is made under one lock (a bare += on a dict item can lose updates).
     """
 
     def __init__(self):
         """Initialize rate limit monitoring metrics"""
+        self._lock = threading.Lock()
         self.metrics = {
             'total_requests': 0,
             'throttled_requests': 0,
@@ -69,57 +75,64 @@ class RateLimitMonitor:
         Returns:
             dict: Rate limiting information extracted from headers
         """
-        self.metrics['total_requests'] += 1
-
-        # Track request method type
-        if method and method.upper() in self.request_types:
-            self.request_types[method.upper()] += 1
-
-        # Track operation type based on URL and method
-        if url and method:
-            self._categorize_operation(url, method.upper())
-
         headers = response.headers
         throttle_percentage = headers.get('x-ms-throttle-limit-percentage')
         resource_unit = headers.get('x-ms-resource-unit')
         throttle_scope = headers.get('x-ms-throttle-scope')
-
-        if throttle_percentage:
-            percentage = float(throttle_percentage)
-            self.metrics['max_throttle_percentage'] = max(
-                self.metrics['max_throttle_percentage'],
-                percentage
-            )
-
-            # Calculate running average
-            current_avg = self.metrics['average_throttle_percentage']
-            total_requests = self.metrics['total_requests']
-            self.metrics['average_throttle_percentage'] = (
-                ((current_avg * (total_requests - 1)) + percentage) / total_requests
-            )
-
+        percentage = float(throttle_percentage) if throttle_percentage else None
+        units = int(resource_unit) if resource_unit else None
+        method = method.upper() if method else None
+
+        with self._lock:
+            self.metrics['total_requests'] += 1
+
+            # Track request method type
+            if method in self.request_types:
+                self.request_types[method] += 1
+
+            # Track operation type based on URL and method
+            if url and method:
+                self._categorize_operation(url, method)
+
+            if percentage is not None:
+                self.metrics['max_throttle_percentage'] = max(
+                    self.metrics['max_throttle_percentage'],
+                    percentage
+                )
+
+                # Calculate running average
+                current_avg = self.metrics['average_throttle_percentage']
+                total_requests = self.metrics['total_requests']
+                self.metrics['average_throttle_percentage'] = (
+                    ((current_avg * (total_requests - 1)) + percentage) / total_requests
+                )
+
+                if percentage >= 1.0:
+                    self.metrics['throttled_requests'] += 1
+                elif percentage >= self.throttle_threshold:
+                    self.metrics['alerts_triggered'] += 1
+
+            if units is not None:
+                self.metrics['resource_units_consumed'] += units
+
+        # Report outside the lock
+        if percentage is not None:
             if percentage >= 1.0:
-                self.metrics['throttled_requests'] += 1
                 print(f"[!] THROTTLING DETECTED: {percentage:.1%} of limit used")
 
                 if throttle_scope:
                     print(f"[!] Throttle scope: {throttle_scope}")
 
             elif percentage >= self.throttle_threshold:
-                self.metrics['alerts_triggered'] += 1
                 print(f"[ ] Rate limit warning: {percentage:.1%} of limit used")
 
-        if resource_unit:
-            units = int(resource_unit)
-            self.metrics['resource_units_consumed'] += units
-            # Only print if debug mode is enabled
-            debug_metadata = os.environ.get('DEBUG_METADATA', 'false').lower() == 'true'
-            if debug_metadata:
-                print(f"[=] Resource units consumed: {units}")
+        # Only print if debug mode is enabled
+        if units is not None and is_debug_metadata_enabled():
+            print(f"[=] Resource units consumed: {units}")
 
         return {
-            'throttle_percentage': float(throttle_percentage) if throttle_percentage else None,
-            'resource_unit': int(resource_unit) if resource_unit else None,
+            'throttle_percentage': percentage,
+            'resource_unit': units,
             'throttle_scope': throttle_scope,
             'is_throttled': response.status_code == 429
         }
@@ -128,6 +141,8 @@ class RateLimitMonitor:
         """
         Categorize API operation based on URL pattern and HTTP method.
 
+        Called with the lock held.
+
         Args:
             url (str): Request URL
             method (str): HTTP method (GET, POST, PUT, PATCH, DELETE)
@@ -214,9 +229,7 @@ def print_rate_limiting_summary():
     """
     metrics = rate_monitor.get_metrics_summary()
 
-    print("\n" + "="*60)
-    print("GRAPH API RATE LIMITING SUMMARY")
-    print("="*60)
+    print_banner("GRAPH API RATE LIMITING SUMMARY")
     print(f"[STATS] API Request Statistics:")
     print(f"   - Total API Requests:       {metrics['total_requests']:>6}")
     print(f"   - Throttled Requests:       {metrics['throttled_requests']:>6} ({metrics['throttle_rate']:.1%})")
@@ -248,7 +261,7 @@ def print_rate_limiting_summary():
         print(f"\n[ ] CAUTION: Approached throttling limits")
     else:
         print(f"\n[OK] Stayed within throttling limits")
-    print("="*60)
+    print(BANNER_BAR)
 
 
 class UploadStatistics:
@@ -373,6 +386,10 @@ class UploadStatistics:
             print(f"   - Sync efficiency: {efficiency:.1f}% (bandwidth saved by smart sync)")
 
 
+# Units used by format_bytes(), in steps of 1024
+BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+
 def format_bytes(bytes_value):
     """
     Convert bytes to human-readable format.
@@ -383,11 +400,11 @@ def format_bytes(bytes_value):
     Returns:
         str: Human-readable string (e.g., "1.5 MB")
     """
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes_value < 1024.0:
-            return f"{bytes_value:.1f} {unit}"
-        bytes_value /= 1024.0
-    return f"{bytes_value:.1f} TB"
+    # Each unit is 2**10 of the previous one, so the bit length picks the unit
+    # directly instead of dividing by 1024 in a loop
+    bytes_value = int(bytes_value)
+    unit_index = min(len(BYTE_UNITS) - 1, (bytes_value.bit_length() - 1) // 10) if bytes_value > 0 else 0
+    return f"{bytes_value / (1 << (10 * unit_index)):.1f} {BYTE_UNITS[unit_index]}"
 
 
 # Global upload statistics instance
@@ -7,9 +7,12 @@ compatibility with existing code, console output, and statistics tracking.
 """
 
 import os
+import stat
 import time
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections import ChainMap
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from .thread_utils import (
     ThreadSafeStatsWrapper,
     ThreadSafeSet,
@@ -18,7 +21,9 @@ from .thread_utils import (
 )
 from .uploader import upload_file_with_structure, upload_file
 from .markdown_converter import convert_markdown_to_html, rewrite_markdown_links
-from .file_handler import sanitize_path_components
+from .file_handler import (
+    sanitize_path_components, prefetch_file_hashes, clear_prefetched_hashes
+)
 from .utils import is_debug_enabled
 from .monitoring import rate_monitor
 
@@ -34,7 +39,8 @@ class ParallelUploader:
     - Handling errors per-file like sequential mode
     """
 
-    def __init__(self, max_workers=4, upload_stats_instance=None, batch_metadata_updates=True):
+    def __init__(self, max_workers=4, upload_stats_instance=None, batch_metadata_updates=True,
+                 max_markdown_workers=4):
         """
         Initialize parallel uploader.
 
@@ -42,8 +48,10 @@ class ParallelUploader:
             max_workers (int): Maximum concurrent upload threads (default: 4)
             upload_stats_instance: Reference to global upload_stats instance
             batch_metadata_updates (bool): Use batch updates for FileHash metadata
+            max_markdown_workers (int): Maximum concurrent markdown conversions (default: 4)
         """
         self.max_workers = max_workers
+        self.max_markdown_workers = max_markdown_workers
         self.batch_metadata = batch_metadata_updates
 
         # Wrap existing stats with thread-safety
@@ -72,13 +80,38 @@ class ParallelUploader:
         # Thread-safe list for files with Mermaid diagram failures
         # Each item: (relative_path, num_failed, num_total)
         self.mermaid_failed_files = []
-        self.mermaid_failed_files_lock = __import__('threading').Lock()
+        self.mermaid_failed_files_lock = threading.Lock()
 
         # Queue for batch metadata updates
         self.metadata_queue = BatchQueue(batch_size=20) if self.batch_metadata else None
 
+        # Set when a regular file upload fails (checked by concurrent sync deletion)
+        self.upload_failed = threading.Event()
+
+    @classmethod
+    def from_config(cls, config, upload_stats_instance=None, batch_metadata_updates=True):
+        """
+        Create a parallel uploader sized from a parsed Config.
+
+        Args:
+            config (Config): Parsed sync configuration
+            upload_stats_instance: Reference to global upload_stats instance
+            batch_metadata_updates (bool): Use batch updates for FileHash metadata
+
+        Returns:
+            ParallelUploader: Uploader using config.max_upload_workers upload threads
+                              and config.max_markdown_workers conversion threads
+        """
+        return cls(
+            max_workers=config.max_upload_workers,
+            upload_stats_instance=upload_stats_instance,
+            batch_metadata_updates=batch_metadata_updates,
+            max_markdown_workers=config.max_markdown_workers
+        )
+
     def process_files(self, local_files, site_id, drive_id, root_item_id, base_path, config,
-                     filehash_available, library_name, converted_md_files_set=None, sharepoint_cache=None):
+                     filehash_available, library_name, converted_md_files_set=None, sharepoint_cache=None,
+                     on_uploads_started=None):
         """
         Process and upload files in parallel.
 
@@ -93,10 +126,26 @@ class ParallelUploader:
             library_name (str): SharePoint library name
             converted_md_files_set (set): Set to track converted markdown files
             sharepoint_cache (dict): Optional pre-built cache of SharePoint file metadata
+            on_uploads_started (callable): Optional callback made once the regular file
+                                           uploads start, if markdown processing had no failures
 
         Returns:
             int: Number of failed uploads
         """
+        try:
+            return self._process_files(
+                local_files, site_id, drive_id, root_item_id, base_path, config,
+                filehash_available, library_name, converted_md_files_set, sharepoint_cache,
+                on_uploads_started
+            )
+        finally:
+            # Fold the per-thread counters into upload_stats for the summary
+            self.stats_wrapper.flush()
+
+    def _process_files(self, local_files, site_id, drive_id, root_item_id, base_path, config,
+                       filehash_available, library_name, converted_md_files_set, sharepoint_cache,
+                       on_uploads_started):
+        """Body of process_files() (see there); counters are flushed by the caller."""
         # Store cache for workers to access
         # Extract files cache from new structure if present
         if isinstance(sharepoint_cache, dict) and 'files' in sharepoint_cache:
@@ -111,14 +160,27 @@ class ParallelUploader:
         # Separate markdown files from regular files
         md_files = []
         regular_files = []
+        file_stats = {}
 
         for f in local_files:
-            if os.path.isfile(f):
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                file_stats[f] = st
                 if f.lower().endswith('.md') and config.convert_md_to_html:
                     md_files.append(f)
                 else:
                     regular_files.append(f)
 
+        # Largest first (LPT scheduling): a big file started last would leave
+        # the other workers idle while it finishes, small files fill the gaps
+        def file_size(path):
+            return file_stats[path].st_size
+        md_files.sort(key=file_size, reverse=True)
+        regular_files.sort(key=file_size, reverse=True)
+
         failed_count = 0
 
         # Process markdown files first (may need conversion)
@@ -174,10 +236,45 @@ class ParallelUploader:
             if is_debug_enabled():
                 print(f"[DEBUG] Uploading {len(regular_files)} files in parallel (workers: {self.max_workers})...")
 
-            failed_count += self._upload_files_parallel(
-                regular_files, site_id, drive_id, root_item_id, base_path, config,
-                filehash_available, library_name
-            )
+            if not config.force_upload:
+                # Same display path derivation as upload_file_with_structure()
+                display_paths = {}
+                for file_path in regular_files:
+                    rel_path = os.path.relpath(file_path, base_path) if base_path else file_path
+                    display_paths[file_path] = sanitize_path_components(rel_path.replace('\\', '/'))
+
+                # Resolve cache misses in batches instead of one GET per file
+                self._prefetch_remote_items(
+                    display_paths.values(), site_id, drive_id, root_item_id, config,
+                    filehash_available
+                )
+
+                # Hash the files that will need a hash in the background,
+                # so upload workers don't wait on the disk between requests
+                # (raw .md files are rewritten to a temp file before hashing)
+                file_cache = self.sharepoint_cache or {}
+
+                def needs_hash(file_path):
+                    if file_path.lower().endswith('.md'):
+                        return False
+                    cached_file = file_cache.get(display_paths[file_path])
+                    # A size mismatch is decided without a hash; it's only needed for FileHash
+                    size_changed = (cached_file and cached_file.get('size') is not None
+                                    and cached_file['size'] != file_stats[file_path].st_size)
+                    return filehash_available or not size_changed
+
+                prefetch_file_hashes([file_path for file_path in regular_files if needs_hash(file_path)])
+
+            if on_uploads_started is not None and failed_count == 0:
+                on_uploads_started()
+
+            try:
+                failed_count += self._upload_files_parallel(
+                    regular_files, site_id, drive_id, root_item_id, base_path, config,
+                    filehash_available, library_name, file_stats
+                )
+            finally:
+                clear_prefetched_hashes()
 
             upload_elapsed = time.time() - upload_start_time
             files_after = self.stats_wrapper.get('new_files', 0) + self.stats_wrapper.get('replaced_files', 0)
@@ -202,6 +299,46 @@ class ParallelUploader:
 
         return failed_count
 
+    def _prefetch_remote_items(self, display_paths, site_id, drive_id, root_item_id, config,
+                               filehash_available):
+        """
+        Look up files missing from the SharePoint cache using batched Graph requests.
+
+        Results are layered over the files cache (collections.ChainMap) so the
+        shared cache (also used by sync deletion) is left untouched and not copied. Files confirmed
+        absent are stored as None so check_file_needs_update() can skip its
+        per-file API query.
+
+        Args:
+            display_paths (iterable): Sanitized relative paths of the files about to be uploaded
+            site_id (str): SharePoint site ID
+            drive_id (str): SharePoint drive ID
+            root_item_id (str): Root folder item ID
+            config: Configuration object
+            filehash_available (bool): Whether FileHash column exists
+        """
+        from .graph_api import batch_get_drive_items
+
+        file_cache = self.sharepoint_cache or {}
+        missing_paths = [display_path for display_path in display_paths if display_path not in file_cache]
+
+        if not missing_paths:
+            return
+
+        if is_debug_enabled():
+            print(f"[DEBUG] Batch looking up {len(missing_paths)} files not found in cache...")
+
+        fetched = batch_get_drive_items(
+            site_id, drive_id, root_item_id, missing_paths,
+            config.tenant_id, config.client_id, config.client_secret,
+            config.login_endpoint, config.graph_endpoint,
+            filehash_available=filehash_available
+        )
+
+        if fetched:
+            # Layer the results over the shared cache instead of copying every entry
+            self.sharepoint_cache = ChainMap(fetched, file_cache)
+
     def _preprocess_markdown_file(self, file_path, base_path, config):
         """
         Preprocess a raw markdown file to rewrite internal links to SharePoint URLs.
@@ -273,10 +410,13 @@ class ParallelUploader:
             return file_path
 
     def _upload_files_parallel(self, file_list, site_id, drive_id, root_item_id, base_path, config,
-                               filehash_available, library_name):
+                               filehash_available, library_name, file_stats=None):
         """
         Upload regular files in parallel.
 
+        file_stats maps paths to the stat results taken in _process_files()
+        when sorting files by size, so the upload path doesn't stat each file again.
+
         Returns:
             int: Number of failed uploads
         """
@@ -285,8 +425,6 @@ class ParallelUploader:
 
         def upload_worker(worker_id, filepath):
             """Worker function for parallel upload"""
-            import threading
-
             # Name this thread for debug logging
             threading.current_thread().name = f"Upload-{worker_id}"
 
@@ -318,7 +456,9 @@ class ParallelUploader:
                     self.stats_wrapper,  # Thread-safe wrapper
                     config.max_retry,
                     metadata_queue=self.metadata_queue,  # Pass queue for batch updates
-                    sharepoint_cache=self.sharepoint_cache  # Pass cache for instant lookups
+                    sharepoint_cache=self.sharepoint_cache,  # Pass cache for instant lookups
+                    # The _process_files() stat only describes the original file, not a temp copy
+                    local_stat=None if is_temp or not file_stats else file_stats.get(filepath)
                 )
                 return True
 
@@ -326,6 +466,7 @@ class ParallelUploader:
                 # Error already logged by upload function
                 print(f"[!] Upload failed for {filepath}: {str(upload_err)[:200]}")
                 self.stats_wrapper.increment('failed_files')
+                self.upload_failed.set()
                 return False
             finally:
                 # Clean up temp file if one was created
@@ -359,68 +500,106 @@ class ParallelUploader:
                     print(f"[!] Unexpected error processing {file_path}: {e}")
                     failed_count += 1
                     self.stats_wrapper.increment('failed_files')
+                    self.upload_failed.set()
 
         return failed_count
 
     def _process_markdown_files_parallel(self, md_files, site_id, drive_id, root_item_id, base_path,
                                         config, filehash_available, library_name):
         """
-        Process markdown files in parallel (conversion + upload).
+        Process markdown files as a two-stage pipeline (conversion -> upload).
+
+        Conversions run on max_markdown_workers threads (bounded by Mermaid/
+        Chromium memory use); each converted file is handed straight to a
+        separate pool of max_workers upload threads, so conversion of one file
+        overlaps with the upload of others.
 
         Returns:
             int: Number of failed conversions/uploads
         """
         failed_count = 0
+        upload_futures = {}
 
-        def process_md_worker(worker_id, md_filepath):
-            """Worker for markdown processing"""
-            import threading
-
+        def process_md_worker(worker_id, md_filepath, submit_upload):
+            """Worker for markdown conversion"""
             # Name this thread for debug logging
             threading.current_thread().name = f"Convert-{worker_id}"
 
             enable_thread_safe_print()
 
             try:
-                md_success = self._process_single_markdown_file(
+                return self._process_single_markdown_file(
                     md_filepath, site_id, drive_id, root_item_id, base_path, config,
-                    filehash_available, library_name
+                    filehash_available, library_name, submit_upload=submit_upload
                 )
-                if md_success:
-                    self.converted_md_files.add(md_filepath)
-                return md_success
 
             except Exception as md_err:
                 print(f"[!] Markdown processing failed for {md_filepath}: {md_err}")
                 return False
 
-        # Process markdown files in parallel
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        def upload_worker(upload_func, *args):
+            """Worker for uploading converted HTML"""
+            enable_thread_safe_print()
+            return upload_func(*args)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Upload") as upload_executor, \
+                ThreadPoolExecutor(max_workers=self.max_markdown_workers) as convert_executor:
+
+            def submit_upload(upload_func, *args):
+                return upload_executor.submit(upload_worker, upload_func, *args)
+
             future_to_file = {
-                executor.submit(process_md_worker, idx % self.max_workers + 1, f): f
+                convert_executor.submit(process_md_worker, idx % self.max_markdown_workers + 1, f, submit_upload): f
                 for idx, f in enumerate(md_files)
             }
 
+            # Stage 1: conversions (unchanged files finish here)
             for future in as_completed(future_to_file):
                 md_file = future_to_file[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[!] Unexpected error with {md_file}: {e}")
+                    failed_count += 1
+                    continue
+
+                if isinstance(result, Future):
+                    upload_futures[result] = md_file  # Converted, upload in flight
+                elif result:
+                    self.converted_md_files.add(md_file)
+                else:
+                    failed_count += 1
+
+            # Stage 2: uploads of converted files
+            for future in as_completed(upload_futures):
+                md_file = upload_futures[future]
                 try:
                     success = future.result()
-                    if not success:
-                        failed_count += 1
                 except Exception as e:
                     print(f"[!] Unexpected error with {md_file}: {e}")
+                    success = False
+
+                if success:
+                    self.converted_md_files.add(md_file)
+                else:
                     failed_count += 1
 
         return failed_count
 
     def _process_single_markdown_file(self, file_path, site_id, drive_id, root_item_id, base_path,
-                                      config, filehash_available, library_name):
+                                      config, filehash_available, library_name, submit_upload=None):
         """
         Process single markdown file (convert + upload).
         Mirrors logic from main.py:process_markdown_file()
 
+        Args:
+            submit_upload (callable): Optional submit_upload(func, *args) -> Future used to
+                hand the upload stage to another thread pool. If None, the
+                converted file is uploaded inline.
+
         Returns:
-            bool: True if successful
+            bool or Future: True if successful (or nothing to do), False on failure,
+                or the Future of the pending upload when submit_upload is given
         """
         if is_debug_enabled():
             print(f"[MD] Converting markdown file: {file_path}")
@@ -553,7 +732,31 @@ class ParallelUploader:
 
             # Paths and target folder already calculated above (before early check)
             # No need to recalculate: original_html_path, desired_html_filename, sanitized_rel_path, target_folder_id
+            upload_args = (
+                file_path, html_path, original_html_path, desired_html_filename, sanitized_rel_path,
+                target_folder_id, md_file_hash, site_id, drive_id, root_item_id, base_path,
+                config, filehash_available, library_name
+            )
+            if submit_upload is not None:
+                return submit_upload(self._upload_converted_markdown, *upload_args)
+            return self._upload_converted_markdown(*upload_args)
 
+        except Exception as e:
+            return self._handle_markdown_failure(
+                file_path, e, site_id, drive_id, root_item_id, base_path,
+                config, filehash_available, library_name
+            )
+
+    def _upload_converted_markdown(self, file_path, html_path, original_html_path, desired_html_filename,
+                                   sanitized_rel_path, target_folder_id, md_file_hash, site_id, drive_id,
+                                   root_item_id, base_path, config, filehash_available, library_name):
+        """
+        Upload the converted HTML for a markdown file and remove the temp file.
+
+        Returns:
+            bool: True if successful (including fallback raw .md upload)
+        """
+        try:
             # Upload HTML file with source .md file hash
             # This allows hash-based comparison instead of size-only (solves Mermaid SVG ID variation issue)
             # Force upload if force_md_to_html_regeneration is true (always upload newly regenerated HTML)
@@ -580,30 +783,44 @@ class ParallelUploader:
                         print(f"[!] Retrying upload... ({i+1}/{config.max_retry})")
                         time.sleep(2)
 
+            self.stats_wrapper.increment('md_converted')
+            return True
+
+        except Exception as e:
+            return self._handle_markdown_failure(
+                file_path, e, site_id, drive_id, root_item_id, base_path,
+                config, filehash_available, library_name
+            )
+
+        finally:
             # Clean up temp file
             if os.path.exists(html_path):
                 os.remove(html_path)
 
-            self.stats_wrapper.increment('md_converted')
-            return True
+    def _handle_markdown_failure(self, file_path, error, site_id, drive_id, root_item_id, base_path,
+                                 config, filehash_available, library_name):
+        """
+        Record a failed markdown conversion/upload and fall back to uploading the raw .md file.
 
-        except Exception as e:
-            print(f"[Error] Failed to convert markdown file {file_path}: {e}")
-            self.stats_wrapper.increment('md_conversion_failed')
-            # Fall back to uploading raw markdown
-            try:
-                upload_file_with_structure(
-                    site_id, drive_id, root_item_id, file_path, base_path, config.tenant_url, library_name,
-                    4*1024*1024, config.force_upload, filehash_available,
-                    config.tenant_id, config.client_id, config.client_secret,
-                    config.login_endpoint, config.graph_endpoint,
-                    self.stats_wrapper, config.max_retry,
-                    metadata_queue=self.metadata_queue  # Pass queue for batch updates
-                )
-                return True
-            except Exception as fallback_error:
-                print(f"[Error] Fallback markdown upload failed: {fallback_error}")
-                return False
+        Returns:
+            bool: True if the fallback upload succeeded
+        """
+        print(f"[Error] Failed to convert markdown file {file_path}: {error}")
+        self.stats_wrapper.increment('md_conversion_failed')
+        # Fall back to uploading raw markdown
+        try:
+            upload_file_with_structure(
+                site_id, drive_id, root_item_id, file_path, base_path, config.tenant_url, library_name,
+                4*1024*1024, config.force_upload, filehash_available,
+                config.tenant_id, config.client_id, config.client_secret,
+                config.login_endpoint, config.graph_endpoint,
+                self.stats_wrapper, config.max_retry,
+                metadata_queue=self.metadata_queue  # Pass queue for batch updates
+            )
+            return True
+        except Exception as fallback_error:
+            print(f"[Error] Fallback markdown upload failed: {fallback_error}")
+            return False
 
     def _flush_metadata_queue(self, config, library_name):
         """
@@ -6,9 +6,11 @@ This module provides thread-safe wrappers for console output and statistics
 to maintain compatibility with existing code while enabling parallel execution.
 """
 
+import sys
 import threading
 import builtins
 from queue import Queue, Empty
+from .utils import is_debug_enabled
 
 # Global locks for thread-safe operations
 _console_lock = threading.Lock()
@@ -29,45 +31,68 @@ def thread_safe_print(*args, **kwargs):
         *args: Same as print()
         **kwargs: Same as print()
     """
-    import os
-
     # Check if debug mode is enabled
-    show_thread_id = os.environ.get('DEBUG', '').lower() == 'true'
+    show_thread_id = is_debug_enabled()
 
     with _console_lock:
         if show_thread_id and args:
-            # Get thread information
-            thread_name = threading.current_thread().name
-
-            # Determine thread prefix based on thread name
-            if thread_name == "MainThread":
-                prefix = "[Main]"
-            elif thread_name.startswith("Upload-"):
-                # Upload worker: "Upload-1" -> "[Upload-1]"
-                prefix = f"[{thread_name}]"
-            elif thread_name.startswith("Convert-"):
-                # Conversion worker: "Convert-1" -> "[Convert-1]"
-                prefix = f"[{thread_name}]"
-            elif "ThreadPoolExecutor" in thread_name:
-                # Unnamed worker thread - extract number
-                parts = thread_name.split('_')
-                if len(parts) > 1:
-                    worker_num = parts[-1]
-                else:
-                    parts = thread_name.split('-')
-                    worker_num = parts[-1] if parts[-1].isdigit() else "?"
-                prefix = f"[Worker-{worker_num}]"
-            else:
-                # Unknown thread type - use name as-is (truncated)
-                prefix = f"[{thread_name[:10]}]"
-
             # Prepend thread identifier to output
-            _original_print(prefix, *args, **kwargs)
+            _original_print(_thread_prefix(), *args, **kwargs)
         else:
             # Normal mode (DEBUG=false) or empty print call
             _original_print(*args, **kwargs)
 
 
+def _thread_prefix():
+    """
+    Get the DEBUG-mode output prefix identifying the current thread.
+
+    Returns:
+        str: Prefix such as "[Main]", "[Upload-1]" or "[Convert-2]"
+    """
+    thread_name = threading.current_thread().name
+
+    # Determine thread prefix based on thread name
+    if thread_name == "MainThread":
+        return "[Main]"
+    elif thread_name.startswith("Upload-"):
+        # Upload worker: "Upload-1" -> "[Upload-1]"
+        return f"[{thread_name}]"
+    elif thread_name.startswith("Convert-"):
+        # Conversion worker: "Convert-1" -> "[Convert-1]"
+        return f"[{thread_name}]"
+    elif "ThreadPoolExecutor" in thread_name:
+        # Unnamed worker thread - extract number
+        parts = thread_name.split('_')
+        if len(parts) > 1:
+            worker_num = parts[-1]
+        else:
+            parts = thread_name.split('-')
+            worker_num = parts[-1] if parts[-1].isdigit() else "?"
+        return f"[Worker-{worker_num}]"
+    else:
+        # Unknown thread type - use name as-is (truncated)
+        return f"[{thread_name[:10]}]"
+
+
+def print_lines(lines):
+    """
+    Print many lines with one lock acquisition and one writelines() call.
+
+    Produces the same output as calling print(line) for each line (including
+    the DEBUG-mode thread prefix), without a Python-level print per line.
+
+    Args:
+        lines (iterable): Lines to print, without trailing newlines
+    """
+    with _console_lock:
+        if is_debug_enabled():
+            prefix = _thread_prefix() + ' '
+            sys.stdout.writelines(f"{prefix}{line}\n" for line in lines)
+        else:
+            sys.stdout.writelines(f"{line}\n" for line in lines)
+
+
 def enable_thread_safe_print():
     """
     Replace built-in print() with thread-safe version in current thread.
@@ -89,11 +114,18 @@ class ThreadSafeStatsWrapper:
     maintaining 100% compatibility with existing code that accesses
     upload_stats.stats directly.
 
+    Counters are striped (LongAdder-style): increment() adds to a dict owned
+    by the calling thread, so concurrent workers never wait on one shared
+    lock. Reads through the wrapper sum the wrapped dict and every thread's
+    cell. Call flush() once the workers are done to fold the cells into the
+    wrapped dict before reading it directly.
+
     Example:
         from sharepoint_sync.monitoring import upload_stats
         stats_wrapper = ThreadSafeStatsWrapper(upload_stats.stats)
-        stats_wrapper['new_files'] += 1  # Thread-safe
+        stats_wrapper.increment('new_files')  # Thread-safe, uncontended
         value = stats_wrapper.get('skipped_files', 0)  # Thread-safe
+        stats_wrapper.flush()  # upload_stats.stats is now up to date
     """
 
     def __init__(self, stats_dict):
@@ -105,37 +137,61 @@ class ThreadSafeStatsWrapper:
         """
         self._stats = stats_dict  # Reference to actual stats dict
         self._lock = threading.Lock()
+        self._cells = []  # One counter dict per thread that has incremented
+        self._local = threading.local()
+
+    def _cell(self):
+        """Get the calling thread's counter dict (registered on first use)."""
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = {}
+            with self._lock:
+                self._cells.append(cell)
+            return cell
+
+    def _striped(self, key):
+        """Sum of key over all thread cells (call with the lock held)."""
+        return sum(cell.get(key, 0) for cell in self._cells)
 
     def __getitem__(self, key):
         """Thread-safe dictionary access: stats[key]"""
         with self._lock:
-            return self._stats[key]
+            if key in self._stats:
+                return self._stats[key] + self._striped(key)
+            if any(key in cell for cell in self._cells):
+                return self._striped(key)
+            raise KeyError(key)
 
     def __setitem__(self, key, value):
         """Thread-safe dictionary assignment: stats[key] = value"""
         with self._lock:
-            self._stats[key] = value
+            self._stats[key] = value - self._striped(key)
 
     def get(self, key, default=None):
         """Thread-safe dictionary get: stats.get(key, default)"""
-        with self._lock:
-            return self._stats.get(key, default)
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
     def __contains__(self, key):
         """Thread-safe containment check: key in stats"""
         with self._lock:
-            return key in self._stats
+            return key in self._stats or any(key in cell for cell in self._cells)
 
     def increment(self, key, value=1):
         """
         Thread-safe increment operation.
 
+        Only the calling thread writes its cell, so no lock is needed.
+
         Args:
             key (str): Statistics field to increment
             value (int/float): Amount to increment by (default: 1)
         """
-        with self._lock:
-            self._stats[key] = self._stats.get(key, 0) + value
+        cell = self._cell()
+        cell[key] = cell.get(key, 0) + value
 
     def decrement(self, key, value=1):
         """
@@ -146,7 +202,8 @@ class ThreadSafeStatsWrapper:
             value (int/float): Amount to decrement by (default: 1)
         """
         with self._lock:
-            self._stats[key] = max(0, self._stats.get(key, 0) - value)  # Don't go below 0
+            total = self._stats.get(key, 0) + self._striped(key)
+            self._stats[key] = self._stats.get(key, 0) - min(value, max(0, total))  # Don't go below 0
 
     def add_bytes(self, key, bytes_count):
         """
@@ -156,8 +213,45 @@ class ThreadSafeStatsWrapper:
             key (str): Byte counter field ('bytes_uploaded' or 'bytes_skipped')
             bytes_count (int): Number of bytes to add
         """
+        self.increment(key, bytes_count)
+
+    def flush(self):
+        """
+        Fold every thread's counts into the wrapped stats dictionary.
+
+        Only call this while no other thread is incrementing (e.g., after the
+        worker pool has shut down).
+        """
         with self._lock:
-            self._stats[key] = self._stats.get(key, 0) + bytes_count
+            for cell in self._cells:
+                for key, value in cell.items():
+                    self._stats[key] = self._stats.get(key, 0) + value
+                cell.clear()
+
+
+def stats_incrementer(upload_stats_dict):
+    """
+    Get a function that adds to a counter in upload_stats_dict.
+
+    Resolve it once per call of a hot function instead of checking the stats
+    backend at every counter: uses the atomic increment() of
+    ThreadSafeStatsWrapper (parallel mode) when available, a plain dict update
+    otherwise, and does nothing without stats.
+
+    Args:
+        upload_stats_dict (dict): Upload statistics dictionary or wrapper (may be None)
+
+    Returns:
+        callable: inc(key, value=1)
+    """
+    if not upload_stats_dict:
+        return lambda key, value=1: None
+    if hasattr(upload_stats_dict, 'increment'):
+        return upload_stats_dict.increment
+
+    def inc(key, value=1):
+        upload_stats_dict[key] = upload_stats_dict.get(key, 0) + value
+    return inc
 
 
 class ThreadSafeCounter:
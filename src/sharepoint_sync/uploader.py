@@ -24,7 +24,8 @@ from .graph_api import (
     create_upload_session_graph,
     upload_file_chunk_graph
 )
-from .utils import is_debug_enabled
+from .utils import is_debug_enabled, is_debug_metadata_enabled
+from .thread_utils import stats_incrementer
 
 # Global cache for created folders
 # Using a dictionary (path -> folder_item_dict) to avoid redundant API calls
@@ -420,7 +421,8 @@ def check_and_delete_existing_file(drive, file_name):
 def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force_upload, site_url, list_name,
                 filehash_column_available, tenant_id, client_id, client_secret,
                 login_endpoint, graph_endpoint, upload_stats_dict, desired_name=None,
-                metadata_queue=None, pre_calculated_hash=None, display_path=None, sharepoint_cache=None):
+                metadata_queue=None, pre_calculated_hash=None, display_path=None, sharepoint_cache=None,
+                local_stat=None):
     """
     Upload a file to SharePoint using Graph API, intelligently skipping unchanged files.
 
@@ -445,10 +447,14 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
         pre_calculated_hash (str): Optional pre-calculated hash to use (for converted markdown using source .md hash)
         display_path (str): Optional relative path for display in debug output (e.g., 'docs/api/README.html')
         sharepoint_cache (dict): Optional pre-built cache of SharePoint file metadata (eliminates API calls for comparison)
+        local_stat (os.stat_result): Optional stat of local_path taken during file discovery
     """
+    debug_enabled = is_debug_enabled()
+    inc = stats_incrementer(upload_stats_dict)
+
     # Use desired_name if provided (for HTML conversions), otherwise use actual filename
     file_name = desired_name if desired_name else os.path.basename(local_path)
-    file_size = os.path.getsize(local_path)
+    file_size = local_stat.st_size if local_stat is not None else os.path.getsize(local_path)
 
     # Sanitize the file name for SharePoint compatibility
     sanitized_name = sanitize_sharepoint_name(file_name, is_folder=False)
@@ -467,39 +473,44 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
             local_path, file_name, site_url, list_name,
             filehash_column_available, tenant_id, client_id, client_secret,
             login_endpoint, graph_endpoint, upload_stats_dict, pre_calculated_hash, display_path,
-            site_id, drive_id, parent_item_id, sharepoint_cache
+            site_id, drive_id, parent_item_id, sharepoint_cache,
+            pre_calculated_size=file_size, local_stat=local_stat
         )
 
         # If file doesn't need updating, skip it
         if not needs_update:
             return  # File is identical, skip upload
 
+        # The check skips hashing when size alone proves a change - hash now for FileHash
+        if local_hash is None and not pre_calculated_hash and filehash_column_available:
+            local_hash = calculate_file_hash(local_path)
+
         # If file exists but needs update, we'll just replace it (Graph API handles conflict)
         if exists and needs_update:
             is_file_update = True
-            if is_debug_enabled():
+            if debug_enabled:
                 display_name = display_path if display_path else file_name
                 print(f"[→] Uploading updated file: {display_name}")
                 if sanitized_name != file_name:
                     print(f"    (Original name: {file_name})")
-            upload_stats_dict['replaced_files'] += 1
+            inc('replaced_files')
         else:
             # New file
-            if is_debug_enabled():
+            if debug_enabled:
                 print(f"[→] Uploading new file: {sanitized_name}")
                 if sanitized_name != file_name:
                     print(f"    (Original name: {file_name})")
-            upload_stats_dict['new_files'] += 1
+            inc('new_files')
     else:
         # Force upload mode - always upload with new hash
         # Use pre_calculated_hash if provided, otherwise calculate from file
         if pre_calculated_hash:
             local_hash = pre_calculated_hash
-            if is_debug_enabled():
+            if debug_enabled:
                 print(f"[#] Using pre-calculated hash for force upload: {local_hash[:8]}...")
         else:
             local_hash = calculate_file_hash(local_path)
-            if local_hash and is_debug_enabled():
+            if local_hash and debug_enabled:
                 print(f"[#] Calculated hash for force upload: {local_hash[:8]}...")
 
         # Check if file exists by listing children
@@ -517,18 +528,18 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
 
             if file_exists:
                 is_file_update = True
-                if is_debug_enabled():
+                if debug_enabled:
                     print(f"[→] Force uploading replacement file: {sanitized_name}")
-                upload_stats_dict['replaced_files'] += 1
+                inc('replaced_files')
             else:
-                if is_debug_enabled():
+                if debug_enabled:
                     print(f"[→] Force uploading new file: {sanitized_name}")
-                upload_stats_dict['new_files'] += 1
+                inc('new_files')
         except Exception as check_error:
-            if is_debug_enabled():
+            if debug_enabled:
                 print(f"[!] Could not check file existence: {check_error}")
             # Assume new file
-            upload_stats_dict['new_files'] += 1
+            inc('new_files')
 
     try:
         # Perform the upload based on file size
@@ -539,24 +550,21 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
 
         if file_size < GRAPH_SMALL_FILE_LIMIT:
             # Small file - use simple upload
-            if is_debug_enabled():
+            if debug_enabled:
                 action = "Updating" if is_file_update else "Uploading"
                 display_name = display_path if display_path else file_name
                 print(f"[→] {action} file with simple upload: {display_name} ({file_size:,} bytes)")
 
-            # Read file content
+            # Stream the file as the request body instead of reading it into memory
             with open(local_path, 'rb') as f:
-                file_content = f.read()
-
-            # Upload using Graph API
-            uploaded_item = upload_small_file_graph(
-                site_id, drive_id, parent_item_id, sanitized_name, file_content,
-                tenant_id, client_id, client_secret, login_endpoint, graph_endpoint
-            )
+                uploaded_item = upload_small_file_graph(
+                    site_id, drive_id, parent_item_id, sanitized_name, f,
+                    tenant_id, client_id, client_secret, login_endpoint, graph_endpoint
+                )
 
             # Verify upload succeeded
             if uploaded_item:
-                if is_debug_enabled():
+                if debug_enabled:
                     result_action = "updated" if is_file_update else "uploaded"
                     print(f"[✓] File {result_action} successfully: {sanitized_name}")
             else:
@@ -576,7 +584,7 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
             )
 
         # Update upload byte counter after successful upload
-        upload_stats_dict['bytes_uploaded'] += file_size
+        inc('bytes_uploaded', file_size)
 
         # Use pre_calculated_hash if provided, otherwise use local_hash from check or force mode
         hash_to_save = pre_calculated_hash if pre_calculated_hash else local_hash
@@ -590,7 +598,7 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
                 item_id = None
 
                 # Primary method: Query by path (most direct since we know the location)
-                if is_debug_enabled():
+                if debug_enabled:
                     print(f"[DEBUG] Fetching list item ID by path: parent={parent_item_id}, file={sanitized_name}")
 
                 try:
@@ -601,20 +609,20 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
                     )
                     if item_with_list and 'listItem' in item_with_list and 'id' in item_with_list['listItem']:
                         item_id = item_with_list['listItem']['id']
-                        if is_debug_enabled():
+                        if debug_enabled:
                             print(f"[DEBUG] Got list item ID by path: {item_id}")
                 except Exception as fetch_error:
-                    if is_debug_enabled():
+                    if debug_enabled:
                         print(f"[DEBUG] Failed to fetch by path: {str(fetch_error)[:200]}")
 
                     # Fallback: If upload response has listItem (unlikely but check)
                     if 'listItem' in uploaded_item and 'id' in uploaded_item['listItem']:
                         item_id = uploaded_item['listItem']['id']
-                        if is_debug_enabled():
+                        if debug_enabled:
                             print(f"[DEBUG] Got list item ID from upload response: {item_id}")
                     # Fallback: Try fetching by drive item ID
                     elif 'id' in uploaded_item:
-                        if is_debug_enabled():
+                        if debug_enabled:
                             print(f"[DEBUG] Trying fallback: fetch by drive item ID: {uploaded_item['id']}")
                         try:
                             from .graph_api import get_drive_item_with_list_item
@@ -624,17 +632,17 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
                             )
                             if item_with_list and 'listItem' in item_with_list and 'id' in item_with_list['listItem']:
                                 item_id = item_with_list['listItem']['id']
-                                if is_debug_enabled():
+                                if debug_enabled:
                                     print(f"[DEBUG] Got list item ID from drive item ID: {item_id}")
                         except Exception as id_fetch_error:
-                            if is_debug_enabled():
+                            if debug_enabled:
                                 print(f"[DEBUG] Failed to fetch by ID: {str(id_fetch_error)[:200]}")
 
                 if not item_id:
                     # This should rarely happen - we should always be able to query by path
                     print(f"[!] ERROR: Could not get list item ID for {display_path}")
                     print(f"[!] This indicates a critical issue with Graph API access")
-                    if is_debug_enabled():
+                    if debug_enabled:
                         print(f"[DEBUG] parent_item_id={parent_item_id}, filename={sanitized_name}")
                         print(f"[DEBUG] uploaded_item keys: {list(uploaded_item.keys()) if uploaded_item else 'None'}")
                     # Don't use filename-only search - it's unreliable for duplicate filenames
@@ -646,15 +654,15 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
                         # Parallel mode: Queue metadata update for batch processing
                         # Store both item_id (for first attempt) and parent_item_id + filename (for retry queries)
                         metadata_queue.put((parent_item_id, sanitized_name, item_id, hash_to_save, is_file_update, display_path))
-                        if is_debug_enabled():
+                        if debug_enabled:
                             queue_size = metadata_queue.qsize() if hasattr(metadata_queue, 'qsize') else 'unknown'
                             print(f"[#] Queued FileHash update for {display_path} (queue size: {queue_size})")
                     else:
                         # Sequential mode: Update immediately (backward compatibility)
-                        if is_debug_enabled():
+                        if debug_enabled:
                             print(f"[#] Setting FileHash metadata...")
 
-                        debug_metadata = os.environ.get('DEBUG_METADATA', 'false').lower() == 'true'
+                        debug_metadata = is_debug_metadata_enabled()
                         if debug_metadata:
                             print(f"[DEBUG] Setting FileHash for {sanitized_name}")
                             print(f"[DEBUG] SharePoint list item ID: {item_id}")
@@ -675,35 +683,35 @@ def upload_file(site_id, drive_id, parent_item_id, local_path, chunk_size, force
                         )
 
                         if success:
-                            if is_debug_enabled():
+                            if debug_enabled:
                                 print(f"[✓] FileHash metadata set: {hash_to_save[:8]}...")
 
                             # Track hash save statistics
                             if is_file_update:
-                                upload_stats_dict['hash_updated'] = upload_stats_dict.get('hash_updated', 0) + 1
+                                inc('hash_updated')
                             else:
-                                upload_stats_dict['hash_new_saved'] = upload_stats_dict.get('hash_new_saved', 0) + 1
+                                inc('hash_new_saved')
 
                         else:
-                            if is_debug_enabled():
+                            if debug_enabled:
                                 print(f"[!] Failed to set FileHash metadata via REST API")
-                            upload_stats_dict['hash_save_failed'] = upload_stats_dict.get('hash_save_failed', 0) + 1
+                            inc('hash_save_failed')
                 else:
-                    if is_debug_enabled():
+                    if debug_enabled:
                         print(f"[!] Could not find list item for uploaded file to set hash metadata")
                     # Only track failure in sequential mode (batch mode handles stats after processing)
                     if metadata_queue is None:
-                        upload_stats_dict['hash_save_failed'] = upload_stats_dict.get('hash_save_failed', 0) + 1
+                        inc('hash_save_failed')
 
             except Exception as hash_error:
                 print(f"[!] Could not set FileHash metadata via REST API: {str(hash_error)[:200]}")
                 # Only track failure in sequential mode (batch mode handles stats after processing)
                 if metadata_queue is None:
-                    upload_stats_dict['hash_save_failed'] = upload_stats_dict.get('hash_save_failed', 0) + 1
+                    inc('hash_save_failed')
                 # Continue anyway - file is uploaded successfully
 
     except Exception as e:
-        upload_stats_dict['failed_files'] += 1
+        inc('failed_files')
         raise e
 
 
@@ -711,7 +719,7 @@ def upload_file_with_structure(site_id, drive_id, root_item_id, local_file_path,
                                 chunk_size, force_upload, filehash_column_available,
                                 tenant_id, client_id, client_secret, login_endpoint,
                                 graph_endpoint, upload_stats_dict, max_retry=3, metadata_queue=None,
-                                sharepoint_cache=None):
+                                sharepoint_cache=None, local_stat=None):
     """
     Upload a file maintaining its directory structure using Graph API.
 
@@ -735,6 +743,7 @@ def upload_file_with_structure(site_id, drive_id, root_item_id, local_file_path,
         max_retry (int): Maximum number of retry attempts (default: 3)
         metadata_queue: Optional BatchQueue for batching metadata updates (parallel mode)
         sharepoint_cache (dict): Optional pre-built cache of SharePoint file metadata
+        local_stat (os.stat_result): Optional stat of local_file_path taken during file discovery
     """
     # Get the relative path of the file
     if base_path:
@@ -791,7 +800,9 @@ def upload_file_with_structure(site_id, drive_id, root_item_id, local_file_path,
                 site_url, list_name, filehash_column_available,
                 tenant_id, client_id, client_secret, login_endpoint,
                 graph_endpoint, upload_stats_dict, metadata_queue=metadata_queue,
-                display_path=display_path, sharepoint_cache=file_cache
+                display_path=display_path, sharepoint_cache=file_cache,
+                # A retry re-stats in case the file changed since the first attempt
+                local_stat=local_stat if i == 0 else None
             )
             break
         except Exception as e:
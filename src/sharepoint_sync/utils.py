@@ -6,6 +6,68 @@ This module provides common helper functions used across multiple modules.
 """
 
 import os
+import logging
+
+# Package logger for high-volume per-item debug output. Messages are written
+# without decoration so they read the same as the surrounding print() output.
+logger = logging.getLogger('sharepoint_sync')
+
+# Debug flags, read once from the environment. Use is_debug_enabled() /
+# is_debug_metadata_enabled() rather than importing these names directly, so
+# callers see the values after refresh_debug_flags().
+DEBUG = os.environ.get('DEBUG', 'false').lower() == 'true'
+DEBUG_METADATA = os.environ.get('DEBUG_METADATA', 'false').lower() == 'true'
+
+
+class _PrintHandler(logging.Handler):
+    """Emit records through print() so thread_safe_print prefixes and locking apply."""
+
+    def emit(self, record):
+        try:
+            print(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+# Separator line used around console section headers
+BANNER_BAR = "=" * 60
+
+
+def print_banner(title):
+    """
+    Print a console section header (blank line, bar, title, bar) in one call.
+
+    Args:
+        title (str): Section title, e.g. "[1/5] CONFIGURATION"
+    """
+    print(f"\n{BANNER_BAR}\n{title}\n{BANNER_BAR}")
+
+
+def get_available_cpu_count():
+    """
+    Get the number of CPUs this process can actually use.
+
+    os.cpu_count() reports the host's CPUs even inside a container limited to
+    one or two of them. This honours the CPU affinity mask and, on Linux, a
+    cgroup v2 CPU quota (/sys/fs/cgroup/cpu.max).
+
+    Returns:
+        int: Usable CPU count (at least 1)
+    """
+    try:
+        cpu_count = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpu_count = os.cpu_count() or 4
+
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            cpu_count = min(cpu_count, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass  # No cgroup v2 quota (or not Linux)
+
+    return cpu_count
 
 
 def get_library_name_from_path(upload_path):
@@ -36,7 +98,7 @@ def is_debug_metadata_enabled():
     Returns:
         bool: True if debug metadata mode is enabled, False otherwise
     """
-    return os.environ.get('DEBUG_METADATA', 'false').lower() == 'true'
+    return DEBUG_METADATA
 
 
 def is_debug_enabled():
@@ -55,4 +117,49 @@ def is_debug_enabled():
     Returns:
         bool: True if general debug mode is enabled, False otherwise
     """
-    return os.environ.get('DEBUG', 'false').lower() == 'true'
+    return DEBUG
+
+
+def refresh_debug_flags():
+    """
+    Re-read DEBUG and DEBUG_METADATA from the environment.
+
+    The flags are evaluated once at import time; call this after changing the
+    environment variables (e.g., from parsed action inputs) so the cached
+    values and the package logger level pick up the change.
+    """
+    global DEBUG, DEBUG_METADATA
+    DEBUG = os.environ.get('DEBUG', 'false').lower() == 'true'
+    DEBUG_METADATA = os.environ.get('DEBUG_METADATA', 'false').lower() == 'true'
+    configure_logging(DEBUG)
+
+
+def configure_logging(debug=None):
+    """
+    Configure the package logger to write to stdout via print().
+
+    Safe to call more than once; the stdout handler is only attached on the
+    first call, later calls just update the level. Call sites should guard
+    message formatting with logger.isEnabledFor(logging.DEBUG) so f-strings
+    are not built when debug output is off.
+
+    Args:
+        debug (bool): Enable debug-level output (default: read DEBUG environment variable)
+
+    Returns:
+        logging.Logger: The configured package logger
+    """
+    if debug is None:
+        debug = is_debug_enabled()
+
+    if not logger.handlers:
+        handler = _PrintHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+    logger.setLevel(logging.DEBUG if debug else logging.INFO)
+    return logger
+
+
+configure_logging()